@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import BadgeCounter
+@admin.register(BadgeCounter)
+class BadgeCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_messages', 'unread_notifications', 'open_inquiries', 'reconciled_at']
+    search_fields = ['user__email']
+    readonly_fields = ['reconciled_at']
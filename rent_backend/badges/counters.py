@@ -0,0 +1,144 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, QuerySet
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from messages.models import Message
+from notifications.models import Notification
+from properties.models import PropertyInquiry
+from .models import BadgeCounter
+logger = logging.getLogger(__name__)
+UNREAD_MESSAGES = 'unread_messages'
+UNREAD_NOTIFICATIONS = 'unread_notifications'
+OPEN_INQUIRIES = 'open_inquiries'
+COUNTER_FIELDS = (UNREAD_MESSAGES, UNREAD_NOTIFICATIONS, OPEN_INQUIRIES)
+CLOSED_INQUIRY_STATUS = 'closed'
+RECONCILE_BATCH_SIZE = 500
+def adjust(user_ids, field, delta):
+    """
+    Add ``delta`` to ``field`` for every user in ``user_ids`` with one UPDATE.
+    ``user_ids`` may be a values() queryset, which is applied as a subquery.
+    Users without a counter row are skipped; their row is built from real
+    counts the first time badges are read.
+    """
+    if not delta:
+        return
+    if not isinstance(user_ids, QuerySet):
+        user_ids = [pk for pk in user_ids if pk is not None]
+        if not user_ids:
+            return
+    BadgeCounter.objects.filter(user_id__in=user_ids).update(**{field: Greatest(F(field) + delta, 0)})
+def adjust_each(deltas, field):
+    """Apply a ``{user_id: delta}`` mapping, one UPDATE per distinct delta."""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        adjust(user_ids, field, delta)
+def reset(user_ids, field):
+    BadgeCounter.objects.filter(user_id__in=list(user_ids)).update(**{field: 0})
+def messages_changed(participant_ids, sender_ids, sign):
+    """
+    Adjust unread message badges after messages were sent (``sign=1``) or
+    marked read (``sign=-1``). Each message counts for every participant
+    except its sender.
+    """
+    sent_by = Counter(sender_ids)
+    total = len(sender_ids)
+    adjust_each({pk: sign * (total - sent_by[pk]) for pk in participant_ids}, UNREAD_MESSAGES)
+def is_open_inquiry(inquiry):
+    return inquiry.status != CLOSED_INQUIRY_STATUS
+def inquiry_changed(inquiry, delta):
+    """Adjust the open inquiry badge of the inquirer and the property owner."""
+    adjust({inquiry.inquirer_id, inquiry.property.owner_id}, OPEN_INQUIRIES, delta)
+def _grouped(queryset, key):
+    return dict(queryset.order_by().values_list(key).annotate(n=Count('id')))
+def compute_counts(user_ids):
+    """
+    Return ``{user_id: {field: value}}`` computed from the source tables.
+    Runs a fixed number of grouped queries however many users are passed.
+    """
+    user_ids = list(user_ids)
+    # Senders are participants of their own conversations, so a user's
+    # unread messages are all unread messages in their conversations minus
+    # the unread ones they sent themselves.
+    unread = Message.objects.filter(is_read=False)
+    in_conversations = _grouped(unread.filter(conversation__participants__in=user_ids), 'conversation__participants')
+    sent = _grouped(unread.filter(sender_id__in=user_ids), 'sender_id')
+    notifications = _grouped(
+        Notification.objects.filter(recipient_id__in=user_ids, is_read=False),
+        'recipient_id',
+    )
+    open_inquiries = PropertyInquiry.objects.exclude(status=CLOSED_INQUIRY_STATUS)
+    as_inquirer = _grouped(open_inquiries.filter(inquirer_id__in=user_ids), 'inquirer_id')
+    as_owner = _grouped(
+        open_inquiries.filter(property__owner_id__in=user_ids).filter(~Q(inquirer_id=F('property__owner_id'))),
+        'property__owner_id',
+    )
+    return {
+        pk: {
+            UNREAD_MESSAGES: max(in_conversations.get(pk, 0) - sent.get(pk, 0), 0),
+            UNREAD_NOTIFICATIONS: notifications.get(pk, 0),
+            OPEN_INQUIRIES: as_inquirer.get(pk, 0) + as_owner.get(pk, 0),
+        }
+        for pk in user_ids
+    }
+def reconcile(user_ids=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recompute counters from the source tables and upsert them.
+    Covers ``user_ids`` or, when omitted, every user in primary-key batches.
+    
+    Returns:
+        Number of counter rows written
+    """
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+    else:
+        batches = _all_user_batches(batch_size)
+    written = 0
+    for batch in batches:
+        now = timezone.now()
+        rows = [
+            BadgeCounter(user_id=pk, reconciled_at=now, **counts)
+            for pk, counts in compute_counts(batch).items()
+        ]
+        BadgeCounter.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[*COUNTER_FIELDS, 'reconciled_at'],
+        )
+        written += len(rows)
+    logger.info("Reconciled %s badge counters", written)
+    return written
+def _all_user_batches(batch_size):
+    users = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+def get_counter(user):
+    """Return the user's counter row, building it on first use."""
+    counter = BadgeCounter.objects.filter(user=user).first()
+    if counter is None:
+        reconcile([user.pk])
+        counter = BadgeCounter.objects.get(user=user)
+    return counter
+async def aget_counter(user):
+    """get_counter for async views; building a missing row stays synchronous."""
+    counter = await BadgeCounter.objects.filter(user=user).afirst()
+    if counter is None:
+        await sync_to_async(reconcile)([user.pk])
+        counter = await BadgeCounter.objects.aget(user=user)
+    return counter
+def next_reconcile_run(now=None):
+    """Reconciliation runs at the top of every hour."""
+    now = now or timezone.now()
+    return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
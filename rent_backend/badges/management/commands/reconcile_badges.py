@@ -0,0 +1,33 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from badges.counters import RECONCILE_BATCH_SIZE, reconcile
+from badges.tasks import schedule_reconciliation
+class Command(BaseCommand):
+    help = "Recompute header badge counters (unread messages, unread notifications, open inquiries)."
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only reconcile this user id; may be repeated (default: all users).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECONCILE_BATCH_SIZE,
+            help=f"Users recomputed per round trip (default: {RECONCILE_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Queue the hourly reconciliation job instead of running now.",
+        )
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            job = schedule_reconciliation()
+            run_at = job.run_at if job else "now (JOBS_EAGER)"
+            self.stdout.write(self.style.SUCCESS(f"Scheduled hourly badge reconciliation at {run_at}."))
+            return
+        written = reconcile(options["user_ids"], batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {written} badge counters."))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0002_verification_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='badge_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_messages', models.PositiveIntegerField(default=0)),
+                ('unread_notifications', models.PositiveIntegerField(default=0)),
+                ('open_inquiries', models.PositiveIntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Badge Counter',
+                'verbose_name_plural': 'Badge Counters',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import models
+class BadgeCounter(models.Model):
+    """
+    Per-user header badge numbers.
+    Write paths adjust these with F() expressions and a periodic job
+    recomputes them, so reading badges never runs a COUNT.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='badge_counter'
+    )
+    unread_messages = models.PositiveIntegerField(default=0)
+    unread_notifications = models.PositiveIntegerField(default=0)
+    open_inquiries = models.PositiveIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    class Meta:
+        verbose_name = 'Badge Counter'
+        verbose_name_plural = 'Badge Counters'
+    def __str__(self):
+        return f"Badges for user {self.user_id}"
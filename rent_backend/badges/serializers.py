@@ -0,0 +1,7 @@
+from rest_framework import serializers
+from .models import BadgeCounter
+class BadgeCounterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BadgeCounter
+        fields = ['unread_messages', 'unread_notifications', 'open_inquiries', 'reconciled_at']
+        read_only_fields = fields
@@ -0,0 +1,16 @@
+from jobs.queue import enqueue, task
+from .counters import next_reconcile_run, reconcile
+@task('badges.reconcile')
+def reconcile_badges(batch_size=500):
+    """Recompute every badge counter, then queue the next hourly run."""
+    try:
+        reconcile(batch_size=batch_size)
+    finally:
+        schedule_reconciliation()
+def schedule_reconciliation():
+    run_at = next_reconcile_run()
+    return enqueue(
+        'badges.reconcile',
+        run_at=run_at,
+        idempotency_key=f'badges.reconcile:{run_at.isoformat()}',
+    )
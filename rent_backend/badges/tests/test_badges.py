@@ -0,0 +1,97 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from badges.models import BadgeCounter
+from messages.models import Conversation, Message
+from notifications.models import Notification
+from properties.models import Property, PropertyInquiry
+from users.revocation import revocation_list
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email,
+        first_name="Test",
+        last_name=role.title(),
+        role=role,
+        password="pass12345",
+    )
+def _create_property(owner):
+    return Property.objects.create(
+        owner=owner,
+        title="Nice place",
+        description="A very nice place",
+        property_type="apartment",
+        status="available",
+        address="123 Main St",
+        location="Downtown",
+        city="Riyadh",
+        country="SA",
+        bedrooms=2,
+        bathrooms="1.0",
+        rent_amount="2500.00",
+        security_deposit="500.00",
+        parking_spaces=0,
+        lease_duration_months=12,
+        available_from=timezone.now().date(),
+    )
+@override_settings(JOBS_EAGER=True)
+class BadgeApiTests(APITestCase):
+    def setUp(self):
+        self.tenant = _create_user(email="tenant@example.com", role="tenant")
+        self.landlord = _create_user(email="landlord@example.com", role="landlord")
+        self.prop = _create_property(self.landlord)
+        self.conversation = Conversation.objects.create(subject="Q", property=self.prop)
+        self.conversation.participants.add(self.tenant, self.landlord)
+        revocation_list.rebuild()
+    def _badges(self, user):
+        self.client.force_authenticate(user)
+        res = self.client.get("/api/badges/")
+        self.assertEqual(res.status_code, 200)
+        return {k: res.data[k] for k in ("unread_messages", "unread_notifications", "open_inquiries")}
+    def test_first_read_builds_counter_from_source_tables(self):
+        Message.objects.create(conversation=self.conversation, sender=self.tenant, content="Hi")
+        PropertyInquiry.objects.create(property=self.prop, inquirer=self.tenant, message="Hi")
+        self.assertEqual(self._badges(self.landlord), {"unread_messages": 1, "unread_notifications": 0, "open_inquiries": 1})
+        self.assertEqual(self._badges(self.tenant), {"unread_messages": 0, "unread_notifications": 0, "open_inquiries": 1})
+    def test_write_paths_keep_counters_current_without_counting(self):
+        self._badges(self.tenant)
+        self._badges(self.landlord)
+        self.client.force_authenticate(self.tenant)
+        self.client.post(f"/api/messages/conversations/{self.conversation.id}/send_message/", {"content": "Hello"}, format="json")
+        res = self.client.post("/api/properties/inquiries/", {"property": self.prop.id, "message": "Interested"}, format="json")
+        self.assertEqual(res.status_code, 201)
+        inquiry_id = res.data["id"]
+        self.client.force_authenticate(self.landlord)
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/badges/")
+        self.assertEqual(res.data["unread_messages"], 1)
+        self.assertEqual(res.data["unread_notifications"], 1)
+        self.assertEqual(res.data["open_inquiries"], 1)
+        self.client.get(f"/api/messages/conversations/{self.conversation.id}/")
+        self.client.post("/api/notifications/mark_all_read/")
+        self.client.patch(f"/api/properties/inquiries/{inquiry_id}/", {"status": "closed"}, format="json")
+        self.assertEqual(self._badges(self.landlord), {"unread_messages": 0, "unread_notifications": 0, "open_inquiries": 0})
+        self.assertEqual(self._badges(self.tenant)["open_inquiries"], 0)
+    async def test_async_view_matches_sync_view(self):
+        await Message.objects.acreate(conversation=self.conversation, sender=self.tenant, content="Hi")
+        auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.landlord).access_token}"}
+        res = await self.async_client.get("/api/badges/async/", headers=auth)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["unread_messages"], 1)
+        self.assertEqual(res.json(), (await self.async_client.get("/api/badges/", headers=auth)).json())
+        res = await self.async_client.get("/api/badges/async/")
+        self.assertEqual(res.status_code, 401)
+        self.assertIn("WWW-Authenticate", res.headers)
+    def test_reconcile_command_repairs_drift(self):
+        Notification.objects.create(recipient=self.landlord, notification_type="system", title="A", message="M")
+        BadgeCounter.objects.create(user=self.landlord, unread_messages=7, unread_notifications=0, open_inquiries=3)
+        out = StringIO()
+        call_command("reconcile_badges", stdout=out)
+        self.assertIn("Reconciled 2 badge counters", out.getvalue())
+        counter = BadgeCounter.objects.get(user=self.landlord)
+        self.assertEqual((counter.unread_messages, counter.unread_notifications, counter.open_inquiries), (0, 1, 0))
+        self.assertIsNotNone(counter.reconciled_at)
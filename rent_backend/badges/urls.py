@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import AsyncBadgeView, BadgeView
+app_name = 'badges'
+urlpatterns = [
+    path('', BadgeView.as_view(), name='badges'),
+    path('async/', AsyncBadgeView.as_view(), name='async_badges'),
+]
@@ -0,0 +1,36 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import generics
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from users.authentication import aauthenticate
+from .counters import aget_counter, get_counter
+from .serializers import BadgeCounterSerializer
+class BadgeView(generics.RetrieveAPIView):
+    """
+    Header badge numbers for the current user.
+    GET /api/badges/
+    """
+    serializer_class = BadgeCounterSerializer
+    permission_classes = [IsAuthenticated]
+    def get_object(self):
+        return get_counter(self.request.user)
+class AsyncBadgeView(View):
+    """
+    BadgeView for ASGI deployments, so header badge polling does not tie
+    up a thread per request.
+    GET /api/badges/async/
+    """
+    async def get(self, request):
+        try:
+            user = await aauthenticate(request)
+            if user is None:
+                raise NotAuthenticated()
+        except APIException as e:
+            response = HttpResponse(JSONRenderer().render({"detail": e.detail}), status=e.status_code, content_type="application/json")
+            if e.status_code == 401:
+                response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+        counter = await aget_counter(user)
+        return HttpResponse(JSONRenderer().render(BadgeCounterSerializer(counter).data), content_type="application/json")
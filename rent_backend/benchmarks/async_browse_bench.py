@@ -0,0 +1,146 @@
+"""
+Compare the sync (WSGI) and async (ASGI) property browse endpoints.
+
+Both paths are driven in-process through Django's handlers, with no HTTP
+server in front: ``--connections`` threads each loop over the sync
+endpoint, then the same number of tasks share one event loop for the
+async endpoint. Throughput is measured first; memory per connection is
+the tracemalloc peak while every connection has one request in flight,
+divided by the number of connections. Thread stacks are not seen by
+tracemalloc and come on top for the sync path.
+Listings are seeded into a throwaway copy of the configured database
+(created like the test database, a temporary file for SQLite) which is
+dropped when the run ends.
+    
+    python benchmarks/async_browse_bench.py --properties 200 --connections 32
+    python benchmarks/async_browse_bench.py --endpoint filter_options
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rent_backend.settings")
+ENDPOINTS = {
+    "list": ("/api/properties/", "/api/properties/async/"),
+    "filter_options": ("/api/properties/filter_options/", "/api/properties/async/filter_options/"),
+}
+BENCH_OWNER = "bench-owner@example.com"
+def _create_scratch_database(tmpdir):
+    from django.db import connection
+    if connection.vendor == "sqlite":
+        # A file rather than the shared in-memory test database, which
+        # serialises the benchmark threads on its cache lock.
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name
+def _seed(count):
+    from django.contrib.auth import get_user_model
+    from properties.models import Property
+    User = get_user_model()
+    owner = User.objects.create_user(
+        email=BENCH_OWNER, first_name="Bench", last_name="Owner", role="landlord", password="pass12345",
+    )
+    for i in range(count):
+        Property.objects.create(
+            owner=owner, title=f"Bench flat {i}", description="Benchmark listing", property_type="apartment",
+            city=("Riyadh", "Jeddah", "Dammam")[i % 3], bedrooms=1 + i % 4, bathrooms="1.0",
+            rent_amount=f"{1000 + i * 10}.00", security_deposit="500.00", available_from="2026-01-01",
+        )
+def _read(response):
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+async def _aread(response):
+    if response.streaming:
+        return b"".join([chunk async for chunk in response.streaming_content])
+    return response.content
+def _sync_throughput(path, connections, seconds):
+    from django.test import Client
+    stop = time.perf_counter() + seconds
+    counts = [0] * connections
+    def loop(slot):
+        client = Client()
+        while time.perf_counter() < stop:
+            _read(client.get(path))
+            counts[slot] += 1
+    threads = [threading.Thread(target=loop, args=(slot,)) for slot in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+async def _async_throughput(path, connections, seconds):
+    from django.test import AsyncClient
+    stop = time.perf_counter() + seconds
+    async def loop():
+        client = AsyncClient()
+        done = 0
+        while time.perf_counter() < stop:
+            await _aread(await client.get(path))
+            done += 1
+        return done
+    return sum(await asyncio.gather(*(loop() for _ in range(connections)))) / seconds
+def _sync_peak(path, connections):
+    from django.test import Client
+    barrier = threading.Barrier(connections)
+    def one():
+        client = Client()
+        barrier.wait()
+        _read(client.get(path))
+    threads = [threading.Thread(target=one) for _ in range(connections)]
+    tracemalloc.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+async def _async_peak(path, connections):
+    from django.test import AsyncClient
+    async def one():
+        await _aread(await AsyncClient().get(path))
+    tracemalloc.start()
+    await asyncio.gather(*(one() for _ in range(connections)))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+def _run(args):
+    sync_path, async_path = ENDPOINTS[args.endpoint]
+    # Warm caches, the amenity catalog and connections on both paths.
+    _sync_throughput(sync_path, 1, 0.2)
+    asyncio.run(_async_throughput(async_path, 1, 0.2))
+    sync_rate = _sync_throughput(sync_path, args.connections, args.seconds)
+    async_rate = asyncio.run(_async_throughput(async_path, args.connections, args.seconds))
+    sync_peak = _sync_peak(sync_path, args.connections)
+    async_peak = asyncio.run(_async_peak(async_path, args.connections))
+    print(f"{args.endpoint}, {args.connections} connections")
+    for label, rate, peak in (("sync", sync_rate, sync_peak), ("async", async_rate, async_peak)):
+        print(f"{label:<6} {rate:>10,.0f} req/s {peak / args.connections / 1024:>10,.1f} KiB/connection")
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="list")
+    parser.add_argument("--properties", type=int, default=200, help="Listings to seed (default: 200).")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent clients (default: 32).")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old_name = _create_scratch_database(tmpdir)
+        try:
+            _seed(args.properties)
+            _run(args)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+if __name__ == "__main__":
+    main()
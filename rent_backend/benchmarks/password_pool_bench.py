@@ -0,0 +1,75 @@
+"""
+Measure how a login storm affects cheap requests in the same process.
+
+``--logins`` threads check passwords back to back while one thread keeps
+serialising a small JSON page (standing in for a browse endpoint) and
+records its latency. Run once inline and once with a process pool:
+    
+    python benchmarks/password_pool_bench.py --workers 0
+    python benchmarks/password_pool_bench.py --workers 2 --queue 4
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rent_backend.settings")
+def _browse_page():
+    return json.dumps([{"id": i, "title": f"Flat {i}", "price": i * 10} for i in range(200)])
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=0, help="Hashing processes, 0 = inline (default: 0).")
+    parser.add_argument("--queue", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent login threads (default: 8).")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    import django
+    django.setup()
+    from django.contrib.auth import hashers
+    from users.passwords import PasswordHashingBusy, PasswordPool
+    pool = PasswordPool(args.workers, args.queue)
+    encoded = hashers.make_password("pass12345")
+    stop = threading.Event()
+    counts = {"ok": 0, "busy": 0}
+    lock = threading.Lock()
+    def login():
+        while not stop.is_set():
+            try:
+                pool.run(hashers.check_password, "pass12345", encoded)
+                outcome = "ok"
+            except PasswordHashingBusy:
+                outcome = "busy"
+                time.sleep(0.01)
+            with lock:
+                counts[outcome] += 1
+    latencies = []
+    def browse():
+        while not stop.is_set():
+            started = time.perf_counter()
+            _browse_page()
+            latencies.append((time.perf_counter() - started) * 1000)
+    baseline = []
+    for _ in range(200):
+        started = time.perf_counter()
+        _browse_page()
+        baseline.append((time.perf_counter() - started) * 1000)
+    threads = [threading.Thread(target=login) for _ in range(args.logins)] + [threading.Thread(target=browse)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool.shutdown()
+    print(f"workers={args.workers} queue={args.queue} login_threads={args.logins}")
+    print(f"logins: {counts['ok'] / args.seconds:.1f}/s checked, {counts['busy'] / args.seconds:.1f}/s refused with 503")
+    print(f"browse idle:  p50 {statistics.median(baseline):.2f} ms, p99 {_percentile(baseline, 0.99):.2f} ms")
+    print(f"browse storm: p50 {statistics.median(latencies):.2f} ms, p99 {_percentile(latencies, 0.99):.2f} ms ({len(latencies)} pages)")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+SMS throughput against the local fake provider: one new connection per
+message (the old urllib approach) versus the pooled keep-alive backend.
+
+    python benchmarks/sms_bench.py --messages 2000 --threads 4 --latency 0.002
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rent_backend.settings")
+def _send_urlopen(base_url, to, body):
+    url = f"{base_url}/2010-04-01/Accounts/ACbench/Messages.json"
+    data = urllib.parse.urlencode({"To": to, "From": "+15550000000", "Body": body}).encode("utf-8")
+    req = urllib.request.Request(url, data=data, method="POST")
+    req.add_header("Authorization", "Basic " + base64.b64encode(b"ACbench:secret").decode("ascii"))
+    with urllib.request.urlopen(req, timeout=15) as resp:
+        resp.read()
+def _run(label, provider, send, messages, threads):
+    provider.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: send(f"+2110000{i:05d}", "Your code is 123456"), range(messages)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {messages / elapsed:>10,.0f} msg/s  {provider.connections:>6} connections  {len(provider.messages)} delivered")
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent senders, like run_workers --threads (default: 4).")
+    parser.add_argument("--latency", type=float, default=0.002, help="Provider processing time in seconds (default: 0.002).")
+    args = parser.parse_args()
+    import django
+    django.setup()
+    from users.sms import TwilioSmsBackend
+    from users.tests.fake_sms_provider import FakeSmsProvider
+    provider = FakeSmsProvider(latency=args.latency).start()
+    try:
+        _run("urlopen", provider, lambda to, body: _send_urlopen(provider.url, to, body), args.messages, args.threads)
+        backend = TwilioSmsBackend("ACbench", "secret", "+15550000000", base_url=provider.url, pool_size=args.threads)
+        _run("pooled", provider, backend.send, args.messages, args.threads)
+        backend.pool.close()
+    finally:
+        provider.stop()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Hammer the rate-limit store from several processes at once.
+
+Each process sends ``--requests`` hits spread over ``--keys`` client keys
+against a limit of ``--limit`` per minute. Because all processes share one
+store, the number of admitted hits per key must never exceed the limit no
+matter how many processes run.
+    
+    python benchmarks/throttle_bench.py --backend sqlite --processes 8
+    REDIS_URL=redis://localhost:6379/0 python benchmarks/throttle_bench.py --backend cache
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rent_backend.settings")
+def _worker(args, queue):
+    import django
+    django.setup()
+    from rent_backend.throttling import CacheWindowStore, SQLiteWindowStore
+    store = SQLiteWindowStore(args.path) if args.backend == "sqlite" else CacheWindowStore()
+    admitted = [0] * args.keys
+    started = time.perf_counter()
+    for i in range(args.requests):
+        key = i % args.keys
+        if store.hit(f"bench:{args.run}:{key}", args.limit, 60)[0]:
+            admitted[key] += 1
+    queue.put((time.perf_counter() - started, admitted))
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "cache"], default="sqlite")
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "throttle_bench.sqlite3"))
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000, help="Hits per process (default: 2000).")
+    parser.add_argument("--keys", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    args.run = f"{os.getpid()}-{time.time_ns()}"
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_worker, args=(args, queue)) for _ in range(args.processes)]
+    started = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    wall = time.perf_counter() - started
+    total = args.processes * args.requests
+    admitted = [sum(r[1][key] for r in results) for key in range(args.keys)]
+    slowest = max(r[0] for r in results)
+    print(f"backend={args.backend} processes={args.processes} hits={total}")
+    print(f"throughput: {total / slowest:,.0f} hits/s ({slowest / args.requests * 1e6:.0f} us/hit per process), wall {wall:.2f}s")
+    print(f"admitted per key: max {max(admitted)} (limit {args.limit}), total {sum(admitted)}")
+    if max(admitted) > args.limit:
+        print("FAIL: limit exceeded across processes")
+        sys.exit(1)
+if __name__ == "__main__":
+    main()
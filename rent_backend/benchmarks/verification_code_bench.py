@@ -0,0 +1,49 @@
+"""
+Compare the cost of hashing and checking verification codes with the
+PBKDF2 password hasher (the old behaviour) and the HMAC code hasher.
+
+Every verification issues one hash when the code is delivered and one
+check per confirmation attempt, so the per-operation numbers translate
+directly into register/verify throughput per CPU core.
+    
+    python benchmarks/verification_code_bench.py --iterations 200
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rent_backend.settings")
+def _rate(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed, elapsed / iterations * 1000
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Operations per measurement (default: 200).")
+    args = parser.parse_args()
+    import django
+    django.setup()
+    from django.contrib.auth.hashers import check_password, make_password
+    from users.codes import check_code_hash, make_code_hash
+    code = "123456"
+    legacy = make_password(code)
+    current = make_code_hash(code)
+    rows = [
+        ("pbkdf2 hash", lambda: make_password(code)),
+        ("pbkdf2 check", lambda: check_password(code, legacy)),
+        ("hmac hash", lambda: make_code_hash(code)),
+        ("hmac check", lambda: check_code_hash(code, current)),
+    ]
+    results = {}
+    for name, func in rows:
+        per_second, ms = _rate(func, args.iterations)
+        results[name] = per_second
+        print(f"{name:<14} {per_second:>12,.0f} ops/s {ms:>10.3f} ms/op")
+    before = 1 / (1 / results["pbkdf2 hash"] + 1 / results["pbkdf2 check"])
+    after = 1 / (1 / results["hmac hash"] + 1 / results["hmac check"])
+    print(f"hash+check per core: {before:,.1f}/s before, {after:,.0f}/s after ({after / before:,.0f}x)")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Job
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'idempotency_key']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at']
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import multiprocessing
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from jobs.worker import Worker, run_worker_threads
+def _serve(threads: int, batch_size: int, poll_interval: float) -> None:
+    stop_event = threading.Event()
+    def _stop(signum, frame):
+        stop_event.set()
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    run_worker_threads(threads, stop_event, batch_size=batch_size, poll_interval=poll_interval)
+class Command(BaseCommand):
+    help = "Run background job workers (a pool of processes, each running a pool of threads)."
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes to start (default: 1).",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Worker threads per process (default: 4).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="Jobs each worker claims per poll (default: 1).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds to sleep when the queue is empty (default: JOBS_POLL_INTERVAL_SECONDS).",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Process runnable jobs in the current process and exit when the queue is empty.",
+        )
+    def handle(self, *args, **options):
+        processes: int = max(1, options["processes"])
+        threads: int = max(1, options["threads"])
+        batch_size: int = max(1, options["batch_size"])
+        poll_interval: float = options["poll_interval"]
+        if poll_interval is None:
+            poll_interval = float(getattr(settings, "JOBS_POLL_INTERVAL_SECONDS", 1.0))
+        if options["burst"]:
+            processed = Worker(batch_size=batch_size).run_until_empty()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
+            return
+        self.stdout.write(f"Starting {processes} worker process(es) x {threads} thread(s).")
+        if processes == 1:
+            _serve(threads, batch_size, poll_interval)
+            return
+        # Children must not inherit the parent's open database connections.
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        children = [
+            ctx.Process(target=_serve, args=(threads, batch_size, poll_interval), name=f"jobs-{i}")
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+        def _forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+        signal.signal(signal.SIGTERM, _forward)
+        signal.signal(signal.SIGINT, _forward)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
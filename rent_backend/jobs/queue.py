@@ -0,0 +1,176 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+logger = logging.getLogger(__name__)
+_registry = {}
+def task(name):
+    """
+    Register a function as a background task under ``name``.
+    The function is called with the job payload as keyword arguments.
+    """
+    def decorator(func):
+        if name in _registry and _registry[name] is not func:
+            raise ValueError(f"Task already registered: {name}")
+        _registry[name] = func
+        return func
+    return decorator
+def get_task(name):
+    return _registry.get(name)
+def _setting(name, default):
+    return getattr(settings, name, default)
+def _run_eagerly(name, payload):
+    func = _registry.get(name)
+    if func is None:
+        raise LookupError(f"Unknown task: {name}")
+    try:
+        func(**payload)
+    except Exception:
+        logger.exception("Eager task %s failed", name)
+def enqueue(name, payload=None, *, run_at=None, delay=None, idempotency_key=None, max_attempts=None):
+    """
+    Queue ``name`` to run in a worker.
+    
+    Args:
+        name: Registered task name
+        payload: JSON-serialisable keyword arguments for the task
+        run_at: Earliest time the job may run (optional)
+        delay: timedelta added to now, alternative to run_at (optional)
+        idempotency_key: Jobs sharing a key are only queued once (optional)
+        max_attempts: Attempts before the job is marked failed (optional)
+    
+    Returns:
+        The queued Job, the existing Job for ``idempotency_key``,
+        or None when JOBS_EAGER ran a due job inline. Jobs scheduled for
+        later are queued as usual in eager mode, so they run when a worker
+        finds them due instead of early or never.
+    """
+    payload = payload or {}
+    now = timezone.now()
+    if run_at is None:
+        run_at = now + (delay or timedelta())
+    if _setting('JOBS_EAGER', False) and run_at <= now:
+        _run_eagerly(name, payload)
+        return None
+    job = Job(
+        name=name,
+        payload=payload,
+        run_at=run_at,
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts or _setting('JOBS_MAX_ATTEMPTS', 5),
+    )
+    if idempotency_key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+    return job
+def enqueue_many(name, payloads, *, run_at=None, max_attempts=None):
+    """
+    Queue one job per payload with a single bulk INSERT.
+    
+    Returns:
+        List of queued Job objects (empty when JOBS_EAGER ran them inline;
+        in eager mode jobs for a future ``run_at`` are queued like enqueue's)
+    """
+    now = timezone.now()
+    if _setting('JOBS_EAGER', False) and (run_at is None or run_at <= now):
+        for payload in payloads:
+            _run_eagerly(name, payload)
+        return []
+    run_at = run_at or now
+    max_attempts = max_attempts or _setting('JOBS_MAX_ATTEMPTS', 5)
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload, run_at=run_at, max_attempts=max_attempts)
+        for payload in payloads
+    ])
+def _claimable(now):
+    stale_before = now - timedelta(seconds=_setting('JOBS_LOCK_TIMEOUT_SECONDS', 300))
+    return Job.objects.filter(
+        Q(status=Job.STATUS_QUEUED, run_at__lte=now)
+        | Q(status=Job.STATUS_RUNNING, locked_at__lt=stale_before)
+    ).order_by('run_at', 'id')
+def claim_jobs(worker_id, limit=1):
+    """
+    Atomically claim up to ``limit`` runnable jobs for ``worker_id``.
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+    (PostgreSQL) and a compare-and-set UPDATE per row otherwise (SQLite).
+    Jobs left running past JOBS_LOCK_TIMEOUT_SECONDS are reclaimed.
+    """
+    now = timezone.now()
+    claim = {
+        'status': Job.STATUS_RUNNING,
+        'locked_by': worker_id,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _claimable(now).select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:limit]
+            )
+            Job.objects.filter(id__in=ids).update(**claim)
+    else:
+        ids = []
+        candidates = _claimable(now).values('id', 'status', 'locked_at')[:limit * 4]
+        for candidate in candidates:
+            claimed = Job.objects.filter(
+                id=candidate['id'],
+                status=candidate['status'],
+                locked_at=candidate['locked_at'],
+            ).update(**claim)
+            if claimed:
+                ids.append(candidate['id'])
+            if len(ids) >= limit:
+                break
+    if not ids:
+        return []
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the given attempt number."""
+    base = _setting('JOBS_RETRY_BASE_DELAY_SECONDS', 10)
+    cap = _setting('JOBS_RETRY_MAX_DELAY_SECONDS', 3600)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay + random.uniform(0, delay * 0.1))
+def run_job(job):
+    """
+    Run a claimed job and record the result.
+    Failed jobs are re-queued with backoff until max_attempts is reached.
+    
+    Returns:
+        True if the task succeeded
+    """
+    func = get_task(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        func(**job.payload)
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.name, job.attempts)
+        if func is None or job.attempts >= job.max_attempts:
+            fields = {'status': Job.STATUS_FAILED, 'finished_at': now}
+        else:
+            fields = {'status': Job.STATUS_QUEUED, 'run_at': now + retry_delay(job.attempts)}
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            last_error=error, locked_by='', locked_at=None, **fields
+        )
+        return False
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=Job.STATUS_DONE,
+        finished_at=timezone.now(),
+        last_error='',
+        locked_by='',
+        locked_at=None,
+    )
+    return True
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import claim_jobs, enqueue, run_job, task
+from jobs.worker import Worker
+CALLS = []
+@task("jobs.tests.record")
+def _record(value):
+    CALLS.append(value)
+@task("jobs.tests.explode")
+def _explode():
+    raise RuntimeError("boom")
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+    def test_enqueue_and_run(self):
+        job = enqueue("jobs.tests.record", {"value": 1})
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        processed = Worker(worker_id="w1").run_until_empty()
+        self.assertEqual(processed, 1)
+        self.assertEqual(CALLS, [1])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+    def test_idempotency_key_queues_once(self):
+        first = enqueue("jobs.tests.record", {"value": 1}, idempotency_key="once")
+        second = enqueue("jobs.tests.record", {"value": 2}, idempotency_key="once")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+    def test_scheduled_jobs_wait_for_run_at(self):
+        enqueue("jobs.tests.record", {"value": 1}, delay=timedelta(minutes=5))
+        self.assertEqual(claim_jobs("w1"), [])
+    def test_claimed_job_is_not_claimed_twice(self):
+        enqueue("jobs.tests.record", {"value": 1})
+        self.assertEqual(len(claim_jobs("w1")), 1)
+        self.assertEqual(claim_jobs("w2"), [])
+    @override_settings(JOBS_LOCK_TIMEOUT_SECONDS=60)
+    def test_stale_running_job_is_reclaimed(self):
+        job = enqueue("jobs.tests.record", {"value": 1})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_RUNNING,
+            locked_by="dead",
+            locked_at=timezone.now() - timedelta(minutes=5),
+        )
+        claimed = claim_jobs("w1")
+        self.assertEqual([j.pk for j in claimed], [job.pk])
+        self.assertEqual(claimed[0].locked_by, "w1")
+    def test_failed_job_retries_with_backoff_then_fails(self):
+        job = enqueue("jobs.tests.explode", max_attempts=2)
+        run_job(claim_jobs("w1")[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("boom", job.last_error)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        run_job(claim_jobs("w1")[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(enqueue("jobs.tests.record", {"value": 3}))
+        self.assertEqual(CALLS, [3])
+        self.assertFalse(Job.objects.exists())
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_queues_future_jobs_until_due(self):
+        job = enqueue("jobs.tests.record", {"value": 4}, delay=timedelta(hours=1))
+        self.assertEqual(CALLS, [])
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(Worker().run_until_empty(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(Worker().run_until_empty(), 1)
+        self.assertEqual(CALLS, [4])
+    @override_settings(JOBS_POLL_INTERVAL_SECONDS=7.5)
+    def test_run_workers_poll_interval_defaults_to_setting(self):
+        with mock.patch("jobs.management.commands.run_workers._serve") as serve:
+            call_command("run_workers", stdout=StringIO())
+        self.assertEqual(serve.call_args.args[2], 7.5)
+    def test_run_workers_burst(self):
+        enqueue("jobs.tests.record", {"value": 1})
+        enqueue("jobs.tests.record", {"value": 2})
+        out = StringIO()
+        call_command("run_workers", "--burst", stdout=out)
+        self.assertIn("Processed 2 jobs", out.getvalue())
+        self.assertEqual(sorted(CALLS), [1, 2])
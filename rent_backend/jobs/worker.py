@@ -0,0 +1,74 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from django.conf import settings
+from django.db import close_old_connections, connections
+from .queue import claim_jobs, run_job
+logger = logging.getLogger(__name__)
+class Worker:
+    """
+    Polls the job table and runs claimed jobs one batch at a time.
+    One Worker runs per thread; each thread uses its own DB connection.
+    """
+    def __init__(self, worker_id=None, batch_size=1, poll_interval=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'JOBS_POLL_INTERVAL_SECONDS', 1.0)
+        self.poll_interval = poll_interval
+    def run_once(self):
+        """
+        Claim and run one batch of jobs.
+        
+        Returns:
+            Number of jobs processed
+        """
+        close_old_connections()
+        jobs = claim_jobs(self.worker_id, limit=self.batch_size)
+        for job in jobs:
+            run_job(job)
+        return len(jobs)
+    def run_until_empty(self):
+        """Run batches until no runnable jobs remain. Returns jobs processed."""
+        total = 0
+        while True:
+            processed = self.run_once()
+            if not processed:
+                return total
+            total += processed
+    def run(self, stop_event):
+        """Run until ``stop_event`` is set, sleeping when the queue is empty."""
+        logger.info("Worker %s started", self.worker_id)
+        try:
+            while not stop_event.is_set():
+                try:
+                    processed = self.run_once()
+                except Exception:
+                    logger.exception("Worker %s failed to claim jobs", self.worker_id)
+                    processed = 0
+                if not processed:
+                    stop_event.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+            logger.info("Worker %s stopped", self.worker_id)
+def run_worker_threads(threads, stop_event, batch_size=1, poll_interval=None):
+    """Run ``threads`` Worker loops in this process until ``stop_event`` is set."""
+    pool = []
+    for index in range(threads):
+        worker = Worker(
+            worker_id=f"{socket.gethostname()}:{os.getpid()}:{index}",
+            batch_size=batch_size,
+            poll_interval=poll_interval,
+        )
+        thread = threading.Thread(
+            target=worker.run,
+            args=(stop_event,),
+            name=f"jobs-worker-{index}",
+            daemon=True,
+        )
+        thread.start()
+        pool.append(thread)
+    for thread in pool:
+        thread.join()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, MessageReadStatus
+from .models import ArchivedMessage, Conversation, Message, MessageReadStatus
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ['id', 'subject', 'created_at', 'updated_at']
@@ -12,6 +12,12 @@ class MessageAdmin(admin.ModelAdmin):
     list_filter = ['is_read', 'created_at']
     search_fields = ['content', 'sender__email']
     readonly_fields = ['created_at', 'updated_at']
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'conversation', 'sender', 'created_at', 'archived_at']
+    list_filter = ['archived_at']
+    search_fields = ['sender__email']
+    readonly_fields = ['created_at', 'updated_at', 'archived_at']
 @admin.register(MessageReadStatus)
 class MessageReadStatusAdmin(admin.ModelAdmin):
     list_display = ['message', 'user', 'read_at']
@@ -0,0 +1,99 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedMessage, Message
+logger = logging.getLogger(__name__)
+ARCHIVED_FIELDS = (
+    'id', 'conversation_id', 'sender_id', 'content', 'attachment',
+    'is_read', 'read_at', 'created_at', 'updated_at',
+)
+@dataclass(frozen=True)
+class ArchivePolicy:
+    after_days: int
+    inactive_days: int
+def get_archive_policy() -> ArchivePolicy:
+    return ArchivePolicy(
+        after_days=int(getattr(settings, "MESSAGE_ARCHIVE_AFTER_DAYS", 180)),
+        inactive_days=int(getattr(settings, "MESSAGE_ARCHIVE_INACTIVE_DAYS", 90)),
+    )
+@dataclass
+class ArchiveResult:
+    archived: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    @property
+    def rows_per_second(self) -> float:
+        return self.archived / self.seconds if self.seconds else 0.0
+def archivable_messages(policy: ArchivePolicy, now=None):
+    """
+    Read messages older than ``after_days`` in conversations idle for
+    ``inactive_days``. Unread messages stay hot so unread counts and badge
+    counters never need to look at the archive.
+    """
+    now = now or timezone.now()
+    return Message.objects.filter(
+        is_read=True,
+        created_at__lt=now - timedelta(days=policy.after_days),
+        conversation__updated_at__lt=now - timedelta(days=policy.inactive_days),
+    )
+def estimate_archive(policy: ArchivePolicy | None = None, batch_size: int = 1000, now=None):
+    """Return (messages, batches) that archive_messages would move."""
+    policy = policy or get_archive_policy()
+    count = archivable_messages(policy, now).count()
+    return count, math.ceil(count / batch_size) if batch_size else 0
+def archive_messages(policy: ArchivePolicy | None = None, batch_size: int = 1000, pause: float = 0.5,
+                     max_batches: int | None = None, now=None, sleep=time.sleep) -> ArchiveResult:
+    """
+    Move archivable messages into ArchivedMessage in primary-key batches.
+    Each batch copies at most ``batch_size`` rows and deletes them from the
+    hot table in one transaction, then sleeps ``pause`` seconds.
+    """
+    policy = policy or get_archive_policy()
+    now = now or timezone.now()
+    candidates = archivable_messages(policy, now).order_by("id")
+    result = ArchiveResult()
+    started = time.monotonic()
+    last_id = 0
+    while max_batches is None or result.batches < max_batches:
+        rows = list(candidates.filter(id__gt=last_id).values(*ARCHIVED_FIELDS)[:batch_size])
+        if not rows:
+            break
+        ids = [row["id"] for row in rows]
+        with transaction.atomic():
+            ArchivedMessage.objects.bulk_create([ArchivedMessage(**row) for row in rows])
+            Message.objects.filter(id__in=ids).delete()
+        result.archived += len(ids)
+        result.batches += 1
+        last_id = ids[-1]
+        if len(ids) < batch_size:
+            break
+        sleep(pause)
+    result.seconds = time.monotonic() - started
+    logger.info(
+        "Archived %s messages in %s batches (%.1f rows/s)",
+        result.archived, result.batches, result.rows_per_second,
+    )
+    return result
+def conversation_history(conversation, before_id=None, limit=50):
+    """
+    Return up to ``limit`` messages of ``conversation`` older than
+    ``before_id``, newest first, reading through to the archive.
+    
+    Returns:
+        (list of Message and ArchivedMessage rows, has_more)
+    """
+    hot = conversation.messages.select_related('sender')
+    cold = ArchivedMessage.objects.filter(conversation=conversation).select_related('sender')
+    if before_id is not None:
+        hot = hot.filter(id__lt=before_id)
+        cold = cold.filter(id__lt=before_id)
+    # Both tables share one id sequence, so the newest ``limit + 1`` rows of
+    # each, merged by id, always contain the next page.
+    rows = list(hot.order_by('-id')[:limit + 1]) + list(cold.order_by('-id')[:limit + 1])
+    rows.sort(key=lambda row: row.id, reverse=True)
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from messages.archive import ArchivePolicy, archive_messages, estimate_archive, get_archive_policy
+from messages.tasks import schedule_archival
+class Command(BaseCommand):
+    help = "Move old read messages of inactive conversations into the archive table in small batches."
+    def add_arguments(self, parser):
+        default = get_archive_policy()
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=default.after_days,
+            help=f"Archive messages older than this many days (default: {default.after_days}).",
+        )
+        parser.add_argument(
+            "--inactive-days",
+            type=int,
+            default=default.inactive_days,
+            help=f"Only from conversations idle for this many days (default: {default.inactive_days}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Messages moved per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Seconds to pause between batches (default: 0.5).",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop after this many batches (default: no limit).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many messages would be archived.",
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Queue a daily archival job for run_workers instead of archiving now.",
+        )
+    def handle(self, *args, **options):
+        policy = ArchivePolicy(after_days=options["older_than_days"], inactive_days=options["inactive_days"])
+        batch_size: int = max(1, options["batch_size"])
+        if options["schedule"]:
+            job = schedule_archival()
+            run_at = job.run_at if job else "now (JOBS_EAGER)"
+            self.stdout.write(self.style.SUCCESS(f"Scheduled daily archival at {run_at}."))
+            return
+        if options["dry_run"]:
+            count, batches = estimate_archive(policy, batch_size=batch_size)
+            self.stdout.write(f"Would archive {count} messages in {batches} batches.")
+            return
+        result = archive_messages(
+            policy,
+            batch_size=batch_size,
+            pause=max(0.0, options["sleep"]),
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result.archived} messages in {result.batches} batches "
+            f"over {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
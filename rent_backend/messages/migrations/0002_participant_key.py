@@ -0,0 +1,59 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:19
+
+import hashlib
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def _participant_key(user_ids, property_id):
+    # Frozen copy of Conversation.make_participant_key.
+    members = ','.join(str(pk) for pk in sorted(set(user_ids)))
+    return hashlib.sha256(f"{members}|{property_id or ''}".encode()).hexdigest()
+
+
+def backfill_participant_keys(apps, schema_editor):
+    """
+    Key every existing conversation. When several share a participant set,
+    the oldest keeps the key and is the one reused from now on; the others
+    are left unkeyed so no history is deleted.
+    """
+    Conversation = apps.get_model('project_messages', 'Conversation')
+    Membership = Conversation.participants.through
+    members = defaultdict(list)
+    for conversation_id, user_id in Membership.objects.values_list('conversation_id', 'user_id').iterator():
+        members[conversation_id].append(user_id)
+    seen = set()
+    updates = []
+    for conversation in Conversation.objects.order_by('created_at', 'id').only('id', 'property_id').iterator():
+        user_ids = members.get(conversation.id)
+        if not user_ids:
+            continue
+        key = _participant_key(user_ids, conversation.property_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        conversation.participant_key = key
+        updates.append(conversation)
+    Conversation.objects.bulk_update(updates, ['participant_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_messages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the sorted participant ids and property id', max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_participant_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the sorted participant ids and property id', max_length=64, null=True, unique=True),
+        ),
+    ]
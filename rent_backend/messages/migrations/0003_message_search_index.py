@@ -0,0 +1,96 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE project_messages_message
+    ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX project_messages_message_search_idx ON project_messages_message USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS project_messages_message_search_idx",
+    "ALTER TABLE project_messages_message DROP COLUMN IF EXISTS search_vector",
+]
+# External-content FTS5 table: it stores only the index and reads content
+# from project_messages_message; triggers keep it in step with the table.
+# SQLite drops triggers when Django rebuilds a table, so a later migration
+# that alters project_messages_message must recreate them.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE project_messages_message_fts USING fts5(
+        content, content='project_messages_message', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ai AFTER INSERT ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ad AFTER DELETE ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_au AFTER UPDATE OF content ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO project_messages_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO project_messages_message_fts(project_messages_message_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_au",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ad",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ai",
+    "DROP TABLE IF EXISTS project_messages_message_fts",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+        except Exception:
+            return False
+        return True
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite' and _sqlite_has_fts5(schema_editor.connection):
+        _run(schema_editor, SQLITE_FORWARD)
+    # Other backends fall back to substring search (see messages.search).
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_messages', '0002_participant_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
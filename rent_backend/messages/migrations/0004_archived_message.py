@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_messages', '0003_message_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('attachment', models.FileField(blank=True, null=True, upload_to='message_attachments/')),
+                ('is_read', models.BooleanField(default=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='project_messages.conversation')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sent_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Message',
+                'verbose_name_plural': 'Archived Messages',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['conversation', '-id'], name='project_mes_convers_4c5967_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,106 @@
+from django.db import migrations
+
+# Contentless FTS5 table that also indexes each message's conversation as a
+# "c<id>" token in the conv column, so a search can AND the user's
+# conversations into the MATCH expression instead of ranking every global
+# hit and filtering afterwards. Contentless tables need the old values to
+# delete a row, which the triggers pass along. As with 0003, a later
+# migration that rebuilds project_messages_message must recreate them.
+SQLITE_FORWARD = [
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_au",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ad",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ai",
+    "DROP TABLE project_messages_message_fts",
+    """
+    CREATE VIRTUAL TABLE project_messages_message_fts USING fts5(
+        content, conv, content='', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ai AFTER INSERT ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(rowid, content, conv)
+        VALUES (new.id, new.content, 'c' || new.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ad AFTER DELETE ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content, conv)
+        VALUES ('delete', old.id, old.content, 'c' || old.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_au
+    AFTER UPDATE OF content, conversation_id ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content, conv)
+        VALUES ('delete', old.id, old.content, 'c' || old.conversation_id);
+        INSERT INTO project_messages_message_fts(rowid, content, conv)
+        VALUES (new.id, new.content, 'c' || new.conversation_id);
+    END
+    """,
+    """
+    INSERT INTO project_messages_message_fts(rowid, content, conv)
+    SELECT id, content, 'c' || conversation_id FROM project_messages_message
+    """,
+]
+# Back to the external-content table of 0003.
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_au",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ad",
+    "DROP TRIGGER IF EXISTS project_messages_message_fts_ai",
+    "DROP TABLE project_messages_message_fts",
+    """
+    CREATE VIRTUAL TABLE project_messages_message_fts USING fts5(
+        content, content='project_messages_message', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ai AFTER INSERT ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_ad AFTER DELETE ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER project_messages_message_fts_au AFTER UPDATE OF content ON project_messages_message BEGIN
+        INSERT INTO project_messages_message_fts(project_messages_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO project_messages_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO project_messages_message_fts(project_messages_message_fts) VALUES ('rebuild')",
+]
+
+
+def _has_fts_table(connection):
+    return 'project_messages_message_fts' in connection.introspection.table_names()
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def add_membership_to_index(apps, schema_editor):
+    # 0003 only created the table where FTS5 is available.
+    if schema_editor.connection.vendor == 'sqlite' and _has_fts_table(schema_editor.connection):
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def remove_membership_from_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite' and _has_fts_table(schema_editor.connection):
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_messages', '0004_archived_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_membership_to_index, remove_membership_from_index),
+    ]
@@ -1,3 +1,4 @@
+import hashlib
 from django.db import models
 from django.conf import settings
 class Conversation(models.Model):
@@ -18,6 +19,14 @@ class Conversation(models.Model):
         help_text='Property this conversation is about (optional)'
     )
     subject = models.CharField(max_length=255, blank=True)
+    participant_key = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Hash of the sorted participant ids and property id'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     class Meta:
@@ -27,6 +36,11 @@ class Conversation(models.Model):
     def __str__(self):
         participant_emails = ', '.join([p.email for p in self.participants.all()[:2]])
         return f"Conversation: {participant_emails}"
+    @staticmethod
+    def make_participant_key(user_ids, property_id=None):
+        """Canonical key for a participant set, independent of id order."""
+        members = ','.join(str(pk) for pk in sorted({int(pk) for pk in user_ids}))
+        return hashlib.sha256(f"{members}|{property_id or ''}".encode()).hexdigest()
     def get_last_message(self):
         """Get the last message in the conversation."""
         return self.messages.first()
@@ -59,6 +73,37 @@ class Message(models.Model):
         ordering = ['-created_at']
     def __str__(self):
         return f"Message from {self.sender.email} in {self.conversation.id}"
+class ArchivedMessage(models.Model):
+    """
+    Cold storage for old messages of inactive conversations.
+    Rows keep the id they had in Message so history can be merged and
+    paginated across both tables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='archived_messages'
+    )
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_sent_messages'
+    )
+    content = models.TextField()
+    attachment = models.FileField(upload_to='message_attachments/', null=True, blank=True)
+    is_read = models.BooleanField(default=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        verbose_name = 'Archived Message'
+        verbose_name_plural = 'Archived Messages'
+        ordering = ['-id']
+        indexes = [models.Index(fields=['conversation', '-id'])]
+    def __str__(self):
+        return f"Archived message {self.id} in {self.conversation_id}"
 class MessageReadStatus(models.Model):
     """
     Track read status of messages for each participant.
@@ -1,12 +1,35 @@
+from django.db.models import OuterRef
 from rest_framework import permissions
+from .models import Conversation
+def memberships(user, conversation_ref='pk'):
+    """Through-table rows linking ``user`` to the conversation at ``conversation_ref``."""
+    return Conversation.participants.through.objects.filter(
+        conversation_id=OuterRef(conversation_ref),
+        user_id=user.pk,
+    )
+def is_participant(request, conversation_id):
+    """
+    Return whether ``request.user`` belongs to the conversation.
+    Runs a single EXISTS against the participants through table and caches
+    the answer on the request, so repeated checks for the same conversation
+    cost nothing however many members it has.
+    """
+    cache = request.__dict__.setdefault('_conversation_membership', {})
+    if conversation_id not in cache:
+        cache[conversation_id] = Conversation.participants.through.objects.filter(
+            conversation_id=conversation_id,
+            user_id=request.user.pk,
+        ).exists()
+    return cache[conversation_id]
 class IsParticipant(permissions.BasePermission):
     """
     Permission that checks if user is a participant in the conversation.
     """
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, 'participants'):
-            return request.user in obj.participants.all()
-        if hasattr(obj, 'conversation'):
-            return request.user in obj.conversation.participants.all()
+        if not request.user or not request.user.is_authenticated:
+            return False
+        if isinstance(obj, Conversation):
+            return is_participant(request, obj.pk)
+        if hasattr(obj, 'conversation_id'):
+            return is_participant(request, obj.conversation_id)
         return False
-
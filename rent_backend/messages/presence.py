@@ -0,0 +1,109 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from .models import Conversation
+PARTICIPANTS_CACHE_TIMEOUT = 300
+def _online_ttl():
+    return float(getattr(settings, "PRESENCE_ONLINE_TTL_SECONDS", 30))
+def _typing_ttl():
+    return float(getattr(settings, "PRESENCE_TYPING_TTL_SECONDS", 6))
+class InMemoryPresenceStore:
+    """
+    Presence kept in a dict inside the current process.
+    Entries carry their own expiry and are dropped lazily on read and in a
+    periodic sweep, so memory stays proportional to active users. Only
+    suitable when a single process serves the API.
+    """
+    sweep_every = 1000
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._writes = 0
+    def heartbeat(self, conversation_id, user_id, typing=False):
+        now = self._clock()
+        with self._lock:
+            self._entries[(conversation_id, user_id)] = (
+                now,
+                now + _online_ttl(),
+                now + _typing_ttl() if typing else 0.0,
+            )
+            self._writes += 1
+            if self._writes % self.sweep_every == 0:
+                self._sweep(now)
+    def snapshot(self, conversation_id, user_ids):
+        now = self._clock()
+        result = {}
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get((conversation_id, user_id))
+                if entry is not None and entry[1] <= now:
+                    del self._entries[(conversation_id, user_id)]
+                    entry = None
+                result[user_id] = _state(entry, now)
+        return result
+    def _sweep(self, now):
+        expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+        for key in expired:
+            del self._entries[key]
+class CachePresenceStore:
+    """
+    Presence kept in a Django cache (Redis in production) so every worker
+    process sees the same state. Each user gets one key per conversation
+    whose timeout is the online TTL, and a snapshot is one get_many.
+    """
+    def __init__(self, alias='default', clock=time.time):
+        self._alias = alias
+        self._clock = clock
+    @property
+    def _cache(self):
+        return caches[self._alias]
+    @staticmethod
+    def _key(conversation_id, user_id):
+        return f"presence:{conversation_id}:{user_id}"
+    def heartbeat(self, conversation_id, user_id, typing=False):
+        now = self._clock()
+        online_ttl = _online_ttl()
+        entry = (now, now + online_ttl, now + _typing_ttl() if typing else 0.0)
+        self._cache.set(self._key(conversation_id, user_id), entry, timeout=online_ttl)
+    def snapshot(self, conversation_id, user_ids):
+        now = self._clock()
+        keys = {self._key(conversation_id, user_id): user_id for user_id in user_ids}
+        found = self._cache.get_many(list(keys))
+        return {user_id: _state(found.get(key), now) for key, user_id in keys.items()}
+def _state(entry, now):
+    if entry is None or entry[1] <= now:
+        return {'online': False, 'typing': False, 'last_seen': None}
+    last_seen, _, typing_until = entry
+    return {'online': True, 'typing': typing_until > now, 'last_seen': last_seen}
+_stores = {}
+_stores_lock = threading.Lock()
+def get_presence_store():
+    """Return the process-wide store selected by PRESENCE_BACKEND ('memory' or 'cache')."""
+    backend = getattr(settings, "PRESENCE_BACKEND", "memory")
+    with _stores_lock:
+        if backend not in _stores:
+            if backend == 'cache':
+                _stores[backend] = CachePresenceStore(getattr(settings, "PRESENCE_CACHE_ALIAS", "default"))
+            elif backend == 'memory':
+                _stores[backend] = InMemoryPresenceStore()
+            else:
+                raise ValueError(f"Unknown PRESENCE_BACKEND {backend!r}")
+        return _stores[backend]
+def conversation_participant_ids(conversation_id):
+    """
+    Participant ids of a conversation, served from the cache.
+    Participants never change after a conversation is created, so only the
+    first lookup per timeout window reads the database.
+    """
+    cache = caches[getattr(settings, "PRESENCE_CACHE_ALIAS", "default")]
+    key = f"conversation:participants:{conversation_id}"
+    participant_ids = cache.get(key)
+    if participant_ids is None:
+        participant_ids = list(
+            Conversation.participants.through.objects.filter(conversation_id=conversation_id)
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+        cache.set(key, participant_ids, timeout=PARTICIPANTS_CACHE_TIMEOUT)
+    return participant_ids
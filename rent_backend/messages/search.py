@@ -0,0 +1,143 @@
+import base64
+import functools
+import json
+import re
+from dataclasses import dataclass
+from django.db import connection, connections
+from .models import Message
+SQLITE_FTS_TABLE = 'project_messages_message_fts'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+EXCERPT_LENGTH = 160
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_MEMBERSHIP_SQL = (
+    "EXISTS (SELECT 1 FROM project_messages_conversation_participants p "
+    "WHERE p.conversation_id = m.conversation_id AND p.user_id = %s)"
+)
+@dataclass(frozen=True)
+class SearchHit:
+    message: Message
+    rank: float
+    excerpt: str
+class InvalidCursor(ValueError):
+    pass
+def encode_cursor(rank, message_id):
+    raw = json.dumps([rank, message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, message_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(rank), int(message_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor.')
+def search_terms(query):
+    return _TERM_RE.findall(query or '')
+@functools.lru_cache(maxsize=None)
+def _detect_backend(alias, vendor):
+    if vendor == 'postgresql':
+        return 'postgresql'
+    if vendor == 'sqlite' and SQLITE_FTS_TABLE in connections[alias].introspection.table_names():
+        return 'sqlite'
+    return 'fallback'
+def search_backend():
+    """
+    Return 'postgresql', 'sqlite' or 'fallback' depending on which full-text
+    index the 0003 migration could create on this database. The table check
+    runs once per process, so restart workers after migrating.
+    """
+    return _detect_backend(connection.alias, connection.vendor)
+def _ranked_sql(backend, terms, user):
+    """
+    Return (inner SQL selecting id and rank, params) for ``backend``, or
+    (None, None) when ``user`` has no conversations to search.
+    """
+    if backend == 'postgresql':
+        sql = (
+            "SELECT m.id AS id, ts_rank(m.search_vector, q) AS rank "
+            "FROM project_messages_message m, plainto_tsquery('simple', %s) q "
+            "WHERE m.search_vector @@ q AND " + _MEMBERSHIP_SQL
+        )
+        return sql, [' '.join(terms), user.pk]
+    # The conv column holds a "c<conversation id>" token per message (see
+    # migration 0005), so FTS5 intersects the terms with the user's
+    # conversations itself and only ranks rows the user can see.
+    # bm25() is lower-is-better; negate it so both backends sort rank DESC.
+    sql = (
+        f"SELECT m.id AS id, -bm25({SQLITE_FTS_TABLE}, 1.0, 0.0) AS rank "
+        f"FROM {SQLITE_FTS_TABLE} JOIN project_messages_message m ON m.id = {SQLITE_FTS_TABLE}.rowid "
+        f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND " + _MEMBERSHIP_SQL
+    )
+    conversations = list(user.conversations.values_list('id', flat=True))
+    if not conversations:
+        return None, None
+    # Quote every term so user input is never parsed as FTS5 syntax.
+    match = 'content : (%s) AND conv : (%s)' % (
+        ' '.join('"%s"' % term for term in terms),
+        ' OR '.join('"c%d"' % pk for pk in conversations),
+    )
+    return sql, [match, user.pk]
+def _ranked_ids(user, terms, after, limit):
+    backend = search_backend()
+    if backend == 'fallback':
+        return _fallback_ids(user, terms, after, limit)
+    inner, params = _ranked_sql(backend, terms, user)
+    if inner is None:
+        return []
+    sql = f"SELECT id, rank FROM ({inner}) hits"
+    if after is not None:
+        sql += " WHERE rank < %s OR (rank = %s AND id < %s)"
+        params.extend([after[0], after[0], after[1]])
+    sql += " ORDER BY rank DESC, id DESC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+def _fallback_ids(user, terms, after, limit):
+    """Substring match for databases without a full-text index; rank is 0."""
+    queryset = Message.objects.filter(conversation__participants=user)
+    for term in terms:
+        queryset = queryset.filter(content__icontains=term)
+    if after is not None:
+        queryset = queryset.filter(id__lt=after[1])
+    ids = queryset.order_by('-id').values_list('id', flat=True)[:limit]
+    return [(pk, 0.0) for pk in ids]
+def make_excerpt(content, terms, length=EXCERPT_LENGTH):
+    """Return up to ``length`` characters of ``content`` around the first term."""
+    if len(content) <= length:
+        return content
+    lowered = content.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    first = min((p for p in positions if p >= 0), default=0)
+    start = max(0, min(first - length // 3, len(content) - length))
+    excerpt = content[start:start + length]
+    prefix = '…' if start else ''
+    suffix = '…' if start + length < len(content) else ''
+    return f"{prefix}{excerpt}{suffix}"
+def search_messages(user, query, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Full-text search over messages in conversations ``user`` belongs to.
+    Hits are ordered by rank, then id, and paginated with a keyset cursor on
+    that pair rather than an offset, so new messages never shift later pages.
+    Only the hot message table is indexed: messages moved to ArchivedMessage
+    are not searchable and are reached through conversation history.
+    
+    Returns:
+        (list of SearchHit, next cursor or None)
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+    limit = max(1, min(limit, MAX_LIMIT))
+    after = decode_cursor(cursor) if cursor else None
+    ranked = _ranked_ids(user, terms, after, limit + 1)
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+    messages = Message.objects.select_related('sender', 'conversation').in_bulk([pk for pk, _ in ranked])
+    hits = [
+        SearchHit(message=messages[pk], rank=rank, excerpt=make_excerpt(messages[pk].content, terms))
+        for pk, rank in ranked
+        if pk in messages
+    ]
+    next_cursor = encode_cursor(ranked[-1][1], ranked[-1][0]) if has_more else None
+    return hits, next_cursor
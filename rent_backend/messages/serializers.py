@@ -1,6 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Conversation, Message, MessageReadStatus
+from .models import ArchivedMessage, Conversation, Message, MessageReadStatus
 from users.serializers import UserSerializer
+User = get_user_model()
+# Archived messages shown under a conversation's hot ones; older pages come
+# from the history action.
+DETAIL_ARCHIVED_TAIL = 20
+def newest_archived():
+    """ArchivedMessage rows with their sender, newest first."""
+    return ArchivedMessage.objects.select_related('sender').order_by('-created_at', '-id')
 class MessageSerializer(serializers.ModelSerializer):
     """
     Serializer for Message model.
@@ -23,6 +32,24 @@ class MessageSerializer(serializers.ModelSerializer):
         if obj.attachment and request:
             return request.build_absolute_uri(obj.attachment.url)
         return None
+class ArchivedMessageSerializer(MessageSerializer):
+    """
+    Serializer for archived messages, shaped like MessageSerializer.
+    """
+    class Meta(MessageSerializer.Meta):
+        model = ArchivedMessage
+class MessageSearchHitSerializer(serializers.Serializer):
+    """
+    Serializer for a message search hit with its conversation context.
+    """
+    id = serializers.IntegerField(source='message.id')
+    conversation = serializers.IntegerField(source='message.conversation_id')
+    conversation_subject = serializers.CharField(source='message.conversation.subject')
+    sender = serializers.IntegerField(source='message.sender_id')
+    sender_name = serializers.CharField(source='message.sender.get_full_name')
+    excerpt = serializers.CharField()
+    rank = serializers.FloatField()
+    created_at = serializers.DateTimeField(source='message.created_at')
 class ConversationListSerializer(serializers.ModelSerializer):
     """
     Lightweight serializer for listing conversations.
@@ -39,8 +66,15 @@ class ConversationListSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
     def get_last_message(self, obj):
-        """Get the last message in the conversation."""
+        """Get the last message in the conversation, from the archive once all were archived."""
         last_message = obj.get_last_message()
+        if last_message is None:
+            # The list view prefetches this; other callers query it.
+            if hasattr(obj, 'last_archived'):
+                archived = obj.last_archived
+            else:
+                archived = list(newest_archived().filter(conversation=obj)[:1])
+            last_message = archived[0] if archived else None
         if last_message:
             return {
                 'id': last_message.id,
@@ -68,7 +102,7 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
     Detailed serializer for conversation with messages.
     """
     participants = UserSerializer(many=True, read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
     other_participant = serializers.SerializerMethodField()
     class Meta:
         model = Conversation
@@ -76,6 +110,21 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
             'id', 'participants', 'other_participant', 'property',
             'subject', 'messages', 'created_at', 'updated_at'
         ]
+    def get_messages(self, obj):
+        """
+        Hot messages plus the newest DETAIL_ARCHIVED_TAIL archived ones,
+        newest first, in the MessageSerializer shape. Older archived
+        messages are paged through the history action.
+        """
+        archived = list(newest_archived().filter(conversation=obj)[:DETAIL_ARCHIVED_TAIL])
+        rows = list(obj.messages.all()) + archived
+        rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+        return [
+            (ArchivedMessageSerializer if isinstance(row, ArchivedMessage) else MessageSerializer)(
+                row, context=self.context,
+            ).data
+            for row in rows
+        ]
     def get_other_participant(self, obj):
         """Get the other participant in a two-person conversation."""
         request = self.context.get('request')
@@ -96,17 +145,36 @@ class ConversationCreateSerializer(serializers.ModelSerializer):
         model = Conversation
         fields = ['id', 'participant_ids', 'property', 'subject']
     def validate_participant_ids(self, value):
-        """Ensure at least one other participant."""
+        """Ensure at least one other participant and that all of them exist."""
         if len(value) < 1:
             raise serializers.ValidationError("At least one other participant is required.")
+        value = set(value)
+        if User.objects.filter(pk__in=value).count() != len(value):
+            raise serializers.ValidationError("One or more participants do not exist.")
         return value
     def create(self, validated_data):
-        """Create conversation with participants."""
-        participant_ids = validated_data.pop('participant_ids')
+        """
+        Return the conversation for this participant set and property,
+        creating it if needed. ``self.created`` tells the view which happened.
+        """
         request = self.context.get('request')
-        conversation = Conversation.objects.create(**validated_data)
-        conversation.participants.add(request.user)
-        for participant_id in participant_ids:
-            conversation.participants.add(participant_id)
+        user_ids = validated_data.pop('participant_ids') | {request.user.pk}
+        prop = validated_data.get('property')
+        key = Conversation.make_participant_key(user_ids, prop.pk if prop else None)
+        self.created = False
+        conversation = Conversation.objects.filter(participant_key=key).first()
+        if conversation is not None:
+            return conversation
+        try:
+            with transaction.atomic():
+                conversation = Conversation.objects.create(participant_key=key, **validated_data)
+                Conversation.participants.through.objects.bulk_create([
+                    Conversation.participants.through(conversation_id=conversation.pk, user_id=user_id)
+                    for user_id in user_ids
+                ])
+        except IntegrityError:
+            # Another request created the same conversation first.
+            return Conversation.objects.get(participant_key=key)
+        self.created = True
         return conversation
 
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.utils import timezone
+from jobs.queue import enqueue, task
+from .archive import archive_messages
+@task('messages.archive')
+def archive_old_messages(batch_size=1000, pause=0.5):
+    """Apply the archive policy, then queue tomorrow's run."""
+    try:
+        archive_messages(batch_size=batch_size, pause=pause)
+    finally:
+        schedule_archival()
+def schedule_archival():
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    run_at = today + timedelta(days=1)
+    return enqueue(
+        'messages.archive',
+        run_at=run_at,
+        idempotency_key=f'messages.archive:{run_at.isoformat()}',
+    )
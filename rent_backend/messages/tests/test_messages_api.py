@@ -1,9 +1,21 @@
 import datetime
+from unittest import mock
+from io import StringIO
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
+from messages.models import ArchivedMessage, Conversation, Message
+from messages import presence
+from messages.permissions import IsParticipant
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from notifications.models import Notification
 from properties.models import Property
+from users.revocation import revocation_list
 User = get_user_model()
 def _create_user(*, email: str, role: str):
     return User.objects.create_user(
@@ -50,11 +62,12 @@ class MessagesApiTests(APITestCase):
         )
         self.assertEqual(res_create.status_code, 201)
         conversation_id = res_create.data["id"]
-        res_send = self.client.post(
-            f"/api/messages/conversations/{conversation_id}/send_message/",
-            data={"content": "Hello"},
-            format="json",
-        )
+        with override_settings(JOBS_EAGER=True):
+            res_send = self.client.post(
+                f"/api/messages/conversations/{conversation_id}/send_message/",
+                data={"content": "Hello"},
+                format="json",
+            )
         self.assertEqual(res_send.status_code, 201)
         self.assertTrue(
             Notification.objects.filter(
@@ -84,3 +97,210 @@ class MessagesApiTests(APITestCase):
         self.assertGreaterEqual(len(messages), 1)
         self.assertTrue(messages[0]["is_read"])
 
+    def test_participant_check_is_one_exists_query_cached_per_request(self):
+        members = [_create_user(email=f"member{i}@example.com", role="tenant") for i in range(20)]
+        conversation = Conversation.objects.create(subject="Group")
+        conversation.participants.add(self.tenant, *members)
+        message = Message.objects.create(conversation=conversation, sender=members[0], content="Hi")
+        request = APIRequestFactory().get("/")
+        request.user = self.tenant
+        permission = IsParticipant()
+        with self.assertNumQueries(1):
+            self.assertTrue(permission.has_object_permission(request, None, conversation))
+            self.assertTrue(permission.has_object_permission(request, None, message))
+        request = APIRequestFactory().get("/")
+        request.user = self.landlord
+        self.assertFalse(permission.has_object_permission(request, None, message))
+    def test_non_participant_cannot_mark_message_read(self):
+        conversation = Conversation.objects.create(subject="Private")
+        conversation.participants.add(self.tenant)
+        message = Message.objects.create(conversation=conversation, sender=self.tenant, content="Hi")
+        self.client.force_authenticate(self.landlord)
+        res = self.client.post(f"/api/messages/messages/{message.id}/mark_read/")
+        self.assertEqual(res.status_code, 404)
+    def test_create_reuses_conversation_for_same_participants_and_property(self):
+        self.client.force_authenticate(self.tenant)
+        payload = {"participant_ids": [self.landlord.id], "property": self.prop.id, "subject": "Q"}
+        first = self.client.post("/api/messages/conversations/", data=payload, format="json")
+        self.assertEqual(first.status_code, 201)
+        self.client.force_authenticate(self.landlord)
+        with self.assertNumQueries(3):
+            again = self.client.post(
+                "/api/messages/conversations/",
+                data={"participant_ids": [self.tenant.id, self.landlord.id], "property": self.prop.id},
+                format="json",
+            )
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data["id"], first.data["id"])
+        other = self.client.post("/api/messages/conversations/", data={"participant_ids": [self.tenant.id]}, format="json")
+        self.assertEqual(other.status_code, 201)
+        self.assertNotEqual(other.data["id"], first.data["id"])
+        self.assertEqual(Conversation.objects.count(), 2)
+        self.assertEqual(Conversation.objects.get(pk=first.data["id"]).participants.count(), 2)
+    def test_create_rejects_unknown_participants(self):
+        self.client.force_authenticate(self.tenant)
+        res = self.client.post("/api/messages/conversations/", data={"participant_ids": [999999]}, format="json")
+        self.assertEqual(res.status_code, 400)
+    def test_search_is_ranked_scoped_and_cursor_paginated(self):
+        mine = Conversation.objects.create(subject="Lease")
+        mine.participants.add(self.tenant, self.landlord)
+        theirs = Conversation.objects.create(subject="Other")
+        theirs.participants.add(self.landlord)
+        for content in ["The boiler is broken", "boiler boiler repair today", "Rent is due"]:
+            Message.objects.create(conversation=mine, sender=self.landlord, content=content)
+        Message.objects.create(conversation=theirs, sender=self.landlord, content="secret boiler note")
+        self.client.force_authenticate(self.tenant)
+        first = self.client.get("/api/messages/messages/search/", {"q": "Boiler!", "limit": 1})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.data["results"]), 1)
+        self.assertEqual(first.data["results"][0]["excerpt"], "boiler boiler repair today")
+        self.assertEqual(first.data["results"][0]["conversation_subject"], "Lease")
+        second = self.client.get("/api/messages/messages/search/", {"q": "Boiler!", "limit": 1, "cursor": first.data["next_cursor"]})
+        self.assertEqual([r["excerpt"] for r in second.data["results"]], ["The boiler is broken"])
+        self.assertIsNone(second.data["next_cursor"])
+        Message.objects.filter(content="Rent is due").update(content="Rent and boiler are due")
+        res = self.client.get("/api/messages/messages/search/", {"q": "rent boiler"})
+        self.assertEqual([r["excerpt"] for r in res.data["results"]], ["Rent and boiler are due"])
+        self.assertEqual(self.client.get("/api/messages/messages/search/", {"q": ""}).status_code, 400)
+        self.assertEqual(self.client.get("/api/messages/messages/search/", {"q": "x", "cursor": "bad"}).status_code, 400)
+    def test_search_matches_membership_inside_the_index(self):
+        mine = Conversation.objects.create(subject="Lease")
+        mine.participants.add(self.tenant, self.landlord)
+        theirs = Conversation.objects.create(subject="Other")
+        theirs.participants.add(self.landlord)
+        # Conversation tokens live in their own column, so content naming
+        # another conversation does not make it visible.
+        Message.objects.create(conversation=theirs, sender=self.landlord, content=f"boiler c{mine.pk}")
+        moved = Message.objects.create(conversation=theirs, sender=self.landlord, content="moved boiler")
+        deleted = Message.objects.create(conversation=mine, sender=self.landlord, content="deleted boiler")
+        deleted.delete()
+        self.client.force_authenticate(self.tenant)
+        res = self.client.get("/api/messages/messages/search/", {"q": "boiler"})
+        self.assertEqual(res.data["results"], [])
+        Message.objects.filter(pk=moved.pk).update(conversation=mine)
+        res = self.client.get("/api/messages/messages/search/", {"q": "boiler"})
+        self.assertEqual([r["excerpt"] for r in res.data["results"]], ["moved boiler"])
+        self.client.force_authenticate(_create_user(email="outsider@example.com", role="tenant"))
+        self.assertEqual(self.client.get("/api/messages/messages/search/", {"q": "boiler"}).data["results"], [])
+    def test_search_backend_is_detected_once_per_process(self):
+        self.client.force_authenticate(self.tenant)
+        self.client.get("/api/messages/messages/search/", {"q": "boiler"})
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get("/api/messages/messages/search/", {"q": "boiler"}).status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if "sqlite_master" in q["sql"]])
+    def test_archive_moves_old_read_messages_and_history_reads_through(self):
+        conversation = Conversation.objects.create(subject="Old lease")
+        conversation.participants.add(self.tenant, self.landlord)
+        old = timezone.now() - datetime.timedelta(days=400)
+        messages = [
+            Message.objects.create(conversation=conversation, sender=self.landlord, content=f"m{i}", is_read=i != 1)
+            for i in range(4)
+        ]
+        Message.objects.filter(pk__in=[m.pk for m in messages[:3]]).update(created_at=old)
+        Conversation.objects.filter(pk=conversation.pk).update(updated_at=old)
+        out = StringIO()
+        call_command("archive_messages", "--batch-size", "1", "--sleep", "0", stdout=out)
+        self.assertIn("Archived 2 messages in 2 batches", out.getvalue())
+        self.assertEqual(set(ArchivedMessage.objects.values_list("id", flat=True)), {messages[0].pk, messages[2].pk})
+        self.assertEqual(Message.objects.filter(conversation=conversation).count(), 2)
+        self.client.force_authenticate(self.tenant)
+        url = f"/api/messages/conversations/{conversation.id}/history/"
+        page = self.client.get(url, {"limit": 3})
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual([r["content"] for r in page.data["results"]], ["m3", "m2", "m1"])
+        self.assertEqual([r["archived"] for r in page.data["results"]], [False, True, False])
+        rest = self.client.get(url, {"before_id": page.data["next_before_id"]})
+        self.assertEqual([r["content"] for r in rest.data["results"]], ["m0"])
+        self.assertIsNone(rest.data["next_before_id"])
+    def test_list_and_detail_read_archived_messages(self):
+        conversation = Conversation.objects.create(subject="Old lease")
+        conversation.participants.add(self.tenant, self.landlord)
+        old = timezone.now() - datetime.timedelta(days=400)
+        for i in range(2):
+            Message.objects.create(conversation=conversation, sender=self.landlord, content=f"m{i}", is_read=True)
+        Message.objects.filter(conversation=conversation).update(created_at=old)
+        Conversation.objects.filter(pk=conversation.pk).update(updated_at=old)
+        call_command("archive_messages", "--sleep", "0", stdout=StringIO())
+        self.assertFalse(Message.objects.filter(conversation=conversation).exists())
+        self.client.force_authenticate(self.tenant)
+        listed = {c["id"]: c for c in self.client.get("/api/messages/conversations/").data}
+        self.assertEqual(listed[conversation.id]["last_message"]["content"], "m1")
+        Message.objects.create(conversation=conversation, sender=self.tenant, content="m2")
+        with mock.patch("messages.serializers.DETAIL_ARCHIVED_TAIL", 1):
+            detail = self.client.get(f"/api/messages/conversations/{conversation.id}/")
+        self.assertEqual([m["content"] for m in detail.data["messages"]], ["m2", "m1"])
+    def test_list_reads_archived_last_messages_in_constant_queries(self):
+        old = timezone.now() - datetime.timedelta(days=400)
+        def archived_conversation(subject):
+            conversation = Conversation.objects.create(subject=subject)
+            conversation.participants.add(self.tenant, self.landlord)
+            Message.objects.create(conversation=conversation, sender=self.landlord, content=subject, is_read=True)
+            Message.objects.filter(conversation=conversation).update(created_at=old)
+            Conversation.objects.filter(pk=conversation.pk).update(updated_at=old)
+        archived_conversation("first")
+        call_command("archive_messages", "--sleep", "0", stdout=StringIO())
+        self.client.force_authenticate(self.tenant)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/api/messages/conversations/")
+        archived_conversation("second")
+        archived_conversation("third")
+        call_command("archive_messages", "--sleep", "0", stdout=StringIO())
+        with CaptureQueriesContext(connection) as many:
+            listed = self.client.get("/api/messages/conversations/").data
+        archive_table = ArchivedMessage._meta.db_table
+        count = lambda ctx: len([q for q in ctx.captured_queries if archive_table in q["sql"]])
+        self.assertEqual(count(many), count(few))
+        self.assertEqual(sorted(c["last_message"]["content"] for c in listed), ["first", "second", "third"])
+class PresenceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        presence._stores.clear()
+        revocation_list.rebuild()
+        self.tenant = _create_user(email="tenant@example.com", role="tenant")
+        self.landlord = _create_user(email="landlord@example.com", role="landlord")
+        self.outsider = _create_user(email="outsider@example.com", role="tenant")
+        self.conversation = Conversation.objects.create(subject="Q")
+        self.conversation.participants.add(self.tenant, self.landlord)
+        self.url = f"/api/messages/conversations/{self.conversation.id}/presence/"
+    def _authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    def test_heartbeat_and_presence_skip_the_database_when_warm(self):
+        self._authenticate(self.tenant)
+        res = self.client.post(self.url, {"typing": True}, format="json")
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(0):
+            self.client.post(self.url, {"typing": True}, format="json")
+            self._authenticate(self.landlord)
+            res = self.client.get(self.url)
+        states = {p["user"]: p for p in res.data["participants"]}
+        self.assertTrue(states[self.tenant.id]["online"])
+        self.assertTrue(states[self.tenant.id]["typing"])
+        self.assertFalse(states[self.landlord.id]["online"])
+        self._authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+    def test_logged_out_token_is_refused(self):
+        refresh = RefreshToken.for_user(self.tenant)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        res = self.client.post("/api/users/logout/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.post(self.url, {"typing": True}, format="json").status_code, 401)
+    @override_settings(PRESENCE_BACKEND="cache")
+    def test_cache_store_matches_memory_store(self):
+        self._authenticate(self.landlord)
+        self.client.post(self.url, {}, format="json")
+        res = self.client.get(self.url)
+        states = {p["user"]: p for p in res.data["participants"]}
+        self.assertTrue(states[self.landlord.id]["online"])
+        self.assertFalse(states[self.landlord.id]["typing"])
+    @override_settings(PRESENCE_ONLINE_TTL_SECONDS=30, PRESENCE_TYPING_TTL_SECONDS=5)
+    def test_entries_expire_after_their_ttl(self):
+        now = [1000.0]
+        store = presence.InMemoryPresenceStore(clock=lambda: now[0])
+        store.heartbeat(1, 7, typing=True)
+        self.assertEqual(store.snapshot(1, [7])[7], {"online": True, "typing": True, "last_seen": 1000.0})
+        now[0] += 10
+        self.assertEqual(store.snapshot(1, [7])[7]["typing"], False)
+        now[0] += 30
+        self.assertEqual(store.snapshot(1, [7])[7]["online"], False)
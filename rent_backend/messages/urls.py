@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ConversationViewSet, MessageViewSet
+from .views import ConversationPresenceView, ConversationViewSet, MessageViewSet
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
 router.register(r'messages', MessageViewSet, basename='message')
 app_name = 'messages'
 urlpatterns = [
+    path('conversations/<int:pk>/presence/', ConversationPresenceView.as_view(), name='conversation-presence'),
     path('', include(router.urls)),
 ]
 
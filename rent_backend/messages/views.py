@@ -1,31 +1,46 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.db.models import Q
+from django.db.models import Exists, Prefetch, Q
 from django.utils import timezone
-from .models import Conversation, Message
+from .archive import conversation_history
+from .models import ArchivedMessage, Conversation, Message
 from .serializers import (
     ConversationListSerializer, ConversationDetailSerializer,
-    ConversationCreateSerializer, MessageSerializer
+    ConversationCreateSerializer, MessageSerializer, MessageSearchHitSerializer,
+    ArchivedMessageSerializer, newest_archived
 )
-from .permissions import IsParticipant
-from notifications.utils import create_notification
+from .permissions import IsParticipant, memberships
+from .presence import conversation_participant_ids, get_presence_store
+from .search import DEFAULT_LIMIT, InvalidCursor, search_messages
+from badges import counters as badges
+from notifications.utils import notify_conversation_participants
+from users.authentication import StatelessJWTAuthentication
 class ConversationViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Conversation CRUD operations.
     
     list: GET /api/messages/conversations/ - List user's conversations
     retrieve: GET /api/messages/conversations/{id}/ - Get conversation details
-    create: POST /api/messages/conversations/ - Start new conversation
+    create: POST /api/messages/conversations/ - Start new conversation, or
+        return the existing one (200) for the same participants and property
     """
     permission_classes = [IsAuthenticated, IsParticipant]
     def get_queryset(self):
         """Get conversations where user is a participant."""
-        return Conversation.objects.filter(
-            participants=self.request.user
-        ).prefetch_related('participants', 'messages__sender').distinct()
+        queryset = Conversation.objects.filter(Exists(memberships(self.request.user)))
+        if self.action == 'history':
+            return queryset
+        queryset = queryset.prefetch_related('participants', 'messages__sender')
+        if self.action == 'list':
+            queryset = queryset.prefetch_related(
+                Prefetch('archived_messages', queryset=newest_archived()[:1], to_attr='last_archived')
+            )
+        return queryset
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'list':
@@ -33,6 +48,14 @@ class ConversationViewSet(viewsets.ModelViewSet):
         elif self.action == 'create':
             return ConversationCreateSerializer
         return ConversationDetailSerializer
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK
+        )
     def retrieve(self, request, *args, **kwargs):
         """Get conversation and mark messages as read."""
         conversation = self.get_object()
@@ -43,6 +66,12 @@ class ConversationViewSet(viewsets.ModelViewSet):
             message.is_read = True
             message.read_at = timezone.now()
         Message.objects.bulk_update(unread_messages, ['is_read', 'read_at'])
+        if unread_messages:
+            badges.messages_changed(
+                [p.pk for p in conversation.participants.all()],
+                [m.sender_id for m in unread_messages],
+                sign=-1,
+            )
         if hasattr(conversation, "_prefetched_objects_cache"):
             conversation._prefetched_objects_cache = {}
         serializer = self.get_serializer(conversation)
@@ -62,20 +91,43 @@ class ConversationViewSet(viewsets.ModelViewSet):
         )
         conversation.updated_at = timezone.now()
         conversation.save()
-        other_participants = conversation.participants.exclude(id=request.user.id)
-        for participant in other_participants:
-            create_notification(
-                recipient=participant,
-                notification_type='message',
-                title='New Message',
-                message=f'{request.user.get_full_name()} sent you a message',
-                related_object_type='conversation',
-                related_object_id=conversation.id
-            )
+        badges.messages_changed([p.pk for p in conversation.participants.all()], [message.sender_id], sign=1)
+        get_presence_store().heartbeat(conversation.pk, request.user.pk, typing=False)
+        notify_conversation_participants(
+            conversation,
+            request.user,
+            notification_type='message',
+            title='New Message',
+            message=f'{request.user.get_full_name()} sent you a message',
+        )
         return Response(
             MessageSerializer(message, context={'request': request}).data,
             status=status.HTTP_201_CREATED
         )
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Page through a conversation's messages, newest first, including
+        messages that were moved to the archive.
+        GET /api/messages/conversations/{id}/history/?before_id=<id>&limit=<n>
+        """
+        conversation = self.get_object()
+        try:
+            before_id = int(request.query_params['before_id']) if request.query_params.get('before_id') else None
+            limit = max(1, min(int(request.query_params.get('limit') or 50), 200))
+        except ValueError:
+            raise ValidationError({'detail': 'before_id and limit must be integers.'})
+        rows, has_more = conversation_history(conversation, before_id=before_id, limit=limit)
+        context = self.get_serializer_context()
+        results = []
+        for row in rows:
+            archived = isinstance(row, ArchivedMessage)
+            serializer_class = ArchivedMessageSerializer if archived else MessageSerializer
+            results.append({**serializer_class(row, context=context).data, 'archived': archived})
+        return Response({
+            'results': results,
+            'next_before_id': rows[-1].id if has_more else None,
+        })
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """
@@ -95,7 +147,7 @@ class MessageViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Get messages from user's conversations."""
         return Message.objects.filter(
-            conversation__participants=self.request.user
+            Exists(memberships(self.request.user, 'conversation_id'))
         ).select_related('sender', 'conversation')
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -104,10 +156,78 @@ class MessageViewSet(viewsets.ModelViewSet):
         POST /api/messages/{id}/mark_read/
         """
         message = self.get_object()
-        if message.sender != request.user:
+        if message.sender != request.user and not message.is_read:
             message.is_read = True
             message.read_at = timezone.now()
             message.save()
+            badges.adjust(
+                Conversation.participants.through.objects.filter(
+                    conversation_id=message.conversation_id
+                ).exclude(user_id=message.sender_id).values('user_id'),
+                badges.UNREAD_MESSAGES,
+                -1,
+            )
         serializer = self.get_serializer(message)
         return Response(serializer.data)
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the user's conversations. Archived messages
+        are not searched; page through them with conversation history.
+        GET /api/messages/messages/search/?q=<text>&cursor=<cursor>&limit=<n>
+        """
+        query = (request.query_params.get('q') or '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        try:
+            limit = int(request.query_params.get('limit') or DEFAULT_LIMIT)
+            hits, next_cursor = search_messages(
+                request.user, query, cursor=request.query_params.get('cursor'), limit=limit
+            )
+        except InvalidCursor as exc:
+            raise ValidationError({'cursor': str(exc)})
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        return Response({
+            'results': MessageSearchHitSerializer(hits, many=True).data,
+            'next_cursor': next_cursor,
+        })
+    def perform_destroy(self, instance):
+        participant_ids = list(instance.conversation.participants.values_list('pk', flat=True))
+        was_unread = not instance.is_read
+        instance.delete()
+        if was_unread:
+            badges.messages_changed(participant_ids, [instance.sender_id], sign=-1)
 
+class ConversationPresenceView(APIView):
+    """
+    Who is online and typing in a conversation.
+    
+    GET /api/messages/conversations/{id}/presence/ - Presence of all participants
+    POST /api/messages/conversations/{id}/presence/ - Heartbeat ({"typing": bool}),
+        returns the same payload as GET
+    
+    Authentication reads the user from the token claims (revoked tokens are
+    still refused) and membership comes from the cache, so a warm heartbeat
+    never queries the database.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    def _participants(self, pk):
+        participant_ids = conversation_participant_ids(pk)
+        if int(self.request.user.pk) not in participant_ids:
+            raise NotFound()
+        return participant_ids
+    def _presence_response(self, pk, participant_ids):
+        states = get_presence_store().snapshot(pk, participant_ids)
+        return Response({
+            'conversation': pk,
+            'participants': [{'user': user_id, **state} for user_id, state in states.items()],
+        })
+    def get(self, request, pk):
+        return self._presence_response(pk, self._participants(pk))
+    def post(self, request, pk):
+        participant_ids = self._participants(pk)
+        typing = request.data.get('typing') in (True, 'true', '1', 1)
+        get_presence_store().heartbeat(pk, int(request.user.pk), typing=typing)
+        return self._presence_response(pk, participant_ids)
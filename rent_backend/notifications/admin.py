@@ -3,13 +3,14 @@ from .models import Notification, NotificationPreference
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = [
-        'recipient', 'notification_type', 'title', 'is_read', 'created_at'
+        'recipient', 'notification_type', 'title', 'count', 'is_read', 'created_at'
     ]
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['recipient__email', 'title', 'message']
     readonly_fields = ['created_at', 'read_at']
 @admin.register(NotificationPreference)
 class NotificationPreferenceAdmin(admin.ModelAdmin):
-    list_display = ['user', 'email_on_message', 'app_on_message', 'updated_at']
+    list_display = ['user', 'email_on_message', 'app_on_message', 'email_digest', 'updated_at']
+    list_filter = ['email_digest']
     search_fields = ['user__email']
 
@@ -0,0 +1,105 @@
+import logging
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from .models import Notification, NotificationPreference
+logger = logging.getLogger(__name__)
+DIGEST_BATCH_SIZE = 200
+def next_digest_run(frequency, now=None):
+    """Return the start of the next hour (hourly) or next UTC day (daily)."""
+    now = now or timezone.now()
+    if frequency == NotificationPreference.DIGEST_DAILY:
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start + timedelta(days=1)
+    start = now.replace(minute=0, second=0, microsecond=0)
+    return start + timedelta(hours=1)
+def build_digest_email(recipient, notifications, frequency):
+    """Build one EmailMessage summarising ``notifications`` for ``recipient``."""
+    count = len(notifications)
+    subject_prefix = getattr(settings, "EMAIL_SUBJECT_PREFIX", "")
+    subject = f"{subject_prefix}Your {frequency} Ejar digest: {count} new notification{'s' if count != 1 else ''}".strip()
+    greeting_name = (recipient.first_name or "").strip() or "there"
+    lines = [f"Hello {greeting_name},", "", f"Here is what happened since your last {frequency} digest:", ""]
+    for notification in notifications:
+        lines.append(f"- {notification.title}: {notification.message}")
+    lines.extend(["", "You can change how often you receive these emails in your notification preferences."])
+    return EmailMessage(
+        subject=subject,
+        body="\n".join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient.email],
+    )
+def _pending_rows(queryset, cutoff):
+    return (
+        queryset.filter(created_at__lte=cutoff)
+        .select_related('recipient')
+        .only('id', 'title', 'message', 'recipient__email', 'recipient__first_name')
+        .order_by('recipient_id', 'created_at')
+    )
+def _send_rows(connection, rows, frequency, cutoff):
+    """
+    Email each recipient in ``rows`` one digest and clear exactly the rows
+    that went out. A row coalesced after ``cutoff`` has new text that was
+    not mailed, so its newer created_at keeps it pending.
+    
+    Returns:
+        Number of digest emails sent
+    """
+    messages = []
+    notification_ids = []
+    for recipient_id, notifications in groupby(rows, key=lambda n: n.recipient_id):
+        notifications = list(notifications)
+        messages.append(build_digest_email(notifications[0].recipient, notifications, frequency))
+        notification_ids.extend(n.id for n in notifications)
+    if not messages:
+        return 0
+    sent = connection.send_messages(messages) or 0
+    Notification.objects.filter(id__in=notification_ids, created_at__lte=cutoff).update(email_pending=False)
+    return sent
+def send_digests(frequency, batch_size=DIGEST_BATCH_SIZE):
+    """
+    Email every user on ``frequency`` digests their pending notifications.
+    Each user receives a single message; all messages go out over one
+    reused mail connection, ``batch_size`` users at a time.
+    
+    Returns:
+        Number of digest emails sent
+    """
+    cutoff = timezone.now()
+    pending = Notification.objects.filter(
+        email_pending=True,
+        recipient__notification_preferences__email_digest=frequency,
+    )
+    recipient_ids = list(pending.order_by().values_list('recipient_id', flat=True).distinct())
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        for start in range(0, len(recipient_ids), batch_size):
+            rows = _pending_rows(pending.filter(recipient_id__in=recipient_ids[start:start + batch_size]), cutoff)
+            sent += _send_rows(connection, rows, frequency, cutoff)
+    finally:
+        connection.close()
+    logger.info("Sent %s %s notification digests", sent, frequency)
+    return sent
+def flush_digest(user_id, frequency):
+    """
+    Email ``user_id`` the notifications still waiting for their
+    ``frequency`` digest, once they have switched to immediate emails.
+    send_digests only picks up users still on a digest, so without this
+    the rows would stay pending forever.
+    
+    Returns:
+        Number of digest emails sent (0 or 1)
+    """
+    if NotificationPreference.objects.filter(user_id=user_id).exclude(
+        email_digest=NotificationPreference.DIGEST_IMMEDIATE
+    ).exists():
+        # Back on a digest before this ran; the next run mails the rows.
+        return 0
+    cutoff = timezone.now()
+    rows = _pending_rows(Notification.objects.filter(recipient_id=user_id, email_pending=True), cutoff)
+    with get_connection(fail_silently=False) as connection:
+        return _send_rows(connection, rows, frequency, cutoff)
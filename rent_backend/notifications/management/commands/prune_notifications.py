@@ -0,0 +1,75 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from notifications.tasks import schedule_pruning
+from notifications.retention import RetentionPolicy, estimate_prune, get_retention_policy, prune_notifications
+class Command(BaseCommand):
+    help = "Delete notifications older than the retention policy in small primary-key batches."
+    def add_arguments(self, parser):
+        default = get_retention_policy()
+        parser.add_argument(
+            "--read-days",
+            type=int,
+            default=default.read_days,
+            help=f"Delete read notifications older than this many days (default: {default.read_days}).",
+        )
+        parser.add_argument(
+            "--unread-days",
+            type=int,
+            default=default.unread_days,
+            help=f"Delete unread notifications older than this many days (default: {default.unread_days}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per statement (default: 1000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Seconds to pause between batches (default: 0.5).",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop after this many batches (default: no limit).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows would be deleted.",
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Queue a daily pruning job for run_workers instead of pruning now.",
+        )
+    def handle(self, *args, **options):
+        policy = RetentionPolicy(read_days=options["read_days"], unread_days=options["unread_days"])
+        batch_size: int = max(1, options["batch_size"])
+        pause: float = max(0.0, options["sleep"])
+        if options["schedule"]:
+            job = schedule_pruning()
+            run_at = job.run_at if job else "now (JOBS_EAGER)"
+            self.stdout.write(self.style.SUCCESS(f"Scheduled daily pruning at {run_at}."))
+            return
+        if options["dry_run"]:
+            estimate = estimate_prune(policy, batch_size=batch_size, pause=pause)
+            self.stdout.write(
+                f"Would delete {estimate.total} notifications "
+                f"({estimate.read} read > {policy.read_days}d, {estimate.unread} unread > {policy.unread_days}d) "
+                f"in {estimate.batches} batches, pausing at least {estimate.min_seconds:.1f}s in total."
+            )
+            return
+        result = prune_notifications(
+            policy,
+            batch_size=batch_size,
+            pause=pause,
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result.deleted} notifications in {result.batches} batches "
+            f"over {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
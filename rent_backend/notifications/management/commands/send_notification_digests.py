@@ -0,0 +1,31 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from notifications.digests import send_digests
+from notifications.models import NotificationPreference
+from notifications.tasks import schedule_digests
+DIGEST_FREQUENCIES = [NotificationPreference.DIGEST_HOURLY, NotificationPreference.DIGEST_DAILY]
+class Command(BaseCommand):
+    help = "Email pending notifications to users who chose hourly or daily digests."
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--frequency",
+            choices=DIGEST_FREQUENCIES + ["all"],
+            default="all",
+            help="Which digest to send (default: all).",
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Queue recurring digest jobs for run_workers instead of sending now.",
+        )
+    def handle(self, *args, **options):
+        frequency: str = options["frequency"]
+        frequencies = DIGEST_FREQUENCIES if frequency == "all" else [frequency]
+        for freq in frequencies:
+            if options["schedule"]:
+                job = schedule_digests(freq)
+                run_at = job.run_at if job else "now (JOBS_EAGER)"
+                self.stdout.write(self.style.SUCCESS(f"Scheduled {freq} digests at {run_at}."))
+                continue
+            sent = send_digests(freq)
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} {freq} digest(s)."))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='email_pending',
+            field=models.BooleanField(default=False, help_text="Waiting to be emailed in the recipient's next digest"),
+        ),
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='email_digest',
+            field=models.CharField(choices=[('immediate', 'Immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('email_pending', True)), fields=['recipient'], name='notification_email_pending'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_email_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='collapse_key',
+            field=models.CharField(blank=True, help_text='Unread notifications sharing a key are merged into one row', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False), models.Q(('collapse_key', ''), _negated=True)), fields=['recipient', 'collapse_key'], name='notification_unread_collapse'),
+        ),
+    ]
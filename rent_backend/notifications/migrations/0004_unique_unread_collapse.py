@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fold_duplicate_unread(apps, schema_editor):
+    """
+    Merge unread rows that share a collapse key into the newest one. Badge
+    counters are brought back in line by the periodic reconcile.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    unread = Notification.objects.filter(is_read=False).exclude(collapse_key='')
+    duplicates = (
+        unread.values('recipient_id', 'collapse_key')
+        .annotate(rows=Count('id'), total=Sum('count'), pending=Count('id', filter=Q(email_pending=True)))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        rows = unread.filter(recipient_id=group['recipient_id'], collapse_key=group['collapse_key'])
+        keep = rows.order_by('-created_at', '-id').first()
+        rows.exclude(id=keep.id).delete()
+        Notification.objects.filter(id=keep.id).update(count=group['total'], email_pending=group['pending'] > 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_collapse_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_duplicate_unread, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_unread_collapse',
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), models.Q(('collapse_key', ''), _negated=True)), fields=('recipient', 'collapse_key'), name='notification_unread_collapse'),
+        ),
+    ]
@@ -23,8 +23,18 @@ class Notification(models.Model):
     message = models.TextField()
     related_object_type = models.CharField(max_length=50, blank=True)
     related_object_id = models.PositiveIntegerField(null=True, blank=True)
+    collapse_key = models.CharField(
+        max_length=150,
+        blank=True,
+        help_text='Unread notifications sharing a key are merged into one row'
+    )
+    count = models.PositiveIntegerField(default=1)
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
+    email_pending = models.BooleanField(
+        default=False,
+        help_text='Waiting to be emailed in the recipient\'s next digest'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         verbose_name = 'Notification'
@@ -33,6 +43,20 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient', '-created_at']),
             models.Index(fields=['recipient', 'is_read']),
+            models.Index(
+                fields=['recipient'],
+                condition=models.Q(email_pending=True),
+                name='notification_email_pending',
+            ),
+        ]
+        constraints = [
+            # At most one unread row per collapse key, so concurrent senders
+            # cannot both insert instead of merging.
+            models.UniqueConstraint(
+                fields=['recipient', 'collapse_key'],
+                condition=models.Q(is_read=False) & ~models.Q(collapse_key=''),
+                name='notification_unread_collapse',
+            ),
         ]
     def __str__(self):
         return f"{self.get_notification_type_display()} for {self.recipient.email}"
@@ -48,6 +72,14 @@ class NotificationPreference(models.Model):
     User preferences for notification types.
     Allows users to control which notifications they receive.
     """
+    DIGEST_IMMEDIATE = 'immediate'
+    DIGEST_HOURLY = 'hourly'
+    DIGEST_DAILY = 'daily'
+    DIGEST_CHOICES = (
+        (DIGEST_IMMEDIATE, 'Immediately'),
+        (DIGEST_HOURLY, 'Hourly digest'),
+        (DIGEST_DAILY, 'Daily digest'),
+    )
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -61,6 +93,7 @@ class NotificationPreference(models.Model):
     app_on_inquiry = models.BooleanField(default=True)
     app_on_review = models.BooleanField(default=True)
     app_on_property_update = models.BooleanField(default=True)
+    email_digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default=DIGEST_IMMEDIATE)
     updated_at = models.DateTimeField(auto_now=True)
     class Meta:
         verbose_name = 'Notification Preference'
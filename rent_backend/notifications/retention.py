@@ -0,0 +1,87 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from badges import counters as badges
+from .models import Notification
+logger = logging.getLogger(__name__)
+@dataclass(frozen=True)
+class RetentionPolicy:
+    read_days: int
+    unread_days: int
+def get_retention_policy() -> RetentionPolicy:
+    return RetentionPolicy(
+        read_days=int(getattr(settings, "NOTIFICATION_RETENTION_READ_DAYS", 90)),
+        unread_days=int(getattr(settings, "NOTIFICATION_RETENTION_UNREAD_DAYS", 365)),
+    )
+@dataclass
+class PruneResult:
+    deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    @property
+    def rows_per_second(self) -> float:
+        return self.deleted / self.seconds if self.seconds else 0.0
+@dataclass(frozen=True)
+class PruneEstimate:
+    read: int
+    unread: int
+    batches: int
+    min_seconds: float
+    @property
+    def total(self) -> int:
+        return self.read + self.unread
+def expired_notifications(policy: RetentionPolicy, now=None):
+    now = now or timezone.now()
+    return Notification.objects.filter(
+        Q(is_read=True, created_at__lt=now - timedelta(days=policy.read_days))
+        | Q(is_read=False, created_at__lt=now - timedelta(days=policy.unread_days))
+    )
+def estimate_prune(policy: RetentionPolicy | None = None, batch_size: int = 1000, pause: float = 0.5, now=None) -> PruneEstimate:
+    """Count what prune_notifications would delete without touching any rows."""
+    policy = policy or get_retention_policy()
+    expired = expired_notifications(policy, now)
+    read = expired.filter(is_read=True).count()
+    unread = expired.filter(is_read=False).count()
+    batches = math.ceil((read + unread) / batch_size) if batch_size else 0
+    return PruneEstimate(read=read, unread=unread, batches=batches, min_seconds=max(batches - 1, 0) * pause)
+def prune_notifications(policy: RetentionPolicy | None = None, batch_size: int = 1000, pause: float = 0.5,
+                        max_batches: int | None = None, now=None, sleep=time.sleep) -> PruneResult:
+    """
+    Delete notifications past the retention policy in primary-key batches.
+    Each batch selects at most ``batch_size`` ids and deletes them with one
+    short statement, then sleeps ``pause`` seconds so locks are never held
+    for long and replicas can keep up.
+    """
+    policy = policy or get_retention_policy()
+    now = now or timezone.now()
+    expired = expired_notifications(policy, now).order_by("id")
+    result = PruneResult()
+    started = time.monotonic()
+    last_id = 0
+    while max_batches is None or result.batches < max_batches:
+        ids = list(expired.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        unread = dict(
+            Notification.objects.filter(id__in=ids, is_read=False)
+            .order_by().values_list('recipient_id').annotate(n=Count('id'))
+        )
+        deleted, _ = Notification.objects.filter(id__in=ids).delete()
+        badges.adjust_each({pk: -n for pk, n in unread.items()}, badges.UNREAD_NOTIFICATIONS)
+        result.deleted += deleted
+        result.batches += 1
+        last_id = ids[-1]
+        if len(ids) < batch_size:
+            break
+        sleep(pause)
+    result.seconds = time.monotonic() - started
+    logger.info(
+        "Pruned %s notifications in %s batches (%.1f rows/s)",
+        result.deleted, result.batches, result.rows_per_second,
+    )
+    return result
@@ -8,10 +8,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = [
             'id', 'notification_type', 'title', 'message',
-            'related_object_type', 'related_object_id',
+            'related_object_type', 'related_object_id', 'count',
             'is_read', 'read_at', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'count', 'created_at']
 class NotificationPreferenceSerializer(serializers.ModelSerializer):
     """
     Serializer for NotificationPreference model.
@@ -21,7 +21,7 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
         fields = [
             'email_on_message', 'email_on_inquiry', 'email_on_review',
             'email_on_property_update', 'app_on_message', 'app_on_inquiry',
-            'app_on_review', 'app_on_property_update', 'updated_at'
+            'app_on_review', 'app_on_property_update', 'email_digest', 'updated_at'
         ]
         read_only_fields = ['updated_at']
 
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from jobs.queue import enqueue, task
+from .digests import flush_digest, next_digest_run, send_digests
+from .retention import prune_notifications
+from .utils import fan_out_conversation_notifications
+@task('notifications.fan_out_conversation')
+def fan_out_conversation(conversation_id, sender_id, notification_type, title, message):
+    fan_out_conversation_notifications(conversation_id, sender_id, notification_type, title, message)
+@task('notifications.send_email')
+def send_email(recipient_email, subject, message):
+    """Send a notification email; failures propagate so the job is retried."""
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[recipient_email],
+        fail_silently=False,
+    )
+@task('notifications.send_digests')
+def send_notification_digests(frequency):
+    """Send ``frequency`` digests, then queue the next run."""
+    try:
+        send_digests(frequency)
+    finally:
+        schedule_digests(frequency)
+@task('notifications.flush_digest')
+def flush_pending_digest(user_id, frequency):
+    flush_digest(user_id, frequency)
+def schedule_digests(frequency):
+    """Queue the next digest run; the idempotency key keeps one job per window."""
+    run_at = next_digest_run(frequency)
+    return enqueue(
+        'notifications.send_digests',
+        {'frequency': frequency},
+        run_at=run_at,
+        idempotency_key=f'notifications.digest:{frequency}:{run_at.isoformat()}',
+    )
+@task('notifications.prune')
+def prune_expired_notifications(batch_size=1000, pause=0.5):
+    """Apply the retention policy, then queue tomorrow's run."""
+    try:
+        prune_notifications(batch_size=batch_size, pause=pause)
+    finally:
+        schedule_pruning()
+def schedule_pruning():
+    run_at = next_digest_run('daily')
+    return enqueue(
+        'notifications.prune',
+        run_at=run_at,
+        idempotency_key=f'notifications.prune:{run_at.isoformat()}',
+    )
@@ -1,6 +1,20 @@
+from datetime import timedelta
+from unittest import mock
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
-from notifications.models import Notification
+from messages.models import Conversation
+from notifications import utils as notification_utils
+from notifications.models import Notification, NotificationPreference
+from notifications.digests import send_digests
+from notifications.retention import RetentionPolicy, estimate_prune, prune_notifications
+from notifications.tasks import schedule_digests
+from notifications.views import decode_sync_cursor, encode_sync_cursor
+from notifications.utils import (
+    create_notification, create_notifications_bulk, fan_out_conversation_notifications,
+)
 User = get_user_model()
 def _create_user(*, email: str, role: str):
     return User.objects.create_user(
@@ -35,4 +49,221 @@ class NotificationsApiTests(APITestCase):
         self.assertEqual(res_mark.data["count"], 2)
         res_count2 = self.client.get("/api/notifications/unread_count/")
         self.assertEqual(res_count2.data["unread_count"], 0)
+    def test_cursor_sync_returns_only_new_and_coalesced_rows(self):
+        base = timezone.now() - timedelta(hours=1)
+        rows = []
+        for i in range(5):
+            n = Notification.objects.create(recipient=self.user, notification_type="system", title=f"N{i}", message="M")
+            Notification.objects.filter(pk=n.pk).update(created_at=base + timedelta(minutes=i))
+            rows.append(n)
+        self.client.force_authenticate(self.user)
+        first = self.client.get("/api/notifications/", {"limit": 2})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([r["id"] for r in first.data["results"]], [rows[4].pk, rows[3].pk])
+        self.assertTrue(first.data["has_more"])
+        self.assertEqual(decode_sync_cursor(first.data["cursor"])[1], rows[4].pk)
+        older = self.client.get("/api/notifications/", {"before_id": first.data["next_before_id"], "limit": 10})
+        self.assertEqual([r["id"] for r in older.data["results"]], [rows[2].pk, rows[1].pk, rows[0].pk])
+        self.assertFalse(older.data["has_more"])
+        empty = self.client.get("/api/notifications/", {"since": first.data["cursor"]})
+        self.assertEqual(empty.data["results"], [])
+        self.assertEqual(empty.data["cursor"], first.data["cursor"])
+        Notification.objects.filter(pk=rows[1].pk).update(created_at=timezone.now())
+        fresh = Notification.objects.create(recipient=self.user, notification_type="system", title="New", message="M")
+        synced = self.client.get("/api/notifications/unread/", {"since": first.data["cursor"]})
+        self.assertEqual({r["id"] for r in synced.data["results"]}, {fresh.pk, rows[1].pk})
+        self.assertEqual(decode_sync_cursor(synced.data["cursor"])[1], fresh.pk)
+    def test_since_id_gap_larger_than_limit_is_drained_without_skips(self):
+        base = timezone.now() - timedelta(hours=1)
+        rows = []
+        for i in range(7):
+            n = Notification.objects.create(recipient=self.user, notification_type="system", title=f"N{i}", message="M")
+            Notification.objects.filter(pk=n.pk).update(created_at=base + timedelta(minutes=i))
+            rows.append(n)
+        self.client.force_authenticate(self.user)
+        rows[0].refresh_from_db()
+        cursor, seen = encode_sync_cursor(rows[0]), []
+        for _ in range(5):
+            page = self.client.get("/api/notifications/", {"since": cursor, "limit": 2}).data
+            seen.extend(r["id"] for r in page["results"])
+            cursor = page["cursor"]
+            self.assertIsNone(page["next_before_id"])
+            if not page["has_more"]:
+                break
+        self.assertEqual(seen, [n.pk for n in rows[1:]])
+        self.assertEqual(decode_sync_cursor(cursor)[1], rows[-1].pk)
+        older = self.client.get("/api/notifications/", {"before_id": rows[3].pk})
+        self.assertIsNone(older.data["cursor"])
+    def test_sync_returns_rows_created_and_coalesced_since_the_cursor(self):
+        key = "message:conversation:9"
+        merged = create_notification(self.user, "message", "New Message", "A wrote", collapse_key=key)
+        Notification.objects.filter(pk=merged.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.client.force_authenticate(self.user)
+        cursor = self.client.get("/api/notifications/", {"limit": 10}).data["cursor"]
+        self.assertEqual(decode_sync_cursor(cursor)[1], merged.pk)
+        between = create_notification(self.user, "system", "Maintenance", "Water off")
+        create_notification(self.user, "message", "New Message", "B wrote", collapse_key=key)
+        synced = self.client.get("/api/notifications/", {"since": cursor}).data
+        self.assertEqual([r["id"] for r in synced["results"]], [between.pk, merged.pk])
+        self.assertEqual(synced["results"][1]["count"], 2)
+        self.assertEqual(self.client.get("/api/notifications/", {"since": synced["cursor"]}).data["results"], [])
+    def test_cursor_params_are_validated(self):
+        self.client.force_authenticate(self.user)
+        res = self.client.get("/api/notifications/", {"since": "abc"})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get("/api/notifications/", {"before_id": "abc"})
+        self.assertEqual(res.status_code, 400)
 
+@override_settings(JOBS_EAGER=True)
+class ConversationFanOutTests(APITestCase):
+    def setUp(self):
+        self.sender = _create_user(email="sender@example.com", role="tenant")
+        self.landlord = _create_user(email="landlord@example.com", role="landlord")
+        self.agent = _create_user(email="agent@example.com", role="agent")
+        NotificationPreference.objects.create(user=self.agent, app_on_message=False, email_on_message=False)
+        self.conversation = Conversation.objects.create(subject="Group")
+        self.conversation.participants.add(self.sender, self.landlord, self.agent)
+    def test_fan_out_respects_preferences_in_constant_queries(self):
+        # Includes the savepoint and release around merge-or-insert.
+        with self.assertNumQueries(7):
+            created = fan_out_conversation_notifications(
+                self.conversation.id, self.sender.id, "message", "New Message", "Hi"
+            )
+        self.assertEqual([n.recipient_id for n in created], [self.landlord.id])
+        self.assertFalse(Notification.objects.filter(recipient=self.sender).exists())
+        self.assertFalse(Notification.objects.filter(recipient=self.agent).exists())
+        self.assertEqual([m.to for m in mail.outbox], [["landlord@example.com"]])
+class EmailDigestTests(APITestCase):
+    def setUp(self):
+        self.landlord = _create_user(email="busy@example.com", role="landlord")
+        self.other = _create_user(email="other@example.com", role="landlord")
+        NotificationPreference.objects.create(
+            user=self.landlord, email_digest=NotificationPreference.DIGEST_HOURLY
+        )
+        NotificationPreference.objects.create(
+            user=self.other, email_digest=NotificationPreference.DIGEST_HOURLY
+        )
+    @override_settings(JOBS_EAGER=True)
+    def test_digest_users_get_one_email_per_batch(self):
+        for i in range(3):
+            create_notification(self.landlord, "inquiry", f"Inquiry {i}", "Someone is interested")
+        create_notification(self.other, "review", "Review", "New review")
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Notification.objects.filter(email_pending=True).count(), 4)
+        self.assertEqual(send_digests(NotificationPreference.DIGEST_DAILY), 0)
+        self.assertEqual(send_digests(NotificationPreference.DIGEST_HOURLY), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(m for m in mail.outbox if m.to == ["busy@example.com"])
+        self.assertIn("3 new notifications", digest.subject)
+        self.assertIn("Inquiry 2", digest.body)
+        self.assertFalse(Notification.objects.filter(email_pending=True).exists())
+        self.assertEqual(send_digests(NotificationPreference.DIGEST_HOURLY), 0)
+    def test_rows_coalesced_while_sending_stay_pending(self):
+        create_notification(self.landlord, "message", "Message", "First", collapse_key="conversation:1")
+        send_messages = mail.get_connection().__class__.send_messages
+        def coalesce_during_send(connection, messages):
+            create_notification(self.landlord, "message", "Message", "Second", collapse_key="conversation:1")
+            return send_messages(connection, messages)
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", coalesce_during_send):
+            self.assertEqual(send_digests(NotificationPreference.DIGEST_HOURLY), 1)
+        self.assertIn("First", mail.outbox[0].body)
+        self.assertTrue(Notification.objects.get(recipient=self.landlord).email_pending)
+        send_digests(NotificationPreference.DIGEST_HOURLY)
+        self.assertIn("Second", mail.outbox[1].body)
+        self.assertFalse(Notification.objects.filter(email_pending=True).exists())
+    @override_settings(JOBS_EAGER=True)
+    def test_switching_to_immediate_flushes_pending_rows(self):
+        create_notification(self.landlord, "inquiry", "Inquiry", "Someone is interested")
+        self.client.force_authenticate(self.landlord)
+        res = self.client.patch(
+            "/api/notifications/preferences/update_preferences/",
+            {"email_digest": NotificationPreference.DIGEST_IMMEDIATE},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([m.to for m in mail.outbox], [["busy@example.com"]])
+        self.assertIn("hourly", mail.outbox[0].subject)
+        self.assertFalse(Notification.objects.filter(email_pending=True).exists())
+        self.client.patch(
+            "/api/notifications/preferences/update_preferences/",
+            {"email_digest": NotificationPreference.DIGEST_IMMEDIATE},
+            format="json",
+        )
+        self.assertEqual(len(mail.outbox), 1)
+    def test_schedule_digests_is_idempotent_per_window(self):
+        first = schedule_digests(NotificationPreference.DIGEST_HOURLY)
+        second = schedule_digests(NotificationPreference.DIGEST_HOURLY)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.run_at.minute, 0)
+class BulkNotificationTests(APITestCase):
+    def test_bulk_create_uses_constant_queries_per_batch(self):
+        users = [_create_user(email=f"bulk{i}@example.com", role="tenant") for i in range(5)]
+        NotificationPreference.objects.create(user=users[0], app_on_property_update=False)
+        with self.assertNumQueries(4):
+            created = create_notifications_bulk(
+                User.objects.filter(email__startswith="bulk"),
+                "system", "Maintenance", "Scheduled downtime tonight",
+            )
+        self.assertEqual(len(created), 5)
+        self.assertTrue(all(n.pk for n in created))
+        self.assertEqual(NotificationPreference.objects.filter(user__in=users).count(), 5)
+        with self.assertNumQueries(6):
+            created = create_notifications_bulk(
+                [u.id for u in users], "property_update", "Price drop", "Rent lowered", batch_size=3,
+            )
+        self.assertEqual(len(created), 4)
+        self.assertNotIn(users[0].id, [n.recipient_id for n in created])
+    def test_collapse_key_merges_into_unread_notification(self):
+        user = _create_user(email="chatty@example.com", role="landlord")
+        first = create_notification(user, "message", "New Message", "A sent you a message", collapse_key="message:conversation:1")
+        merged = create_notification(user, "message", "New Message", "B sent you a message", collapse_key="message:conversation:1")
+        self.assertIsNone(merged)
+        first.refresh_from_db()
+        self.assertEqual(first.count, 2)
+        self.assertEqual(first.message, "B sent you a message")
+        self.assertEqual(Notification.objects.filter(recipient=user).count(), 1)
+        first.mark_as_read()
+        fresh = create_notification(user, "message", "New Message", "C sent you a message", collapse_key="message:conversation:1")
+        self.assertNotEqual(fresh.pk, first.pk)
+        self.assertEqual(fresh.count, 1)
+    def test_collapse_key_insert_race_merges_into_winning_row(self):
+        user = _create_user(email="racy@example.com", role="landlord")
+        key = "message:conversation:7"
+        Notification.objects.create(
+            recipient=user, notification_type="message", title="New Message",
+            message="A sent you a message", collapse_key=key,
+        )
+        coalesce = notification_utils._coalesce
+        calls = []
+        def racing(notifications, *args):
+            calls.append(1)
+            # The first read ran before the other worker committed its row.
+            return notifications if len(calls) == 1 else coalesce(notifications, *args)
+        with mock.patch("notifications.utils._coalesce", side_effect=racing):
+            created = create_notification(user, "message", "New Message", "B sent you a message", collapse_key=key)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(created)
+        row = Notification.objects.get(recipient=user)
+        self.assertEqual(row.count, 2)
+        self.assertEqual(row.message, "B sent you a message")
+class RetentionTests(APITestCase):
+    def setUp(self):
+        self.user = _create_user(email="old@example.com", role="tenant")
+        now = timezone.now()
+        ages = [(True, 100), (True, 10), (False, 100), (False, 400), (True, 200)]
+        for is_read, days in ages:
+            n = Notification.objects.create(recipient=self.user, notification_type="system", title="T", message="M", is_read=is_read)
+            Notification.objects.filter(pk=n.pk).update(created_at=now - timedelta(days=days))
+    def test_dry_run_estimates_without_deleting(self):
+        estimate = estimate_prune(RetentionPolicy(read_days=90, unread_days=365), batch_size=1)
+        self.assertEqual((estimate.read, estimate.unread, estimate.batches), (2, 1, 3))
+        self.assertEqual(Notification.objects.count(), 5)
+    def test_prune_deletes_in_batches_with_pauses(self):
+        pauses = []
+        result = prune_notifications(
+            RetentionPolicy(read_days=90, unread_days=365), batch_size=2, pause=0.25, sleep=pauses.append,
+        )
+        self.assertEqual(result.deleted, 3)
+        self.assertEqual(result.batches, 2)
+        self.assertEqual(pauses, [0.25])
+        self.assertEqual(Notification.objects.count(), 2)
@@ -1,8 +1,42 @@
 from django.core.mail import send_mail
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, QuerySet, Value, When
+from django.utils import timezone
+from badges import counters as badges
+from jobs.queue import enqueue, enqueue_many
 from .models import Notification, NotificationPreference
+# Merge-then-insert passes before giving up on a collapse key under contention.
+COALESCE_ATTEMPTS = 3
+APP_PREFERENCE_MAP = {
+    'message': 'app_on_message',
+    'inquiry': 'app_on_inquiry',
+    'inquiry_update': 'app_on_inquiry',
+    'review': 'app_on_review',
+    'property_update': 'app_on_property_update',
+    'system': True,
+}
+EMAIL_PREFERENCE_MAP = {
+    'message': 'email_on_message',
+    'inquiry': 'email_on_inquiry',
+    'inquiry_update': 'email_on_inquiry',
+    'review': 'email_on_review',
+    'property_update': 'email_on_property_update',
+}
+def wants_app_notification(prefs, notification_type):
+    """Return True if ``prefs`` allow an in-app notification of this type."""
+    pref = APP_PREFERENCE_MAP.get(notification_type)
+    return pref is True or bool(pref and getattr(prefs, pref, True))
+def wants_email_notification(prefs, notification_type):
+    """Return True if ``prefs`` allow an email for this notification type."""
+    pref = EMAIL_PREFERENCE_MAP.get(notification_type)
+    return bool(pref and getattr(prefs, pref, False))
+def uses_email_digest(prefs):
+    """Return True if ``prefs`` batch emails into an hourly or daily digest."""
+    return getattr(prefs, 'email_digest', NotificationPreference.DIGEST_IMMEDIATE) != NotificationPreference.DIGEST_IMMEDIATE
 def create_notification(recipient, notification_type, title, message,
-                       related_object_type='', related_object_id=None):
+                       related_object_type='', related_object_id=None, collapse_key=''):
     """
     Create a notification for a user.
     
@@ -13,47 +47,200 @@ def create_notification(recipient, notification_type, title, message,
         message: Notification message
         related_object_type: Type of related object (optional)
         related_object_id: ID of related object (optional)
+        collapse_key: Merge into an unread notification with this key (optional)
     
     Returns:
-        Notification object
+        Notification object, or None if nothing new was created
     """
-    try:
-        prefs = recipient.notification_preferences
-    except NotificationPreference.DoesNotExist:
-        prefs = NotificationPreference.objects.create(user=recipient)
-    notification = None
-    preference_map = {
-        'message': 'app_on_message',
-        'inquiry': 'app_on_inquiry',
-        'inquiry_update': 'app_on_inquiry',
-        'review': 'app_on_review',
-        'property_update': 'app_on_property_update',
-        'system': True,
-    }
-    should_create_app = preference_map.get(notification_type)
-    if should_create_app is True or (should_create_app and getattr(prefs, should_create_app, True)):
-        notification = Notification.objects.create(
-            recipient=recipient,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            related_object_type=related_object_type,
-            related_object_id=related_object_id
+    created = create_notifications_bulk(
+        [recipient], notification_type, title, message,
+        related_object_type=related_object_type,
+        related_object_id=related_object_id,
+        collapse_key=collapse_key,
+    )
+    return created[0] if created else None
+def _recipient_batches(recipients, batch_size):
+    """
+    Yield lists of users with ``notification_preferences`` joined in.
+    Querysets are walked by primary key; lists of users or ids are chunked.
+    """
+    User = get_user_model()
+    if isinstance(recipients, QuerySet):
+        queryset = recipients.select_related('notification_preferences').order_by('pk')
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(page[:batch_size])
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            last_pk = batch[-1].pk
+    ids = list(dict.fromkeys(getattr(r, 'pk', r) for r in recipients))
+    for start in range(0, len(ids), batch_size):
+        yield list(
+            User.objects.filter(pk__in=ids[start:start + batch_size])
+            .select_related('notification_preferences')
+            .order_by('pk')
         )
-    email_preference_map = {
-        'message': 'email_on_message',
-        'inquiry': 'email_on_inquiry',
-        'inquiry_update': 'email_on_inquiry',
-        'review': 'email_on_review',
-        'property_update': 'email_on_property_update',
-    }
-    email_pref = email_preference_map.get(notification_type)
-    if email_pref and getattr(prefs, email_pref, False):
+def _preferences_for(users, batch_size):
+    """
+    Map user id to NotificationPreference for an already-joined batch.
+    Missing rows are created with one bulk insert; defaults are used for them.
+    """
+    prefs = {}
+    missing = []
+    for user in users:
+        try:
+            prefs[user.pk] = user.notification_preferences
+        except NotificationPreference.DoesNotExist:
+            missing.append(NotificationPreference(user_id=user.pk))
+            prefs[user.pk] = missing[-1]
+    if missing:
+        NotificationPreference.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    return prefs
+def make_collapse_key(notification_type, related_object_type='', related_object_id=None):
+    """Default collapse key: one unread row per type and related object."""
+    return f"{notification_type}:{related_object_type}:{related_object_id or ''}"
+def _coalesce(notifications, collapse_key, title, message):
+    """
+    Fold ``notifications`` into existing unread rows with ``collapse_key``.
+    Matching rows get their count bumped and their text and timestamp
+    refreshed with a single UPDATE. Call inside a transaction: the rows are
+    locked when read so they cannot be marked read before the UPDATE.
+    
+    Returns:
+        The notifications that had no unread row to merge into
+    """
+    by_recipient = {n.recipient_id: n for n in notifications}
+    existing = dict(
+        Notification.objects.filter(
+            recipient_id__in=by_recipient,
+            collapse_key=collapse_key,
+            is_read=False,
+        ).select_for_update().order_by().values_list('recipient_id', 'id')
+    )
+    if not existing:
+        return notifications
+    digest_ids = [pk for recipient_id, pk in existing.items() if by_recipient[recipient_id].email_pending]
+    Notification.objects.filter(id__in=existing.values()).update(
+        count=F('count') + 1,
+        title=title,
+        message=message,
+        created_at=timezone.now(),
+        email_pending=Case(When(id__in=digest_ids, then=Value(True)), default=F('email_pending')),
+    )
+    return [n for n in notifications if n.recipient_id not in existing]
+def _merge_or_insert(notifications, collapse_key, title, message, batch_size):
+    """
+    Merge ``notifications`` into unread rows with ``collapse_key`` and insert
+    the rest. An insert racing another sender's insert for the same key hits
+    the notification_unread_collapse constraint; the whole batch is then
+    rolled back and merged again against the row that won.
+    
+    Returns:
+        The inserted notifications
+    """
+    for attempt in range(COALESCE_ATTEMPTS):
         try:
-            send_email_notification(recipient.email, title, message)
-        except Exception as e:
-            pass
-    return notification
+            with transaction.atomic():
+                pending = _coalesce(notifications, collapse_key, title, message)
+                return Notification.objects.bulk_create(pending, batch_size=batch_size)
+        except IntegrityError:
+            if attempt == COALESCE_ATTEMPTS - 1:
+                raise
+def create_notifications_bulk(recipients, notification_type, title, message,
+                              related_object_type='', related_object_id=None,
+                              collapse_key='', batch_size=1000):
+    """
+    Create the same notification for many users.
+    Per batch of ``batch_size`` recipients this runs one SELECT (users joined
+    with their preferences), at most one INSERT for missing preferences, one
+    INSERT for the notifications, one UPDATE for badge counters and one
+    INSERT for queued emails, so system broadcasts never issue a query per user.
+    
+    Args:
+        recipients: QuerySet of users, or an iterable of users or user ids
+        notification_type: Type of notification (from NOTIFICATION_TYPES)
+        title: Notification title
+        message: Notification message
+        related_object_type: Type of related object (optional)
+        related_object_id: ID of related object (optional)
+        collapse_key: Merge into the recipient's unread notification with
+            this key instead of adding a row (optional)
+        batch_size: Recipients handled per round trip (optional)
+    
+    Returns:
+        List of created Notification objects (merged rows are not included)
+    """
+    created = []
+    for users in _recipient_batches(recipients, batch_size):
+        prefs = _preferences_for(users, batch_size)
+        notifications = []
+        emails = []
+        for user in users:
+            user_prefs = prefs[user.pk]
+            wants_app = wants_app_notification(user_prefs, notification_type)
+            wants_email = wants_email_notification(user_prefs, notification_type)
+            # Digests are built from notification rows, so events without an
+            # in-app notification are still emailed immediately.
+            in_digest = wants_email and wants_app and uses_email_digest(user_prefs)
+            if wants_app:
+                notifications.append(Notification(
+                    recipient_id=user.pk,
+                    notification_type=notification_type,
+                    title=title,
+                    message=message,
+                    related_object_type=related_object_type,
+                    related_object_id=related_object_id,
+                    collapse_key=collapse_key,
+                    email_pending=in_digest,
+                ))
+            if wants_email and not in_digest:
+                emails.append(user.email)
+        if collapse_key and notifications:
+            inserted = _merge_or_insert(notifications, collapse_key, title, message, batch_size)
+        else:
+            inserted = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        badges.adjust([n.recipient_id for n in inserted], badges.UNREAD_NOTIFICATIONS, 1)
+        created.extend(inserted)
+        if emails:
+            enqueue_many('notifications.send_email', [
+                {'recipient_email': email, 'subject': title, 'message': message}
+                for email in emails
+            ])
+    return created
+def notify_conversation_participants(conversation, sender, notification_type, title, message):
+    """
+    Queue a notification fan-out to everyone in ``conversation`` except ``sender``.
+    The job row is inserted in the current transaction, so workers only
+    see it once the message itself has been committed.
+    """
+    enqueue('notifications.fan_out_conversation', {
+        'conversation_id': conversation.id,
+        'sender_id': sender.id,
+        'notification_type': notification_type,
+        'title': title,
+        'message': message,
+    })
+def fan_out_conversation_notifications(conversation_id, sender_id, notification_type, title, message):
+    """
+    Notify all other participants of a conversation.
+    Loads recipients together with their preferences in a single query,
+    inserts the in-app notifications with one bulk insert and queues
+    the emails with another (see create_notifications_bulk).
+    
+    Returns:
+        List of created Notification objects
+    """
+    User = get_user_model()
+    recipients = User.objects.filter(conversations__id=conversation_id).exclude(id=sender_id)
+    return create_notifications_bulk(
+        recipients, notification_type, title, message,
+        related_object_type='conversation',
+        related_object_id=conversation_id,
+        collapse_key=make_collapse_key(notification_type, 'conversation', conversation_id),
+    )
 def send_email_notification(recipient_email, subject, message):
     """
     Send email notification to user.
@@ -73,4 +260,3 @@ def send_email_notification(recipient_email, subject, message):
         )
     except Exception as e:
         print(f"Failed to send email to {recipient_email}: {str(e)}")
-
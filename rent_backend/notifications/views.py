@@ -1,26 +1,128 @@
+import base64
+import json
+from datetime import datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Q
 from django.utils import timezone
+from badges import counters as badges
+from jobs.queue import enqueue
 from .models import Notification, NotificationPreference
 from .serializers import NotificationSerializer, NotificationPreferenceSerializer
+def encode_sync_cursor(notification):
+    """Opaque cursor holding the (created_at, id) of the last row a client saw."""
+    raw = json.dumps([notification.created_at.isoformat(), notification.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+def decode_sync_cursor(cursor):
+    """Return (created_at, id) from ``cursor``, or raise ValueError."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor.')
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Notification operations.
     
     list: GET /api/notifications/ - List user's notifications
     retrieve: GET /api/notifications/{id}/ - Get notification details
+    
+    list and unread accept cursor parameters for incremental sync:
+    ?since=<cursor> returns notifications newer than the cursor (including
+    rows coalesced since then), oldest first; ?before_id=<id> pages towards
+    older ones and ?limit= caps the page size. Cursor responses carry the
+    next opaque high-water mark; repeat with since=<cursor> while has_more
+    is set. Without cursor parameters the full list is returned unpaginated.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    default_cursor_limit = 50
+    max_cursor_limit = 200
     def get_queryset(self):
         """Get notifications for current user."""
         return Notification.objects.filter(recipient=self.request.user)
+    def _int_param(self, name):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'Must be an integer.'})
+        if value < 0:
+            raise ValidationError({name: 'Must be a non-negative integer.'})
+        return value
+    def _since_param(self):
+        value = self.request.query_params.get('since')
+        if value in (None, ''):
+            return None
+        try:
+            return decode_sync_cursor(value)
+        except ValueError:
+            raise ValidationError({'since': 'Invalid cursor.'})
+    def cursor_page(self, queryset):
+        """
+        Return a cursor-paginated Response, or None when no cursor
+        parameters were given (old clients keep the plain, unpaginated list).
+        Without since, pages are newest first on (created_at, id), which
+        the (recipient, -created_at) index serves directly, and before_id
+        pages towards older rows. With since, rows after the cursor come
+        oldest first and ``cursor`` is the last row returned, so a client
+        that passes it back while ``has_more`` is set drains the gap without
+        skipping rows.
+        The cursor carries the (created_at, id) the client saw rather than
+        a row id: coalescing moves a row's created_at forward, and looking
+        the bound up again would skip everything created in between.
+        """
+        since = self._since_param()
+        before_id = self._int_param('before_id')
+        limit = self._int_param('limit')
+        if since is None and before_id is None and limit is None:
+            return None
+        limit = min(limit or self.default_cursor_limit, self.max_cursor_limit)
+        if since is not None:
+            created_at, pk = since
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        if before_id is not None:
+            anchor = self.get_queryset().filter(pk=before_id).values_list('created_at', flat=True).first()
+            if anchor is not None:
+                queryset = queryset.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, pk__lt=before_id))
+            else:
+                queryset = queryset.filter(pk__lt=before_id)
+        ordering = ('created_at', 'id') if since is not None else ('-created_at', '-id')
+        rows = list(queryset.order_by(*ordering)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if since is not None:
+            cursor = encode_sync_cursor(rows[-1]) if rows else self.request.query_params['since']
+        elif before_id is None:
+            cursor = encode_sync_cursor(rows[0]) if rows else None
+        else:
+            # Older pages must not move the client's high-water mark back.
+            cursor = None
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'cursor': cursor,
+            'has_more': has_more,
+            'next_before_id': rows[-1].pk if has_more and since is None else None,
+        })
+    def _mark_read(self, notification):
+        if not notification.is_read:
+            notification.mark_as_read()
+            badges.adjust([notification.recipient_id], badges.UNREAD_NOTIFICATIONS, -1)
+    def list(self, request, *args, **kwargs):
+        response = self.cursor_page(self.get_queryset())
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
     def retrieve(self, request, *args, **kwargs):
         """Get notification and mark as read."""
         notification = self.get_object()
-        notification.mark_as_read()
+        self._mark_read(notification)
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     @action(detail=False, methods=['get'])
@@ -30,6 +132,9 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         GET /api/notifications/unread/
         """
         unread = self.get_queryset().filter(is_read=False)
+        response = self.cursor_page(unread)
+        if response is not None:
+            return response
         page = self.paginate_queryset(unread)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -51,7 +156,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         POST /api/notifications/{id}/mark_read/
         """
         notification = self.get_object()
-        notification.mark_as_read()
+        self._mark_read(notification)
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     @action(detail=False, methods=['post'])
@@ -61,8 +166,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         POST /api/notifications/mark_all_read/
         """
         unread = self.get_queryset().filter(is_read=False)
-        updated_count = unread.count()
-        unread.update(is_read=True, read_at=timezone.now())
+        updated_count = unread.update(is_read=True, read_at=timezone.now())
+        badges.reset([request.user.pk], badges.UNREAD_NOTIFICATIONS)
         return Response({'message': 'All notifications marked as read', 'count': updated_count})
     @action(detail=True, methods=['delete'])
     def delete_notification(self, request, pk=None):
@@ -72,6 +177,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """
         notification = self.get_object()
         notification.delete()
+        if not notification.is_read:
+            badges.adjust([notification.recipient_id], badges.UNREAD_NOTIFICATIONS, -1)
         return Response(
             {'message': 'Notification deleted'},
             status=status.HTTP_204_NO_CONTENT
@@ -84,6 +191,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """
         count = self.get_queryset().count()
         self.get_queryset().delete()
+        badges.reset([request.user.pk], badges.UNREAD_NOTIFICATIONS)
         return Response({
             'message': 'All notifications deleted',
             'count': count
@@ -103,6 +211,13 @@ class NotificationPreferenceViewSet(viewsets.ModelViewSet):
             user=self.request.user
         )
         return obj
+    def perform_update(self, serializer):
+        """Flush a pending digest when the user switches back to immediate emails."""
+        previous = serializer.instance.email_digest
+        preferences = serializer.save()
+        immediate = NotificationPreference.DIGEST_IMMEDIATE
+        if previous != immediate and preferences.email_digest == immediate:
+            enqueue('notifications.flush_digest', {'user_id': preferences.user_id, 'frequency': previous})
     @action(detail=False, methods=['get'])
     def my_preferences(self, request):
         """
@@ -125,6 +240,6 @@ class NotificationPreferenceViewSet(viewsets.ModelViewSet):
             partial=True
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
 
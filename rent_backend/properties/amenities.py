@@ -0,0 +1,83 @@
+import threading
+import time
+from types import MappingProxyType
+from django.conf import settings
+from rent_backend.caching import get_cache
+from .models import PropertyAmenity
+AMENITIES_TAG = "amenities"
+_FIELDS = ("id", "name", "icon", "description")
+class AmenityCatalog:
+    """
+    Immutable in-process snapshot of every PropertyAmenity, keyed by id.
+    The snapshot is rebuilt when the ``amenities`` cache tag (bumped by the
+    amenity save/delete signals) changes, so with a shared cache other
+    processes pick up edits within CACHE_TAG_CHECK_SECONDS. The tag lives in
+    the default cache, which is per process unless REDIS_URL is set, so the
+    snapshot is also reloaded once it is older than
+    AMENITY_CATALOG_MAX_AGE_SECONDS; that bounds how long another process
+    serves a renamed or deleted amenity. Readers get read-only mappings and
+    must copy before modifying.
+    """
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = None
+        self._by_id = MappingProxyType({})
+        self._ordered = ()
+    def _current_version(self):
+        return get_cache().tag_versions((AMENITIES_TAG,))[AMENITIES_TAG]
+    @property
+    def _max_age(self):
+        return float(getattr(settings, "AMENITY_CATALOG_MAX_AGE_SECONDS", 5))
+    def _load(self, version) -> None:
+        loaded_at = self._clock()
+        rows = PropertyAmenity.objects.order_by("name", "id").values(*_FIELDS)
+        ordered = tuple(MappingProxyType(dict(row)) for row in rows)
+        with self._lock:
+            self._by_id = MappingProxyType({row["id"]: row for row in ordered})
+            self._ordered = ordered
+            self._version = version
+            self._loaded_at = loaded_at
+    def _refresh(self, force: bool = False) -> None:
+        # Read the version before loading so an edit committed meanwhile
+        # still triggers another reload.
+        version = self._current_version()
+        expired = self._loaded_at is None or self._clock() - self._loaded_at >= self._max_age
+        if force or expired or version != self._version:
+            self._load(version)
+    def by_id(self):
+        self._refresh()
+        return self._by_id
+    def all(self) -> tuple:
+        """Every amenity, ordered by name."""
+        self._refresh()
+        return self._ordered
+    def get(self, amenity_id):
+        amenity = self.by_id().get(amenity_id)
+        if amenity is None:
+            # Possibly created elsewhere since the last reload.
+            self._refresh(force=True)
+            amenity = self._by_id.get(amenity_id)
+        return amenity
+    def resolve(self, amenity_ids) -> list:
+        """
+        Amenities for ``amenity_ids`` as plain dicts, ordered by name.
+        An id missing from the snapshot means it was created elsewhere after
+        the last reload, so the snapshot is reloaded once before the id is
+        dropped.
+        """
+        by_id = self.by_id()
+        if any(amenity_id not in by_id for amenity_id in amenity_ids):
+            self._refresh(force=True)
+            by_id = self._by_id
+        found = [by_id[amenity_id] for amenity_id in amenity_ids if amenity_id in by_id]
+        found.sort(key=lambda row: (row["name"], row["id"]))
+        return [dict(row) for row in found]
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._loaded_at = None
+            self._by_id = MappingProxyType({})
+            self._ordered = ()
+amenity_catalog = AmenityCatalog()
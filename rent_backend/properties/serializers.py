@@ -8,6 +8,7 @@ from .models import (
     Property, PropertyImage, PropertyAmenity, PropertyAmenityRelation,
     PropertyFavorite, PropertyReview, PropertyInquiry
 )
+from .amenities import amenity_catalog
 User = get_user_model()
 DEFAULT_PROPERTY_IMAGE_MAX_SIZE_BYTES = 5 * 1024 * 1024
 DEFAULT_PROPERTY_IMAGE_ALLOWED_MIME_TYPES = ("image/jpeg", "image/png")
@@ -102,7 +103,7 @@ class PropertySerializer(serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     amenities = serializers.SerializerMethodField()
     favorites_count = serializers.IntegerField(source='favorited_by.count', read_only=True)
-    average_rating = serializers.FloatField(read_only=True)
+    average_rating = serializers.SerializerMethodField()
     def get_owner_name(self, obj):
         return f"{obj.owner.first_name} {obj.owner.last_name}".strip()
     class Meta:
@@ -140,9 +141,12 @@ class PropertySerializer(serializers.ModelSerializer):
         if errors:
             raise serializers.ValidationError(errors)
         return attrs
+    def get_average_rating(self, obj):
+        # Listing querysets annotate ``rating_avg``; the model property costs a query per row.
+        rating = getattr(obj, "rating_avg", None)
+        return float(rating if rating is not None else obj.average_rating)
     def get_amenities(self, obj):
-        amenities = PropertyAmenity.objects.filter(
-            propertyamenityrelation__property=obj
-        )
-        return PropertyAmenitySerializer(amenities, many=True).data
+        # Relation ids come from the prefetched amenity_relations; the
+        # amenities themselves from the in-process catalog.
+        return amenity_catalog.resolve([relation.amenity_id for relation in obj.amenity_relations.all()])
 
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rent_backend.caching import invalidate_on_commit
+from .models import Property, PropertyAmenity
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property(sender, instance, **kwargs):
+    """
+    Filter options are cached under the ``properties`` tag. Only tags some
+    cached entry uses are bumped, since each bump is a shared-cache write.
+    """
+    invalidate_on_commit("properties")
+@receiver(post_save, sender=PropertyAmenity)
+@receiver(post_delete, sender=PropertyAmenity)
+def invalidate_amenities(sender, instance, **kwargs):
+    invalidate_on_commit("amenities")
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from properties.amenities import AmenityCatalog, amenity_catalog
+from properties.models import Property, PropertyAmenity, PropertyAmenityRelation
+from rent_backend import caching
+User = get_user_model()
+class AmenityCatalogTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caching._tiered.clear()
+        amenity_catalog.clear()
+        self.owner = User.objects.create_user(
+            email="landlord@example.com", password="Passw0rd!", role="landlord",
+            first_name="Land", last_name="Lord",
+        )
+        self.wifi = PropertyAmenity.objects.create(name="Wifi", icon="wifi")
+        self.gym = PropertyAmenity.objects.create(name="Gym", icon="gym")
+        self.pool = PropertyAmenity.objects.create(name="Pool", icon="pool")
+        for city in ("Nairobi", "Mombasa"):
+            prop = Property.objects.create(
+                owner=self.owner, title="Nice place", description="A very nice place",
+                property_type="apartment", city=city, bedrooms=2, bathrooms="1.0",
+                rent_amount="2500.00", security_deposit="2500.00", available_from="2026-01-01",
+            )
+            PropertyAmenityRelation.objects.create(property=prop, amenity=self.wifi)
+            PropertyAmenityRelation.objects.create(property=prop, amenity=self.gym)
+    def test_listing_resolves_amenities_without_catalog_queries(self):
+        self.client.get("/api/properties/")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/properties/")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 2)
+        for item in results:
+            self.assertEqual([a["name"] for a in item["amenities"]], ["Gym", "Wifi"])
+            self.assertEqual(set(item["amenities"][0]), {"id", "name", "icon", "description"})
+        catalog_table = PropertyAmenity._meta.db_table
+        self.assertFalse([q for q in ctx.captured_queries if f'FROM "{catalog_table}"' in q["sql"]])
+    def test_amenity_endpoints_served_from_catalog(self):
+        self.client.get("/api/properties/amenities/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/properties/amenities/")
+            detail = self.client.get(f"/api/properties/amenities/{self.pool.id}/")
+        self.assertEqual([a["name"] for a in response.data], ["Gym", "Pool", "Wifi"])
+        self.assertEqual(detail.data["icon"], "pool")
+        self.assertEqual(self.client.get("/api/properties/amenities/999999/").status_code, 404)
+    def test_save_and_delete_invalidate_catalog(self):
+        self.assertEqual(amenity_catalog.get(self.gym.id)["name"], "Gym")
+        self.gym.name = "Fitness room"
+        self.gym.save()
+        self.assertEqual(amenity_catalog.get(self.gym.id)["name"], "Fitness room")
+        self.pool.delete()
+        self.assertEqual([a["name"] for a in amenity_catalog.all()], ["Fitness room", "Wifi"])
+        with self.assertRaises(TypeError):
+            amenity_catalog.get(self.wifi.id)["name"] = "changed"
+    def test_unknown_relation_id_reloads_catalog_once(self):
+        amenity_catalog.all()
+        # Written without signals, as another process within its tag check window would see it.
+        PropertyAmenity.objects.bulk_create([PropertyAmenity(name="Balcony")])
+        balcony = PropertyAmenity.objects.get(name="Balcony")
+        self.assertEqual([a["name"] for a in amenity_catalog.resolve([balcony.id, self.wifi.id])], ["Balcony", "Wifi"])
+    @override_settings(AMENITY_CATALOG_MAX_AGE_SECONDS=5)
+    def test_edit_from_another_process_is_picked_up_after_max_age(self):
+        now = [1000.0]
+        catalog = AmenityCatalog(clock=lambda: now[0])
+        self.assertEqual(catalog.get(self.gym.id)["name"], "Gym")
+        # update() sends no signal, like a rename made by another worker
+        # whose tag bump lands in its own per-process cache.
+        PropertyAmenity.objects.filter(id=self.gym.id).update(name="Fitness room")
+        now[0] += 4
+        self.assertEqual(catalog.get(self.gym.id)["name"], "Gym")
+        now[0] += 1
+        self.assertEqual(catalog.get(self.gym.id)["name"], "Fitness room")
+        self.assertEqual([a["name"] for a in catalog.all()], ["Fitness room", "Pool", "Wifi"])
@@ -1,7 +1,10 @@
 import datetime
 from django.contrib.auth import get_user_model
 import io
+import shutil
+import tempfile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from PIL import Image
@@ -72,6 +75,11 @@ class PropertyPermissionsTests(APITestCase):
         prop.refresh_from_db()
         self.assertEqual(prop.title, "Updated")
     def test_property_image_upload_owner_only(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            self._upload_as_owner_only()
+    def _upload_as_owner_only(self):
         prop = Property.objects.create(owner=self.landlord1, **_property_payload())
         img_io = io.BytesIO()
         Image.new("RGB", (2, 2), (255, 0, 0)).save(img_io, format="PNG")
@@ -0,0 +1,95 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from properties import views
+from properties.amenities import amenity_catalog
+from properties.models import Property, PropertyAmenity, PropertyAmenityRelation, PropertyFavorite, PropertyReview
+from rent_backend import caching
+from users.revocation import revocation_list
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email, first_name="Test", last_name=role.title(), role=role, password="pass12345",
+    )
+def _create_property(owner, city, property_type="apartment", rent="2500.00"):
+    return Property.objects.create(
+        owner=owner, title="Nice place", description="A very nice place", property_type=property_type,
+        city=city, bedrooms=2, bathrooms="1.0", rent_amount=rent, security_deposit="500.00",
+        available_from="2026-01-01",
+    )
+async def _body(response):
+    if response.streaming:
+        return json.loads(b"".join([chunk async for chunk in response.streaming_content]))
+    return json.loads(response.content)
+class AsyncPropertyViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caching._tiered.clear()
+        amenity_catalog.clear()
+        revocation_list.rebuild()
+        self.landlord = _create_user(email="landlord@example.com", role="landlord")
+        self.other = _create_user(email="other@example.com", role="landlord")
+        self.tenant = _create_user(email="tenant@example.com", role="tenant")
+        wifi = PropertyAmenity.objects.create(name="Wifi")
+        self.props = [
+            _create_property(self.landlord, "Riyadh", rent="1000.00"),
+            _create_property(self.landlord, "Jeddah", property_type="house", rent="3000.00"),
+            _create_property(self.other, "Riyadh", rent="2000.00"),
+        ]
+        PropertyAmenityRelation.objects.create(property=self.props[0], amenity=wifi)
+        PropertyFavorite.objects.create(user=self.tenant, property=self.props[0])
+        PropertyReview.objects.create(property=self.props[0], reviewer=self.tenant, rating=4, comment="Good")
+        PropertyReview.objects.create(property=self.props[1], reviewer=self.tenant, rating=5, comment="Great")
+        self.landlord_auth = f"Bearer {RefreshToken.for_user(self.landlord).access_token}"
+    async def test_list_matches_sync_endpoint(self):
+        for query in ("", "?city=riyadh", "?ordering=rent_amount", "?search=Jeddah", "?property_type=house"):
+            sync_response = await self.async_client.get(f"/api/properties/{query}")
+            async_response = await self.async_client.get(f"/api/properties/async/{query}")
+            self.assertEqual(async_response.status_code, 200, query)
+            self.assertEqual(await _body(async_response), await _body(sync_response), query)
+        listed = await _body(await self.async_client.get("/api/properties/async/?ordering=rent_amount"))
+        self.assertEqual([p["average_rating"] for p in listed], [4.0, 0.0, 5.0])
+        self.assertEqual(listed[0]["favorites_count"], 1)
+        self.assertEqual([a["name"] for a in listed[0]["amenities"]], ["Wifi"])
+    async def test_list_streams_in_chunks_and_filters_mine(self):
+        views.LISTING_CHUNK_SIZE, chunk_size = 2, views.LISTING_CHUNK_SIZE
+        try:
+            listed = await _body(await self.async_client.get("/api/properties/async/"))
+            mine = await _body(await self.async_client.get(
+                "/api/properties/async/?mine=1", headers={"Authorization": self.landlord_auth},
+            ))
+        finally:
+            views.LISTING_CHUNK_SIZE = chunk_size
+        self.assertEqual(len(listed), 3)
+        self.assertEqual({p["id"] for p in mine}, {self.props[0].id, self.props[1].id})
+    async def test_invalid_filter_and_token_are_rejected(self):
+        response = await self.async_client.get("/api/properties/async/?property_type=castle")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("property_type", await _body(response))
+        response = await self.async_client.get("/api/properties/async/", headers={"Authorization": "Bearer nope"})
+        self.assertEqual(response.status_code, 401)
+    async def test_detail_and_filter_options_match_sync_endpoints(self):
+        pk = self.props[1].id
+        sync_detail = await _body(await self.async_client.get(f"/api/properties/{pk}/"))
+        self.assertEqual(await _body(await self.async_client.get(f"/api/properties/async/{pk}/")), sync_detail)
+        self.assertEqual((await self.async_client.get("/api/properties/async/999999/")).status_code, 404)
+        async_options = await _body(await self.async_client.get("/api/properties/async/filter_options/"))
+        self.assertEqual(async_options["cities"], ["Jeddah", "Riyadh"])
+        caching._tiered.clear()
+        cache.clear()
+        self.assertEqual(await _body(await self.async_client.get("/api/properties/filter_options/")), async_options)
+    def test_listing_query_count_does_not_grow_with_rows(self):
+        amenity_catalog.all()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/api/properties/")
+        for city in ("Dammam", "Abha", "Taif"):
+            prop = _create_property(self.other, city)
+            PropertyReview.objects.create(property=prop, reviewer=self.tenant, rating=3, comment="Ok")
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/api/properties/")
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(len(many), len(few))
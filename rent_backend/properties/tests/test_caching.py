@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from properties.models import Property, PropertyFavorite
+from rent_backend import caching
+from rent_backend.caching import LocalLRU, TieredCache
+User = get_user_model()
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+    def __call__(self):
+        return self.now
+def _create_property(owner, city):
+    return Property.objects.create(
+        owner=owner,
+        title="Nice place",
+        description="A very nice place",
+        property_type="apartment",
+        city=city,
+        bedrooms=2,
+        bathrooms="1.0",
+        rent_amount="2500.00",
+        security_deposit="2500.00",
+        available_from="2026-01-01",
+    )
+class TieredCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caching._tiered.clear()
+        self.clock = FakeClock()
+    def test_lru_evicts_oldest_and_expires(self):
+        lru = LocalLRU(max_entries=2, clock=self.clock)
+        lru.set("a", 1, ttl=10)
+        lru.set("b", 2, ttl=10)
+        lru.get("a")
+        lru.set("c", 3, ttl=10)
+        self.assertEqual(lru.evictions, 1)
+        self.assertIs(lru.get("b"), caching._MISSING)
+        self.assertEqual(lru.get("a"), 1)
+        self.clock.now += 11
+        self.assertIs(lru.get("a"), caching._MISSING)
+    def test_tag_invalidation_and_metrics(self):
+        tiered = TieredCache(clock=self.clock)
+        calls = []
+        def compute():
+            calls.append(1)
+            return {"n": len(calls)}
+        self.assertEqual(tiered.get_or_set("k", compute, 60, tags=("property:1",)), {"n": 1})
+        self.assertEqual(tiered.get_or_set("k", compute, 60, tags=("property:1",)), {"n": 1})
+        tiered.invalidate_tags("property:2")
+        self.assertEqual(tiered.get_or_set("k", compute, 60, tags=("property:1",)), {"n": 1})
+        tiered.invalidate_tags("property:1")
+        self.assertEqual(tiered.get_or_set("k", compute, 60, tags=("property:1",)), {"n": 2})
+        metrics = tiered.metrics()
+        self.assertEqual(metrics["local_hits"], 2)
+        self.assertEqual(metrics["misses"], 2)
+        self.assertEqual(metrics["stale"], 1)
+        self.assertEqual(metrics["invalidations"], 2)
+    def test_other_process_sees_invalidation_after_tag_check_interval(self):
+        first = TieredCache(clock=self.clock, tag_check_seconds=1.0)
+        second = TieredCache(clock=self.clock, tag_check_seconds=1.0)
+        first.set("k", "old", 60, tags=("amenities",))
+        self.assertEqual(second.get("k"), "old")
+        first.invalidate_tags("amenities")
+        self.assertIsNone(first.get("k"))
+        self.assertEqual(second.get("k"), "old")
+        self.clock.now += 1.5
+        self.assertIsNone(second.get("k"))
+        self.assertEqual(second.metrics()["shared_hits"], 1)
+    async def test_async_get_or_set_shares_entries_with_sync_path(self):
+        first = TieredCache(clock=self.clock)
+        second = TieredCache(clock=self.clock)
+        calls = []
+        async def compute():
+            calls.append(1)
+            return len(calls)
+        self.assertEqual(await first.aget_or_set("k", compute, 60, tags=("properties",)), 1)
+        self.assertEqual(await second.aget_or_set("k", compute, 60, tags=("properties",)), 1)
+        self.assertEqual(second.get("k"), 1)
+        first.invalidate_tags("properties")
+        self.assertEqual(await first.aget_or_set("k", compute, 60, tags=("properties",)), 2)
+        self.assertEqual(second.metrics()["shared_hits"], 1)
+class FilterOptionsCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caching._tiered.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com", first_name="O", last_name="W", role="landlord", password="pass12345",
+        )
+        self.prop = _create_property(self.owner, "Juba")
+    def test_filter_options_cached_until_property_changes(self):
+        response = self.client.get("/api/properties/filter_options/")
+        self.assertEqual(response.data["cities"], ["Juba"])
+        with self.assertNumQueries(0):
+            self.client.get("/api/properties/filter_options/")
+        _create_property(self.owner, "Wau")
+        response = self.client.get("/api/properties/filter_options/")
+        self.assertEqual(response.data["cities"], ["Juba", "Wau"])
+    def test_saves_only_bump_tags_that_cached_entries_use(self):
+        before = caching.get_cache().metrics()["invalidations"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.last_login = timezone.now()
+            self.owner.save(update_fields=["last_login"])
+            PropertyFavorite.objects.create(user=self.owner, property=self.prop)
+        self.assertEqual(caching.get_cache().metrics()["invalidations"], before)
+        with self.captureOnCommitCallbacks(execute=True):
+            _create_property(self.owner, "Wau")
+        # "properties" is bumped right away and again on commit.
+        self.assertEqual(caching.get_cache().metrics()["invalidations"], before + 2)
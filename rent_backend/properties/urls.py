@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PropertyViewSet, PropertyImageViewSet, PropertyAmenityViewSet,
-    PropertyReviewViewSet, PropertyInquiryViewSet
+    PropertyReviewViewSet, PropertyInquiryViewSet,
+    AsyncPropertyListView, AsyncPropertyDetailView, AsyncFilterOptionsView,
 )
 router = DefaultRouter()
 router.register(r'images', PropertyImageViewSet, basename='property-image')
@@ -12,6 +13,9 @@ router.register(r'inquiries', PropertyInquiryViewSet, basename='property-inquiry
 router.register(r'', PropertyViewSet, basename='property')
 app_name = 'properties'
 urlpatterns = [
+    path('async/', AsyncPropertyListView.as_view(), name='async-property-list'),
+    path('async/filter_options/', AsyncFilterOptionsView.as_view(), name='async-filter-options'),
+    path('async/<int:pk>/', AsyncPropertyDetailView.as_view(), name='async-property-detail'),
     path('', include(router.urls)),
 ]
 
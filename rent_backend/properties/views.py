@@ -1,25 +1,66 @@
+from asgiref.sync import sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
+from django.contrib.auth.models import AnonymousUser
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Avg, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework import viewsets, permissions, filters
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rent_backend.caching import acached, cached
+from users.authentication import CachedJWTAuthentication, aauthenticate
+from badges import counters as badges
 from .models import (
     Property, PropertyImage, PropertyAmenity, PropertyFavorite,
     PropertyReview, PropertyInquiry
 )
+from .amenities import amenity_catalog
 from .filters import PropertyFilter
 from .permissions import IsOwnerOrReadOnly, IsLandlordOrAgentOrReadOnly, IsInquiryParticipant, IsPropertyOwner, IsTenant
 from .serializers import (
     PropertySerializer, PropertyImageSerializer, PropertyAmenitySerializer,
     PropertyFavoriteSerializer, PropertyReviewSerializer, PropertyInquirySerializer
 )
+FILTER_OPTIONS_TTL = 300
+LISTING_CHUNK_SIZE = 100
+def listing_queryset():
+    """
+    Properties with everything PropertySerializer reads loaded up front:
+    owner joined, images/amenity/favorite rows prefetched and the average
+    review rating annotated as ``rating_avg``.
+    """
+    ratings = Subquery(
+        PropertyReview.objects.filter(property=OuterRef('pk'))
+        .order_by()
+        .values('property')
+        .annotate(value=Avg('rating'))
+        .values('value'),
+        output_field=FloatField(),
+    )
+    return (
+        Property.objects.select_related('owner')
+        .prefetch_related('images', 'amenity_relations', 'favorited_by')
+        .annotate(rating_avg=Coalesce(ratings, Value(0.0)))
+    )
+def _filter_options_payload(cities, property_types):
+    type_labels = dict(Property.PROPERTY_TYPE_CHOICES)
+    return {
+        'cities': [c for c in cities if c],
+        'property_types': [
+            {'value': pt, 'label': type_labels.get(pt, pt.title())}
+            for pt in property_types
+        ],
+    }
 class PropertyViewSet(viewsets.ModelViewSet):
     serializer_class = PropertySerializer
     parser_classes = (JSONParser, MultiPartParser, FormParser)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = PropertyFilter
@@ -27,7 +68,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'rent_amount', 'bedrooms', 'bathrooms']
     ordering = ['-created_at']
     def get_queryset(self):
-        queryset = Property.objects.all().prefetch_related('images', 'amenity_relations', 'favorited_by', 'reviews')
+        queryset = listing_queryset()
         mine = self.request.query_params.get("mine")
         if mine and self.request.user.is_authenticated:
             queryset = queryset.filter(owner=self.request.user)
@@ -62,6 +103,8 @@ class PropertyViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def filter_options(self, request):
         """Return distinct cities and property types from the database."""
+        return Response(cached("properties:filter_options", self._filter_options, FILTER_OPTIONS_TTL, tags=("properties",)))
+    def _filter_options(self):
         cities = list(
             Property.objects.values_list('city', flat=True)
             .distinct()
@@ -72,15 +115,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
             .distinct()
             .order_by('property_type')
         )
-        type_labels = dict(Property.PROPERTY_TYPE_CHOICES)
-        property_types_with_labels = [
-            {'value': pt, 'label': type_labels.get(pt, pt.title())}
-            for pt in property_types
-        ]
-        return Response({
-            'cities': [c for c in cities if c],
-            'property_types': property_types_with_labels,
-        })
+        return _filter_options_payload(cities, property_types)
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def favorite(self, request, pk=None):
         property = self.get_object()
@@ -92,7 +127,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
 class PropertyImageViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyImageSerializer
     parser_classes = (JSONParser, MultiPartParser, FormParser)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     def get_queryset(self):
         queryset = PropertyImage.objects.all()
@@ -103,19 +138,31 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save()
 class PropertyAmenityViewSet(viewsets.ModelViewSet):
+    """Reads are served from the in-process amenity catalog; writes go through the model."""
     queryset = PropertyAmenity.objects.all()
     serializer_class = PropertyAmenitySerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    def list(self, request, *args, **kwargs):
+        return Response([dict(amenity) for amenity in amenity_catalog.all()])
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            amenity_id = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            raise NotFound()
+        amenity = amenity_catalog.get(amenity_id)
+        if amenity is None:
+            raise NotFound()
+        return Response(dict(amenity))
 class PropertyFavoriteViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PropertyFavoriteSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     def get_queryset(self):
         return PropertyFavorite.objects.filter(user=self.request.user)
 class PropertyReviewViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyReviewSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     def get_queryset(self):
         queryset = PropertyReview.objects.all()
@@ -127,7 +174,7 @@ class PropertyReviewViewSet(viewsets.ModelViewSet):
         serializer.save(reviewer=self.request.user)
 class PropertyInquiryViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyInquirySerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     def get_permissions(self):
         if self.action == "create":
@@ -148,5 +195,84 @@ class PropertyInquiryViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(property_id=property_id)
         return queryset
     def perform_create(self, serializer):
-        serializer.save(inquirer=self.request.user)
+        inquiry = serializer.save(inquirer=self.request.user)
+        if badges.is_open_inquiry(inquiry):
+            badges.inquiry_changed(inquiry, 1)
+    def perform_update(self, serializer):
+        was_open = badges.is_open_inquiry(serializer.instance)
+        inquiry = serializer.save()
+        is_open = badges.is_open_inquiry(inquiry)
+        if was_open != is_open:
+            badges.inquiry_changed(inquiry, 1 if is_open else -1)
+    def perform_destroy(self, instance):
+        was_open = badges.is_open_inquiry(instance)
+        instance.delete()
+        if was_open:
+            badges.inquiry_changed(instance, -1)
 
+def _api_error(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    return HttpResponse(JSONRenderer().render(detail), status=exc.status_code, content_type='application/json')
+def _render_chunk(chunk, context, first):
+    # Each chunk is rendered as an array and unwrapped, so the streamed
+    # body is byte-for-byte what JSONRenderer makes of the whole list.
+    body = JSONRenderer().render(PropertySerializer(chunk, many=True, context=context).data)[1:-1]
+    return body if first else b',' + body
+async def _stream_listings(queryset, context):
+    yield b'['
+    chunk = []
+    first = True
+    async for prop in queryset.aiterator(chunk_size=LISTING_CHUNK_SIZE):
+        chunk.append(prop)
+        if len(chunk) == LISTING_CHUNK_SIZE:
+            yield await sync_to_async(_render_chunk)(chunk, context, first)
+            chunk = []
+            first = False
+    if chunk:
+        yield await sync_to_async(_render_chunk)(chunk, context, first)
+    yield b']'
+async def _afilter_options():
+    cities = [c async for c in Property.objects.values_list('city', flat=True).distinct().order_by('city')]
+    property_types = [
+        pt async for pt in Property.objects.values_list('property_type', flat=True).distinct().order_by('property_type')
+    ]
+    return _filter_options_payload(cities, property_types)
+class AsyncPropertyListView(View):
+    """
+    PropertyViewSet.list for ASGI deployments, with the same filter, search,
+    ordering and ``mine`` parameters. Rows are read with aiterator in chunks
+    of LISTING_CHUNK_SIZE and the JSON array is streamed chunk by chunk, so
+    a connection never holds the whole result set. Serialising a chunk runs
+    in one sync_to_async call because the amenity catalog may reload.
+    """
+    async def get(self, request):
+        try:
+            user = await aauthenticate(request)
+        except APIException as e:
+            return _api_error(e)
+        drf_request = Request(request, authenticators=())
+        drf_request.user = user or AnonymousUser()
+        view = PropertyViewSet(request=drf_request, action='list', format_kwarg=None, args=(), kwargs={})
+        try:
+            queryset = view.filter_queryset(view.get_queryset())
+        except APIException as e:
+            return _api_error(e)
+        return StreamingHttpResponse(_stream_listings(queryset, {'request': request}), content_type='application/json')
+class AsyncPropertyDetailView(View):
+    """PropertyViewSet.retrieve for ASGI deployments."""
+    async def get(self, request, pk):
+        try:
+            await aauthenticate(request)
+        except APIException as e:
+            return _api_error(e)
+        try:
+            prop = await listing_queryset().aget(pk=pk)
+        except Property.DoesNotExist:
+            return _api_error(NotFound('No Property matches the given query.'))
+        data = await sync_to_async(lambda: PropertySerializer(prop, context={'request': request}).data)()
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json')
+class AsyncFilterOptionsView(View):
+    """PropertyViewSet.filter_options for ASGI deployments, sharing its cache entry."""
+    async def get(self, request):
+        options = await acached("properties:filter_options", _afilter_options, FILTER_OPTIONS_TTL, tags=("properties",))
+        return HttpResponse(JSONRenderer().render(options), content_type='application/json')
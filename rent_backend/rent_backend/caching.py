@@ -0,0 +1,276 @@
+"""
+Two-tier caching: a per-process LRU in front of the Django ``default``
+cache, with tag-based invalidation.
+
+Tag versions live in the default cache. With REDIS_URL set that cache is
+shared, so invalidating a tag reaches every process within
+CACHE_TAG_CHECK_SECONDS. Without it CACHES is the per-process LocMem
+default and invalidation is process-local: other processes keep serving
+their entries until the entry's ttl (or CACHE_LOCAL_TTL_SECONDS for the
+local copy) runs out, so keep ttls short for data edited at runtime.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+_MISSING = object()
+class LocalLRU:
+    """
+    Size-bounded, TTL-aware LRU dict for one process. Values are returned
+    as stored, so callers must treat them as read-only.
+    """
+    def __init__(self, max_entries: int = 1000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.evictions = 0
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+    def set(self, key, value, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    def __len__(self):
+        return len(self._entries)
+class TieredCache:
+    """
+    Per-process LRU in front of a shared Django cache, with tag-based
+    invalidation.
+    Every entry records the version of each of its tags (``property:42``,
+    ``user:7``, ``amenities``...) when it was stored; invalidating a tag
+    bumps its version in the shared cache, which turns every entry carrying
+    it into a miss in all processes. Tag versions read from the shared cache
+    are reused locally for CACHE_TAG_CHECK_SECONDS, so another process may
+    serve an invalidated entry for at most that long; invalidations made in
+    this process apply immediately.
+    """
+    def __init__(self, alias="default", prefix="tc:", max_entries=1000, tag_check_seconds=1.0, clock=time.monotonic):
+        self._alias = alias
+        self._prefix = prefix
+        self._clock = clock
+        self._local = LocalLRU(max_entries, clock=clock)
+        self._tag_check_seconds = tag_check_seconds
+        self._tag_versions = {}
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stale": 0, "sets": 0, "invalidations": 0}
+    @property
+    def _shared(self):
+        return caches[self._alias]
+    def _key(self, key):
+        return f"{self._prefix}{key}"
+    def _tag_key(self, tag):
+        return f"{self._prefix}tag:{tag}"
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+    def _known_versions(self, tags, now):
+        """Split ``tags`` into locally known versions and tags to re-read."""
+        versions = {}
+        stale = []
+        with self._lock:
+            for tag in tags:
+                known = self._tag_versions.get(tag)
+                if known is not None and now - known[1] < self._tag_check_seconds:
+                    versions[tag] = known[0]
+                else:
+                    stale.append(tag)
+        return versions, stale
+    def _remember_versions(self, stale, versions, now) -> None:
+        with self._lock:
+            for tag in stale:
+                self._tag_versions[tag] = (versions[tag], now)
+    def tag_versions(self, tags) -> dict:
+        """Current version of each tag, creating versions for unseen tags."""
+        now = self._clock()
+        versions, stale = self._known_versions(tags, now)
+        if stale:
+            found = self._shared.get_many([self._tag_key(tag) for tag in stale])
+            for tag in stale:
+                version = found.get(self._tag_key(tag))
+                if version is None:
+                    # A time-based start never repeats a version that an
+                    # evicted tag key may already have handed out.
+                    self._shared.add(self._tag_key(tag), time.time_ns(), timeout=None)
+                    version = self._shared.get(self._tag_key(tag))
+                versions[tag] = version
+            self._remember_versions(stale, versions, now)
+        return versions
+    async def atag_versions(self, tags) -> dict:
+        now = self._clock()
+        versions, stale = self._known_versions(tags, now)
+        if stale:
+            found = await self._shared.aget_many([self._tag_key(tag) for tag in stale])
+            for tag in stale:
+                version = found.get(self._tag_key(tag))
+                if version is None:
+                    await self._shared.aadd(self._tag_key(tag), time.time_ns(), timeout=None)
+                    version = await self._shared.aget(self._tag_key(tag))
+                versions[tag] = version
+            self._remember_versions(stale, versions, now)
+        return versions
+    def _fresh(self, entry) -> bool:
+        stored_versions = entry[0]
+        return not stored_versions or self.tag_versions(stored_versions) == stored_versions
+    async def _afresh(self, entry) -> bool:
+        stored_versions = entry[0]
+        return not stored_versions or await self.atag_versions(stored_versions) == stored_versions
+    @property
+    def _local_ttl(self):
+        return float(getattr(settings, "CACHE_LOCAL_TTL_SECONDS", 60))
+    def _store(self, key, versions, value, ttl):
+        # Entries are (tag versions, wall-clock expiry, value); the expiry
+        # keeps the local copy from outliving the shared one.
+        entry = (versions, time.time() + ttl, value)
+        self._shared.set(self._key(key), entry, timeout=ttl)
+        self._local.set(key, entry, min(ttl, self._local_ttl))
+        self._count("sets")
+    async def _astore(self, key, versions, value, ttl):
+        entry = (versions, time.time() + ttl, value)
+        await self._shared.aset(self._key(key), entry, timeout=ttl)
+        self._local.set(key, entry, min(ttl, self._local_ttl))
+        self._count("sets")
+    def _shared_hit(self, key, shared):
+        remaining = shared[1] - time.time()
+        if remaining > 0:
+            self._local.set(key, shared, min(remaining, self._local_ttl))
+        self._count("shared_hits")
+        return shared[2]
+    def _miss(self, stale, default):
+        if stale:
+            self._count("stale")
+        self._count("misses")
+        return default
+    def get(self, key, default=None):
+        stale = False
+        entry = self._local.get(key)
+        if entry is not _MISSING:
+            if self._fresh(entry):
+                self._count("local_hits")
+                return entry[2]
+            self._local.delete(key)
+            stale = True
+        # Another process may already have stored a fresher shared copy.
+        shared = self._shared.get(self._key(key), _MISSING)
+        if shared is not _MISSING:
+            if self._fresh(shared):
+                return self._shared_hit(key, shared)
+            stale = True
+        return self._miss(stale, default)
+    async def aget(self, key, default=None):
+        """get() for async views: shared cache reads use the async cache API."""
+        stale = False
+        entry = self._local.get(key)
+        if entry is not _MISSING:
+            if await self._afresh(entry):
+                self._count("local_hits")
+                return entry[2]
+            self._local.delete(key)
+            stale = True
+        shared = await self._shared.aget(self._key(key), _MISSING)
+        if shared is not _MISSING:
+            if await self._afresh(shared):
+                return self._shared_hit(key, shared)
+            stale = True
+        return self._miss(stale, default)
+    def set(self, key, value, ttl: float, tags=()) -> None:
+        self._store(key, self.tag_versions(tags) if tags else {}, value, ttl)
+    def get_or_set(self, key, func, ttl: float, tags=()):
+        """
+        Return the cached value for ``key``, computing and storing
+        ``func()`` on a miss. Tag versions are read before ``func`` runs so
+        an invalidation racing with the computation is not lost.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        versions = self.tag_versions(tags) if tags else {}
+        value = func()
+        self._store(key, versions, value, ttl)
+        return value
+    async def aget_or_set(self, key, afunc, ttl: float, tags=()):
+        """
+        get_or_set for async views; ``afunc`` is awaited on a miss. Shared
+        cache calls go through Django's async cache API so a network cache
+        does not block the event loop.
+        """
+        value = await self.aget(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        versions = await self.atag_versions(tags) if tags else {}
+        value = await afunc()
+        await self._astore(key, versions, value, ttl)
+        return value
+    def delete(self, key) -> None:
+        self._local.delete(key)
+        self._shared.delete(self._key(key))
+    def invalidate_tags(self, *tags) -> None:
+        now = self._clock()
+        for tag in tags:
+            key = self._tag_key(tag)
+            try:
+                version = self._shared.incr(key)
+            except ValueError:
+                version = time.time_ns()
+                self._shared.set(key, version, timeout=None)
+            with self._lock:
+                self._tag_versions[tag] = (version, now)
+                self._stats["invalidations"] += 1
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["evictions"] = self._local.evictions
+        stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+    def clear_local(self) -> None:
+        self._local.clear()
+        with self._lock:
+            self._tag_versions.clear()
+_tiered = {}
+_tiered_lock = threading.Lock()
+def get_cache() -> TieredCache:
+    """Return the process-wide TieredCache configured by the CACHE_* settings."""
+    alias = getattr(settings, "CACHE_SHARED_ALIAS", "default")
+    with _tiered_lock:
+        if alias not in _tiered:
+            _tiered[alias] = TieredCache(
+                alias=alias,
+                max_entries=int(getattr(settings, "CACHE_LOCAL_MAX_ENTRIES", 1000)),
+                tag_check_seconds=float(getattr(settings, "CACHE_TAG_CHECK_SECONDS", 1.0)),
+            )
+        return _tiered[alias]
+def cached(key, func, ttl: float, tags=()):
+    return get_cache().get_or_set(key, func, ttl, tags=tags)
+async def acached(key, afunc, ttl: float, tags=()):
+    return await get_cache().aget_or_set(key, afunc, ttl, tags=tags)
+def invalidate_tags(*tags) -> None:
+    get_cache().invalidate_tags(*tags)
+def invalidate_on_commit(*tags) -> None:
+    """
+    Invalidate ``tags`` now and again once the current transaction commits,
+    so a concurrent read that re-cached the old rows meanwhile is dropped too.
+    """
+    invalidate_tags(*tags)
+    transaction.on_commit(lambda: invalidate_tags(*tags))
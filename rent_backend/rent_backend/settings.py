@@ -16,13 +16,13 @@ ALLOWED_HOSTS = [h.strip() for h in _allowed_hosts.split(",") if h.strip()]
 AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
     ),
     "DEFAULT_THROTTLE_CLASSES": (
-        "rest_framework.throttling.ScopedRateThrottle",
+        "rent_backend.throttling.SlidingWindowRateThrottle",
     ),
     "DEFAULT_THROTTLE_RATES": {
         "login": "10/min",
@@ -35,11 +35,74 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Authenticated users are cached this long. The invalidation on save only
+# reaches other workers through a shared cache, so without REDIS_URL this is
+# how long another worker may accept a deactivated user or an old role.
+AUTH_USER_CACHE_SECONDS = int(os.getenv("AUTH_USER_CACHE_SECONDS", "300" if REDIS_URL else "5"))
+# Password hashing runs in this many worker processes (0 = inline). When all
+# workers plus the queue are busy, logins get 503 with Retry-After.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "16"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "1"))
+# Logged-out tokens are checked against a per-process Bloom filter that is
+# rebuilt from the RevokedToken table this often.
+REVOCATION_FILTER_REFRESH_SECONDS = int(os.getenv("REVOCATION_FILTER_REFRESH_SECONDS", "30"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+# rent_backend.caching: per-process LRU in front of the default cache. Other
+# processes notice a tag invalidation within CACHE_TAG_CHECK_SECONDS.
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1000"))
+CACHE_LOCAL_TTL_SECONDS = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "60"))
+CACHE_TAG_CHECK_SECONDS = float(os.getenv("CACHE_TAG_CHECK_SECONDS", "1.0"))
+# The in-process amenity catalog is re-read at least this often, even when
+# no shared cache carries the invalidation from other processes.
+AMENITY_CATALOG_MAX_AGE_SECONDS = float(os.getenv("AMENITY_CATALOG_MAX_AGE_SECONDS", "5"))
+# Rate-limit counters shared by all workers: "sqlite" (one file per host) or "cache" (Redis, several hosts).
+THROTTLE_BACKEND = os.getenv("THROTTLE_BACKEND", "cache" if REDIS_URL else "sqlite")
+THROTTLE_SQLITE_PATH = os.getenv("THROTTLE_SQLITE_PATH", str(BASE_DIR / "throttle.sqlite3"))
+# "memory" keeps presence inside one process; use "cache" (Redis) with several workers.
+PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "cache" if REDIS_URL else "memory")
+PRESENCE_ONLINE_TTL_SECONDS = int(os.getenv("PRESENCE_ONLINE_TTL_SECONDS", "30"))
+PRESENCE_TYPING_TTL_SECONDS = int(os.getenv("PRESENCE_TYPING_TTL_SECONDS", "6"))
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://ejarproperties.netlify.app")
 SMS_BACKEND = os.getenv("SMS_BACKEND", "console")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com")
+# SMS are sent by the users.send_sms job over pooled keep-alive connections.
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "5"))
+SMS_HTTP_POOL_SIZE = int(os.getenv("SMS_HTTP_POOL_SIZE", "4"))
+SMS_HTTP_TIMEOUT_SECONDS = float(os.getenv("SMS_HTTP_TIMEOUT_SECONDS", "5"))
+SMS_HTTP_RETRIES = int(os.getenv("SMS_HTTP_RETRIES", "2"))
+SMS_HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("SMS_HTTP_RETRY_BACKOFF_SECONDS", "0.2"))
+SMS_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("SMS_CIRCUIT_FAILURE_THRESHOLD", "5"))
+SMS_CIRCUIT_RESET_SECONDS = float(os.getenv("SMS_CIRCUIT_RESET_SECONDS", "30"))
+# Key for hashing verification codes; falls back to SECRET_KEY.
+VERIFICATION_CODE_SECRET = os.getenv("VERIFICATION_CODE_SECRET")
+NOTIFICATION_RETENTION_READ_DAYS = int(os.getenv("NOTIFICATION_RETENTION_READ_DAYS", "90"))
+NOTIFICATION_RETENTION_UNREAD_DAYS = int(os.getenv("NOTIFICATION_RETENTION_UNREAD_DAYS", "365"))
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "180"))
+MESSAGE_ARCHIVE_INACTIVE_DAYS = int(os.getenv("MESSAGE_ARCHIVE_INACTIVE_DAYS", "90"))
+JOBS_EAGER = _env_bool("JOBS_EAGER", False)
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_POLL_INTERVAL_SECONDS = float(os.getenv("JOBS_POLL_INTERVAL_SECONDS", "1.0"))
+JOBS_LOCK_TIMEOUT_SECONDS = int(os.getenv("JOBS_LOCK_TIMEOUT_SECONDS", "300"))
+JOBS_RETRY_BASE_DELAY_SECONDS = int(os.getenv("JOBS_RETRY_BASE_DELAY_SECONDS", "10"))
+JOBS_RETRY_MAX_DELAY_SECONDS = int(os.getenv("JOBS_RETRY_MAX_DELAY_SECONDS", "3600"))
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -56,6 +119,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'notifications.apps.NotificationsConfig',
     'messages.apps.MessagesConfig',
+    'jobs.apps.JobsConfig',
+    'badges.apps.BadgesConfig',
 ]
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
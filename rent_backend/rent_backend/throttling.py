@@ -0,0 +1,170 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import ScopedRateThrottle
+def _decide(previous, current, limit, duration, elapsed):
+    """
+    Sliding-window estimate for one more request.
+    The previous fixed window is weighted by how much of it still overlaps
+    the sliding window ending now.
+    
+    Returns:
+        (allowed, seconds to wait when not allowed)
+    """
+    weight = 1.0 - elapsed / duration
+    if previous * weight + current + 1 <= limit:
+        return True, None
+    if current + 1 > limit:
+        # Nothing frees up before the next window; then only ``current``
+        # (as the new previous window) has to decay far enough.
+        decay = duration * (1.0 - (limit - 1) / current) if current else 0.0
+        return False, (duration - elapsed) + max(0.0, decay)
+    return False, max(0.0, duration * (1.0 - (limit - 1 - current) / previous) - elapsed)
+class SQLiteWindowStore:
+    """
+    Sliding-window counters in a SQLite file shared by every worker process
+    on the host. Each key is one row holding the current and previous fixed
+    window counts, updated inside a BEGIN IMMEDIATE transaction so
+    concurrent workers serialise on the file lock.
+    """
+    prune_every = 1000
+    def __init__(self, path, clock=time.time):
+        self.path = str(path)
+        self._clock = clock
+        self._local = threading.local()
+        self._hits = 0
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_window ("
+                " key TEXT PRIMARY KEY, window INTEGER NOT NULL, current INTEGER NOT NULL,"
+                " previous INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    def hit(self, key, limit, duration):
+        now = self._clock()
+        window = int(now // duration)
+        elapsed = now - window * duration
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window, current, previous FROM throttle_window WHERE key = ?", (key,)
+            ).fetchone()
+            previous = current = 0
+            if row is not None:
+                if row[0] == window:
+                    current, previous = row[1], row[2]
+                elif row[0] == window - 1:
+                    previous = row[1]
+            allowed, wait = _decide(previous, current, limit, duration, elapsed)
+            if allowed:
+                conn.execute(
+                    "INSERT INTO throttle_window (key, window, current, previous, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET"
+                    " window = excluded.window, current = excluded.current,"
+                    " previous = excluded.previous, expires_at = excluded.expires_at",
+                    (key, window, current + 1, previous, (window + 2) * duration),
+                )
+            self._hits += 1
+            if self._hits % self.prune_every == 0:
+                conn.execute("DELETE FROM throttle_window WHERE expires_at < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, wait
+    def clear(self):
+        self._connection().execute("DELETE FROM throttle_window")
+class CacheWindowStore:
+    """
+    Sliding-window counters in a Django cache (Redis in production), for
+    deployments with several hosts. Each fixed window is its own counter key
+    that expires after two windows; a hit is one atomic incr plus one
+    get, and a refused hit is taken back with decr.
+    """
+    def __init__(self, alias="default", clock=time.time):
+        self._alias = alias
+        self._clock = clock
+    @property
+    def _cache(self):
+        return caches[self._alias]
+    def hit(self, key, limit, duration):
+        cache = self._cache
+        now = self._clock()
+        window = int(now // duration)
+        elapsed = now - window * duration
+        current_key = f"throttle:{key}:{window}"
+        previous_key = f"throttle:{key}:{window - 1}"
+        cache.add(current_key, 0, timeout=math.ceil(duration * 2))
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The counter expired between add and incr.
+            cache.set(current_key, 1, timeout=math.ceil(duration * 2))
+            current = 1
+        previous = cache.get(previous_key, 0)
+        allowed, wait = _decide(previous, current - 1, limit, duration, elapsed)
+        if not allowed:
+            try:
+                cache.decr(current_key)
+            except ValueError:
+                pass
+        return allowed, wait
+    def clear(self):
+        """Empty the whole cache alias; only meant for tests."""
+        self._cache.clear()
+_stores = {}
+_stores_lock = threading.Lock()
+def get_throttle_store():
+    """
+    Return the process-wide store selected by THROTTLE_BACKEND ('sqlite' or
+    'cache'). The sqlite backend needs THROTTLE_SQLITE_PATH, which settings
+    point at a file under BASE_DIR unless the environment overrides it.
+    """
+    backend = getattr(settings, "THROTTLE_BACKEND", "sqlite")
+    if backend == "cache":
+        key = (backend, getattr(settings, "THROTTLE_CACHE_ALIAS", "default"))
+    elif backend == "sqlite":
+        path = getattr(settings, "THROTTLE_SQLITE_PATH", None)
+        if not path:
+            raise ImproperlyConfigured("THROTTLE_SQLITE_PATH must be set when THROTTLE_BACKEND is 'sqlite'.")
+        key = (backend, str(path))
+    else:
+        raise ValueError(f"Unknown THROTTLE_BACKEND {backend!r}")
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = CacheWindowStore(key[1]) if backend == "cache" else SQLiteWindowStore(key[1])
+        return _stores[key]
+class SlidingWindowRateThrottle(ScopedRateThrottle):
+    """
+    ScopedRateThrottle whose counters live in a store shared by all worker
+    processes instead of the per-process request history in the cache.
+    Uses the same ``throttle_scope`` attribute and DEFAULT_THROTTLE_RATES.
+    """
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_throttle_store().hit(self.key, self.num_requests, self.duration)
+        return allowed
+    def wait(self):
+        return self._wait
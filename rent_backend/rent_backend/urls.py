@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/messages/', include('messages.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/badges/', include('badges.urls')),
 
     # Redirect root to React frontend
     path('', lambda request: HttpResponseRedirect('https://ejarproperties.netlify.app/')),
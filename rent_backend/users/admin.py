@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserProfile, PasswordResetToken
+from .models import User, UserProfile, PasswordResetToken, RevokedToken, SmsMessage
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     """
@@ -41,3 +41,22 @@ class PasswordResetTokenAdmin(admin.ModelAdmin):
     search_fields = ['user__email']
     readonly_fields = ['token', 'created_at']
 
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    """
+    Admin panel for RevokedToken model.
+    """
+    list_display = ['jti', 'token_type', 'user', 'revoked_at', 'expires_at']
+    list_filter = ['token_type']
+    search_fields = ['jti', 'user__email']
+    readonly_fields = ['jti', 'token_type', 'user', 'revoked_at', 'expires_at']
+@admin.register(SmsMessage)
+class SmsMessageAdmin(admin.ModelAdmin):
+    """
+    Admin panel for SmsMessage model.
+    """
+    list_display = ['to', 'purpose', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'purpose']
+    search_fields = ['to', 'provider_message_id']
+    readonly_fields = ['to', 'purpose', 'status', 'attempts', 'provider_message_id', 'last_error', 'created_at', 'sent_at']
+    exclude = ['body']
@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .revocation import is_token_revoked
+def _version_key(user_id):
+    return f"auth:user-version:{user_id}"
+def _user_key(user_id, version):
+    return f"auth:user:{user_id}:{version}"
+def _cache_timeout():
+    return int(getattr(settings, "AUTH_USER_CACHE_SECONDS", 5))
+def invalidate_cached_user(user_id):
+    """
+    Make the next request for ``user_id`` reload the user from the database.
+    Bumping a version instead of deleting the entry also discards a stale
+    copy that a concurrent request may be about to write.
+    """
+    key = _version_key(user_id)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that rejects revoked tokens and loads users through
+    the cache.
+    Users are cached for AUTH_USER_CACHE_SECONDS under their id and a
+    per-user version that is bumped on every save or delete. With a shared
+    cache (REDIS_URL) role, password and is_active changes take effect on
+    the next request in every process. With the per-process default cache
+    the bump only reaches the process that saved the user; the others keep
+    their copy for up to AUTH_USER_CACHE_SECONDS, which is why that defaults
+    to a few seconds without REDIS_URL.
+    """
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        version = cache.get(_version_key(user_id), 0)
+        key = _user_key(user_id, version)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=_cache_timeout())
+            return user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWTStatelessUserAuthentication that rejects revoked tokens. The user
+    comes from the token claims and revocation is answered by the
+    in-process filter, so the happy path still makes no query.
+    """
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+async def aauthenticate(request):
+    """
+    Authenticate a plain Django request for an async view.
+    Returns the user, or None when no Authorization header was sent;
+    invalid tokens raise the same exceptions as the DRF path. Token
+    validation and the user lookup may touch the database, so they run in
+    one sync_to_async call.
+    """
+    authentication = CachedJWTAuthentication()
+    if authentication.get_header(request) is None:
+        return None
+    result = await sync_to_async(authentication.authenticate)(request)
+    return result[0] if result else None
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.utils.crypto import constant_time_compare, get_random_string, salted_hmac
+ALGORITHM = "hmac_sha256"
+KEY_SALT = "users.VerificationCode"
+DELIVERY_KEY_SALT = "users.VerificationCode.delivery"
+def _secret():
+    return getattr(settings, "VERIFICATION_CODE_SECRET", None) or settings.SECRET_KEY
+def _digest(salt: str, raw_code: str) -> str:
+    return salted_hmac(KEY_SALT, f"{salt}${raw_code}", secret=_secret(), algorithm="sha256").hexdigest()
+def new_delivery_nonce() -> str:
+    return get_random_string(32)
+def derive_code(nonce: str, length: int) -> str:
+    """
+    The ``length``-digit code for ``nonce``. Only the nonce travels in the
+    delivery job; the same code is derived again on every retry without
+    the plain value being stored anywhere.
+    """
+    if length < 4 or length > 10:
+        length = 6
+    value = int(salted_hmac(DELIVERY_KEY_SALT, nonce, secret=_secret(), algorithm="sha256").hexdigest(), 16)
+    start = 10 ** (length - 1)
+    return str(start + value % (10 ** length - start))
+def make_code_hash(raw_code: str) -> str:
+    """
+    Hash a short-lived verification code as ``hmac_sha256$<salt>$<hex>``.
+    A keyed HMAC is enough here: a code lives for minutes and allows a
+    handful of attempts, so PBKDF2 stretching only costs CPU on every
+    request without adding meaningful protection.
+    """
+    salt = get_random_string(16)
+    return f"{ALGORITHM}${salt}${_digest(salt, raw_code)}"
+def is_legacy_hash(encoded: str) -> bool:
+    return not (encoded or "").startswith(f"{ALGORITHM}$")
+def check_code_hash(raw_code: str, encoded: str) -> bool:
+    """Compare ``raw_code`` to a hash from make_code_hash or, for older rows, make_password."""
+    if not encoded:
+        return False
+    if is_legacy_hash(encoded):
+        return check_password(raw_code, encoded)
+    try:
+        _, salt, digest = encoded.split("$", 2)
+    except ValueError:
+        return False
+    return constant_time_compare(digest, _digest(salt, raw_code))
@@ -0,0 +1,42 @@
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework.pagination import CursorPagination
+from properties.models import Property, PropertyReview
+from .models import User
+DIRECTORY_ROLES = ("landlord", "agent")
+def _per_owner(queryset, owner_field, aggregate, output_field):
+    """One correlated subquery per row instead of joins that multiply each other's counts."""
+    return Subquery(
+        queryset.filter(**{owner_field: OuterRef("pk")})
+        .order_by()
+        .values(owner_field)
+        .annotate(value=aggregate)
+        .values("value"),
+        output_field=output_field,
+    )
+def directory_queryset(roles=DIRECTORY_ROLES):
+    """
+    Active landlords/agents with their profile and listing statistics
+    annotated, so a page of any size is a single query.
+    """
+    return (
+        User.objects.filter(role__in=roles, is_active=True)
+        .select_related("profile")
+        .annotate(
+            properties_count=Coalesce(
+                _per_owner(Property.objects.all(), "owner", Count("id"), IntegerField()), Value(0),
+            ),
+            active_listings_count=Coalesce(
+                _per_owner(Property.objects.filter(status="available"), "owner", Count("id"), IntegerField()), Value(0),
+            ),
+            reviews_count=Coalesce(
+                _per_owner(PropertyReview.objects.all(), "property__owner", Count("id"), IntegerField()), Value(0),
+            ),
+            average_rating=_per_owner(PropertyReview.objects.all(), "property__owner", Avg("rating"), FloatField()),
+        )
+    )
+class DirectoryCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+    ordering = ("-date_joined", "-id")
@@ -0,0 +1,35 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from users.revocation import prune_revoked_tokens
+from users.tasks import schedule_revoked_token_pruning
+class Command(BaseCommand):
+    help = "Delete token revocations whose tokens have already expired."
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per statement (default: 1000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches (default: 0.0).",
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Queue a daily pruning job for run_workers instead of pruning now.",
+        )
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            job = schedule_revoked_token_pruning()
+            run_at = job.run_at if job else "now (JOBS_EAGER)"
+            self.stdout.write(self.style.SUCCESS(f"Scheduled daily revocation pruning at {run_at}."))
+            return
+        deleted = prune_revoked_tokens(
+            batch_size=max(1, options["batch_size"]),
+            pause=max(0.0, options["sleep"]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired token revocations."))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 import random
+import time
 from dataclasses import dataclass
 from typing import Iterable
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
 from django.db import transaction
 @dataclass(frozen=True)
@@ -51,6 +53,17 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete existing non-admin users before seeding (keeps admins).",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Hash the password once and insert users and profiles with bulk_create (for large seeds).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per query in --bulk mode (default: 1000).",
+        )
     @transaction.atomic
     def handle(self, *args, **options):
         password: str = options["password"]
@@ -67,6 +80,9 @@ class Command(BaseCommand):
         base_users = list(_base_seed_users())
         dynamic_users = list(_generate_more_users(landlord_count, agent_count, tenant_count))
         to_create = _dedupe_by_email(base_users + dynamic_users)
+        if options["bulk"]:
+            self._bulk_seed(User, to_create, password, max(1, options["batch_size"]))
+            return
         created = 0
         updated = 0
         admins_created = 0
@@ -74,7 +90,7 @@ class Command(BaseCommand):
             existing = User.objects.filter(email=u.email).first()
             if existing is None:
                 if u.role == "admin":
-                    user = User.objects.create_superuser(
+                    User.objects.create_superuser(
                         email=u.email,
                         password=password,
                         role="admin",
@@ -85,7 +101,7 @@ class Command(BaseCommand):
                     )
                     admins_created += 1
                 else:
-                    user = User.objects.create_user(
+                    User.objects.create_user(
                         email=u.email,
                         password=password,
                         role=u.role,
@@ -95,28 +111,8 @@ class Command(BaseCommand):
                         is_verified=u.is_verified,
                     )
                 created += 1
-                _ = user.profile
                 continue
-            changed_fields: list[str] = []
-            if not existing.first_name and u.first_name:
-                existing.first_name = u.first_name
-                changed_fields.append("first_name")
-            if not existing.last_name and u.last_name:
-                existing.last_name = u.last_name
-                changed_fields.append("last_name")
-            if not existing.phone_number and u.phone_number:
-                existing.phone_number = u.phone_number
-                changed_fields.append("phone_number")
-            if u.role == "admin":
-                if existing.role != "admin":
-                    existing.role = "admin"
-                    changed_fields.append("role")
-                if not existing.is_staff:
-                    existing.is_staff = True
-                    changed_fields.append("is_staff")
-                if not existing.is_superuser:
-                    existing.is_superuser = True
-                    changed_fields.append("is_superuser")
+            changed_fields = _fill_existing(existing, u)
             if changed_fields:
                 existing.save(update_fields=changed_fields)
                 updated += 1
@@ -126,6 +122,75 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS(summary))
         self.stdout.write("Default password for newly created users: " + password)
+    def _bulk_seed(self, User, seed_users: list[SeedUser], password: str, batch_size: int) -> None:
+        started = time.monotonic()
+        encoded = make_password(password)
+        created = 0
+        updated = 0
+        for start in range(0, len(seed_users), batch_size):
+            batch = seed_users[start:start + batch_size]
+            existing = {
+                user.email: user
+                for user in User.objects.filter(email__in=[User.objects.normalize_email(u.email) for u in batch])
+            }
+            new_users = []
+            changed = []
+            changed_fields: set[str] = set()
+            for u in batch:
+                current = existing.get(User.objects.normalize_email(u.email))
+                if current is None:
+                    is_admin = u.role == "admin"
+                    new_users.append(User(
+                        email=User.objects.normalize_email(u.email),
+                        password=encoded,
+                        role=u.role,
+                        first_name=u.first_name,
+                        last_name=u.last_name,
+                        phone_number=u.phone_number,
+                        is_verified=u.is_verified,
+                        is_staff=is_admin,
+                        is_superuser=is_admin,
+                    ))
+                    continue
+                fields = _fill_existing(current, u)
+                if fields:
+                    changed.append(current)
+                    changed_fields.update(fields)
+            if new_users:
+                User.objects.bulk_create_with_profiles(new_users, batch_size=batch_size)
+                created += len(new_users)
+            if changed:
+                User.objects.bulk_update(changed, sorted(changed_fields), batch_size=batch_size)
+                updated += len(changed)
+        elapsed = time.monotonic() - started
+        rate = (created + updated) / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Seed users complete. Created={created}, Updated={updated} in {elapsed:.1f}s ({rate:.0f} rows/s)."
+        ))
+        self.stdout.write("Default password for newly created users: " + password)
+def _fill_existing(existing, u: SeedUser) -> list[str]:
+    """Fill blank fields of an existing user from ``u``; return the changed field names."""
+    changed_fields: list[str] = []
+    if not existing.first_name and u.first_name:
+        existing.first_name = u.first_name
+        changed_fields.append("first_name")
+    if not existing.last_name and u.last_name:
+        existing.last_name = u.last_name
+        changed_fields.append("last_name")
+    if not existing.phone_number and u.phone_number:
+        existing.phone_number = u.phone_number
+        changed_fields.append("phone_number")
+    if u.role == "admin":
+        if existing.role != "admin":
+            existing.role = "admin"
+            changed_fields.append("role")
+        if not existing.is_staff:
+            existing.is_staff = True
+            changed_fields.append("is_staff")
+        if not existing.is_superuser:
+            existing.is_superuser = True
+            changed_fields.append("is_superuser")
+    return changed_fields
 def _base_seed_users() -> Iterable[SeedUser]:
     return [
         SeedUser(
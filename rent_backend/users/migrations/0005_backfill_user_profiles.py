@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # Profiles used to be (re)created on every user save; now only on
+    # creation, so make sure no existing user is left without one.
+    User = apps.get_model('users', 'User')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    missing = User.objects.filter(profile__isnull=True).values_list('id', flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in missing.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_sms_messages'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
-from django.contrib.auth.hashers import check_password, make_password
+from .codes import check_code_hash, is_legacy_hash, make_code_hash
 import uuid
 class UserManager(BaseUserManager):
     def create_user(self, email, first_name, last_name, role, password=None, **extra_fields):
@@ -18,6 +18,18 @@ class UserManager(BaseUserManager):
         user.set_password(password)
         user.save(using=self._db)
         return user
+    def bulk_create_with_profiles(self, users, batch_size=None):
+        """
+        bulk_create ``users`` (passwords already set) together with their
+        profiles. bulk_create sends no post_save, so this stands in for the
+        profile signal.
+        """
+        with transaction.atomic(using=self._db):
+            users = self.bulk_create(users, batch_size=batch_size)
+            UserProfile.objects.using(self._db).bulk_create(
+                [UserProfile(user=user) for user in users], batch_size=batch_size
+            )
+        return users
     def create_superuser(self, email, first_name, last_name, role='admin', password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -64,9 +76,7 @@ class UserProfile(models.Model):
     background_check_status = models.CharField(max_length=20, choices=BACKGROUND_STATUS, default='pending')
     @property
     def properties_count(self):
-        if hasattr(self.user, 'properties'):
-            return self.user.properties.count()
-        return 0
+        return self.user.owned_properties.count()
     def __str__(self):
         return f"{self.user.email} Profile"
 class PasswordResetToken(models.Model):
@@ -101,12 +111,59 @@ class VerificationCode(models.Model):
             models.Index(fields=["used_at"]),
         ]
     def set_code(self, raw_code: str) -> None:
-        self.code_hash = make_password(raw_code)
+        self.code_hash = make_code_hash(raw_code)
     def check_code(self, raw_code: str) -> bool:
-        return check_password(raw_code, self.code_hash)
+        """
+        Return whether ``raw_code`` matches. A correct code stored with the
+        old PBKDF2 hasher is re-hashed in place; the caller saves code_hash.
+        """
+        if not check_code_hash(raw_code, self.code_hash):
+            return False
+        if is_legacy_hash(self.code_hash):
+            self.code_hash = make_code_hash(raw_code)
+        return True
     @property
     def is_used(self) -> bool:
         return self.used_at is not None
     def __str__(self):
         return f"VerificationCode(user={self.user_id}, channel={self.channel}, dest={self.destination})"
-
+class RevokedToken(models.Model):
+    """A JWT (by its jti claim) that must no longer be accepted before it expires."""
+    jti = models.CharField(max_length=255, unique=True)
+    token_type = models.CharField(max_length=20)
+    user = models.ForeignKey("users.User", on_delete=models.CASCADE, null=True, blank=True, related_name="revoked_tokens")
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=["expires_at"])]
+    def __str__(self):
+        return f"RevokedToken(jti={self.jti}, type={self.token_type})"
+class SmsMessage(models.Model):
+    """
+    An outgoing SMS and its delivery state. Messages are sent by the
+    ``users.send_sms`` job; the body is cleared once delivery has finished
+    either way so verification codes do not linger in the table.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_SENT = "sent"
+    STATUS_RETRYING = "retrying"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_RETRYING, "Retrying"),
+        (STATUS_FAILED, "Failed"),
+    )
+    to = models.CharField(max_length=32)
+    body = models.TextField(blank=True)
+    purpose = models.CharField(max_length=30, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    provider_message_id = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+    def __str__(self):
+        return f"SmsMessage(to={self.to}, status={self.status})"
@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import APIException
+class PasswordHashingBusy(APIException):
+    """Raised instead of queueing when every hashing slot is taken; DRF adds Retry-After from ``wait``."""
+    status_code = 503
+    default_detail = "The server is busy. Please retry shortly."
+    default_code = "password_hashing_busy"
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+class PasswordPool:
+    """
+    Runs password hashing and verification in a bounded process pool.
+    At most ``workers + queue_size`` calls are in flight; further calls
+    raise PasswordHashingBusy at once instead of waiting, so a login burst
+    cannot tie up every request thread. With ``workers=0`` calls run inline
+    in the calling thread and are never refused.
+    """
+    def __init__(self, workers: int, queue_size: int, retry_after: int = 1):
+        self.workers = workers
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("fork" if "fork" in methods else None)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                )
+            return self._executor
+    def submit(self, func, *args) -> Future:
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy(self.retry_after)
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+    async def arun(self, func, *args):
+        if not self.workers:
+            return await asyncio.to_thread(func, *args)
+        return await asyncio.wrap_future(self.submit(func, *args))
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+_pools = {}
+_pools_lock = threading.Lock()
+def get_password_pool() -> PasswordPool:
+    """Return this process's pool sized by PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_SIZE."""
+    workers = int(getattr(settings, "PASSWORD_HASH_WORKERS", 0))
+    queue_size = int(getattr(settings, "PASSWORD_HASH_QUEUE_SIZE", 16))
+    retry_after = int(getattr(settings, "PASSWORD_HASH_RETRY_AFTER_SECONDS", 1))
+    # Keyed by pid so a pool created before a server fork is not reused by the children.
+    key = (os.getpid(), workers, queue_size, retry_after)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = PasswordPool(workers, queue_size, retry_after)
+        return _pools[key]
+def _needs_upgrade(encoded: str) -> bool:
+    try:
+        return hashers.identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        return False
+def check_user_password(user, raw_password: str) -> bool:
+    """
+    Pool-backed User.check_password, including its rehash of passwords
+    stored with outdated hasher parameters.
+    """
+    pool = get_password_pool()
+    if not pool.run(hashers.check_password, raw_password, user.password):
+        return False
+    if _needs_upgrade(user.password):
+        set_user_password(user, raw_password)
+        user.save(update_fields=["password"])
+    return True
+def set_user_password(user, raw_password: str) -> None:
+    """Pool-backed User.set_password; the caller saves the user."""
+    user.password = get_password_pool().run(hashers.make_password, raw_password)
+    user._password = raw_password
+async def acheck_user_password(user, raw_password: str) -> bool:
+    pool = get_password_pool()
+    if not await pool.arun(hashers.check_password, raw_password, user.password):
+        return False
+    if _needs_upgrade(user.password):
+        await aset_user_password(user, raw_password)
+        await user.asave(update_fields=["password"])
+    return True
+async def aset_user_password(user, raw_password: str) -> None:
+    """set_user_password for async views; the caller saves the user."""
+    user.password = await get_password_pool().arun(hashers.make_password, raw_password)
+    user._password = raw_password
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from .models import RevokedToken
+logger = logging.getLogger(__name__)
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    Membership tests can return false positives (at roughly ``error_rate``
+    when holding ``capacity`` items) but never false negatives.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+class RevocationList:
+    """
+    Per-process view of RevokedToken.
+    A Bloom filter of all unexpired revoked jtis is rebuilt every
+    REVOCATION_FILTER_REFRESH_SECONDS; tokens it has never seen are accepted
+    without any I/O and only filter hits are confirmed against the database.
+    Revocations made by other workers are picked up on the next rebuild.
+    """
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._filter = None
+        self._built_at = 0.0
+        # jti -> clock time of revocations made by this process, re-added to
+        # a filter whose database snapshot may have been read before them.
+        self._local = {}
+    def _refresh_seconds(self):
+        return float(getattr(settings, "REVOCATION_FILTER_REFRESH_SECONDS", 30))
+    def _error_rate(self):
+        return float(getattr(settings, "REVOCATION_FILTER_ERROR_RATE", 0.001))
+    def rebuild(self):
+        started = self._clock()
+        jtis = list(
+            RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list("jti", flat=True).iterator()
+        )
+        bloom = BloomFilter(capacity=max(1024, len(jtis) * 2), error_rate=self._error_rate())
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            for jti in self._local:
+                bloom.add(jti)
+            self._local = {jti: at for jti, at in self._local.items() if at >= started}
+            self._filter = bloom
+            self._built_at = self._clock()
+        return len(jtis)
+    def _current_filter(self):
+        if self._filter is None or self._clock() - self._built_at >= self._refresh_seconds():
+            self.rebuild()
+        return self._filter
+    def is_revoked(self, jti) -> bool:
+        if not jti or jti not in self._current_filter():
+            return False
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+    def revoke(self, token, user_id=None) -> None:
+        """Persist ``token``'s jti until the token's own expiry and remember it locally."""
+        jti = token.get("jti")
+        if not jti:
+            return
+        expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+        RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={"token_type": token.get("token_type", ""), "user_id": user_id, "expires_at": expires_at},
+        )
+        with self._lock:
+            self._local[jti] = self._clock()
+            if self._filter is not None:
+                self._filter.add(jti)
+revocation_list = RevocationList()
+def revoke_token(token, user_id=None):
+    revocation_list.revoke(token, user_id=user_id)
+def is_token_revoked(token) -> bool:
+    return revocation_list.is_revoked(token.get("jti"))
+def prune_revoked_tokens(batch_size=1000, pause=0.0, sleep=time.sleep):
+    """
+    Delete expired revocations in primary-key batches.
+    
+    Returns:
+        Number of rows deleted
+    """
+    expired = RevokedToken.objects.filter(expires_at__lte=timezone.now()).order_by("id")
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(expired.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
+        last_id = ids[-1]
+        if len(ids) < batch_size:
+            break
+        sleep(pause)
+    logger.info("Pruned %s expired token revocations", deleted)
+    return deleted
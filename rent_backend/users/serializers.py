@@ -1,12 +1,20 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import UserProfile, PasswordResetToken
+from .passwords import set_user_password
 User = get_user_model()
 class UserProfileSerializer(serializers.ModelSerializer):
-    properties_count = serializers.ReadOnlyField()
+    properties_count = serializers.SerializerMethodField()
     class Meta:
         model = UserProfile
         fields = ['company_name', 'background_check_status', 'properties_count']
+    def get_properties_count(self, obj):
+        # Directory querysets annotate the count on the user.
+        count = getattr(obj.user, 'properties_count', None)
+        return obj.properties_count if count is None else count
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
     class Meta:
@@ -17,6 +25,14 @@ class UserSerializer(serializers.ModelSerializer):
             'date_joined', 'profile'
         ]
         read_only_fields = ['is_verified', 'date_joined', 'profile']
+class DirectoryUserSerializer(UserSerializer):
+    active_listings_count = serializers.IntegerField(read_only=True)
+    reviews_count = serializers.IntegerField(read_only=True)
+    average_rating = serializers.SerializerMethodField()
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['active_listings_count', 'reviews_count', 'average_rating']
+    def get_average_rating(self, obj):
+        return round(obj.average_rating, 2) if obj.average_rating is not None else None
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True, write_only=True)
@@ -30,7 +46,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password')
         validated_data.pop('verify_via', None)
         user = User(**validated_data)
-        user.set_password(password)
+        set_user_password(user, password)
         user.save()
         return user
 class ChangePasswordSerializer(serializers.Serializer):
@@ -77,3 +93,14 @@ class VerificationConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError({"phone_number": "Phone number is required for phone verification."})
         return data
 
+class RevocationAwareTokenRefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that refuses refresh tokens revoked at logout."""
+    def validate(self, attrs):
+        from .revocation import is_token_revoked
+        try:
+            refresh = RefreshToken(attrs["refresh"])
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+        if is_token_revoked(refresh):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
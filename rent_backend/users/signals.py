@@ -1,11 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .authentication import invalidate_cached_user
 from .models import User, UserProfile
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """
-    Ensures every user has a profile and keeps it updated.
+    Create the profile of a newly created user. Later saves leave the
+    profile alone; it has no fields derived from the user.
     """
-    UserProfile.objects.get_or_create(user=instance)
-    instance.profile.save()
-
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user_cache(sender, instance, **kwargs):
+    """
+    Drop the cached copy used by CachedJWTAuthentication whenever a user
+    changes, including password changes and deactivation.
+    """
+    invalidate_cached_user(instance.pk)
@@ -1,40 +1,296 @@
 import base64
+import http.client
 import json
 import logging
 import os
+import queue
+import select
+import threading
+import time
 import urllib.parse
-import urllib.request
+from datetime import timedelta
 from django.conf import settings
+from django.utils import timezone
+from jobs.queue import enqueue
+from .models import SmsMessage
 logger = logging.getLogger(__name__)
-def send_sms(*, to: str, message: str) -> None:
-    backend = getattr(settings, "SMS_BACKEND", os.getenv("SMS_BACKEND", "console"))
-    if backend == "console":
-        logger.info("[SMS console] to=%s message=%s", to, message)
-        return
-    if backend == "twilio":
-        _send_sms_twilio(to=to, message=message)
-        return
-    raise RuntimeError(f"Unsupported SMS_BACKEND: {backend}")
-def _send_sms_twilio(*, to: str, message: str) -> None:
-    account_sid = getattr(settings, "TWILIO_ACCOUNT_SID", None)
-    auth_token = getattr(settings, "TWILIO_AUTH_TOKEN", None)
-    from_number = getattr(settings, "TWILIO_FROM_NUMBER", None)
-    if not account_sid or not auth_token or not from_number:
-        raise RuntimeError("Twilio settings missing: TWILIO_ACCOUNT_SID/TWILIO_AUTH_TOKEN/TWILIO_FROM_NUMBER")
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
-    data = urllib.parse.urlencode({"To": to, "From": from_number, "Body": message}).encode("utf-8")
-    auth = base64.b64encode(f"{account_sid}:{auth_token}".encode("utf-8")).decode("ascii")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Authorization", f"Basic {auth}")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-    with urllib.request.urlopen(req, timeout=15) as resp:
-        body = resp.read().decode("utf-8")
-        if resp.status >= 400:
-            raise RuntimeError(f"Twilio SMS failed: {resp.status} {body}")
+class SmsError(Exception):
+    """Delivery failed; retrying later may succeed."""
+class SmsPermanentError(SmsError):
+    """The provider rejected the message; retrying will not help."""
+class SmsOutcomeUnknown(SmsError):
+    """
+    The request reached the provider but no answer came back. The message
+    may have been delivered, so it is not sent again.
+    """
+class CircuitOpen(SmsError):
+    def __init__(self, retry_in: float):
+        super().__init__(f"SMS provider circuit open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+class CircuitBreaker:
+    """
+    Stops calling a failing provider for ``reset_seconds`` after
+    ``failure_threshold`` consecutive failures, then lets a single trial
+    call through to decide whether to close again.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_seconds - self._clock()
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpen(max(remaining, 0.0))
+            self._trial_running = True
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+class ResponseLost(Exception):
+    """The request was sent but no complete response came back."""
+def _connection_dropped(conn) -> bool:
+    # An idle keep-alive socket only turns readable when the server closed it
+    # (or sent something unasked); either way it must not carry a request.
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+class HTTPConnectionPool:
+    """
+    Keep-alive connections to one host, shared by the worker threads of a
+    process. Connections go back to the pool after each fully read response.
+    Requests are never replayed once sent: idle connections the server has
+    closed are dropped before use, a reused connection that fails while the
+    request is being written is replaced once, and a failure after that
+    raises ResponseLost.
+    """
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 5.0):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+    def _new_connection(self):
+        self.created += 1
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+    def _get(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_connection(), False
+            if not _connection_dropped(conn):
+                return conn, True
+            conn.close()
+    def _put(self, conn):
         try:
-            parsed = json.loads(body)
-            sid = parsed.get("sid")
-        except Exception:
-            sid = None
-        logger.info("Twilio SMS sent sid=%s to=%s", sid, to)
-
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    def request(self, method: str, path: str, body: bytes, headers: dict):
+        """Return (status, body bytes)."""
+        conn, reused = self._get()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+        except (ConnectionResetError, BrokenPipeError):
+            # The server closed the connection before taking the request.
+            conn.close()
+            if not reused:
+                raise
+            conn = self._new_connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+        try:
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise ResponseLost(str(e) or type(e).__name__) from e
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._put(conn)
+        return response.status, data
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+class ConsoleSmsBackend:
+    def send(self, to: str, body: str) -> str:
+        logger.info("[SMS console] to=%s message=%s", to, body)
+        return ""
+class TwilioSmsBackend:
+    """
+    Twilio Messages API over a keep-alive connection pool. Failures to send
+    the request, 429 and 5xx answers are retried with backoff; other 4xx are
+    permanent. A request that was sent but got no answer raises
+    SmsOutcomeUnknown rather than being sent twice.
+    """
+    def __init__(self, account_sid, auth_token, from_number, base_url="https://api.twilio.com",
+                 pool_size=4, timeout=5.0, retries=2, backoff=0.2, sleep=time.sleep):
+        if not account_sid or not auth_token or not from_number:
+            raise RuntimeError("Twilio settings missing: TWILIO_ACCOUNT_SID/TWILIO_AUTH_TOKEN/TWILIO_FROM_NUMBER")
+        self.path = f"{urllib.parse.urlsplit(base_url).path.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.from_number = from_number
+        self.auth = base64.b64encode(f"{account_sid}:{auth_token}".encode("utf-8")).decode("ascii")
+        self.pool = HTTPConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self._sleep = sleep
+    def _send_once(self, to: str, body: str) -> str:
+        data = urllib.parse.urlencode({"To": to, "From": self.from_number, "Body": body}).encode("utf-8")
+        headers = {
+            "Authorization": f"Basic {self.auth}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        try:
+            status, payload = self.pool.request("POST", self.path, data, headers)
+        except ResponseLost as e:
+            raise SmsOutcomeUnknown(f"Twilio request sent but not answered: {e}") from e
+        except (OSError, http.client.HTTPException) as e:
+            raise SmsError(f"Twilio request failed: {e}") from e
+        text = payload.decode("utf-8", errors="replace")
+        if status == 429 or status >= 500:
+            raise SmsError(f"Twilio SMS failed: {status} {text}")
+        if status >= 400:
+            raise SmsPermanentError(f"Twilio SMS rejected: {status} {text}")
+        try:
+            return json.loads(text).get("sid") or ""
+        except ValueError:
+            return ""
+    def send(self, to: str, body: str) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                return self._send_once(to, body)
+            except (SmsPermanentError, SmsOutcomeUnknown):
+                raise
+            except SmsError:
+                if attempt >= self.retries:
+                    raise
+                self._sleep(self.backoff * (2 ** attempt))
+class SmsDispatcher:
+    """Sends queued SmsMessage rows through a backend guarded by a circuit breaker."""
+    def __init__(self, backend, breaker: CircuitBreaker, max_attempts: int = 5):
+        self.backend = backend
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+    def dispatch(self, sms_id: int) -> None:
+        sms = SmsMessage.objects.filter(id=sms_id).first()
+        if sms is None or sms.status in (SmsMessage.STATUS_SENT, SmsMessage.STATUS_FAILED):
+            return
+        try:
+            self.breaker.before_call()
+        except CircuitOpen as e:
+            # Not an attempt: park the message until the breaker may close.
+            enqueue("users.send_sms", {"sms_id": sms.id}, delay=timedelta(seconds=max(1.0, e.retry_in)))
+            return
+        sms.attempts += 1
+        try:
+            provider_id = self.backend.send(sms.to, sms.body)
+        except SmsPermanentError as e:
+            # The provider answered, so it is up even though it refused this message.
+            self.breaker.record_success()
+            self._finish(sms, SmsMessage.STATUS_FAILED, error=str(e))
+            return
+        except SmsOutcomeUnknown as e:
+            # Possibly delivered already; a second copy is worse than none.
+            self.breaker.record_failure()
+            self._finish(sms, SmsMessage.STATUS_FAILED, error=str(e))
+            return
+        except SmsError as e:
+            self.breaker.record_failure()
+            if sms.attempts >= self.max_attempts:
+                self._finish(sms, SmsMessage.STATUS_FAILED, error=str(e))
+                return
+            sms.status = SmsMessage.STATUS_RETRYING
+            sms.last_error = str(e)
+            sms.save(update_fields=["status", "attempts", "last_error"])
+            raise
+        self.breaker.record_success()
+        self._finish(sms, SmsMessage.STATUS_SENT, provider_id=provider_id)
+    def _finish(self, sms, status, error="", provider_id=""):
+        sms.status = status
+        sms.body = ""
+        sms.last_error = error
+        sms.provider_message_id = provider_id or ""
+        sms.sent_at = timezone.now() if status == SmsMessage.STATUS_SENT else None
+        sms.save(update_fields=["status", "body", "attempts", "last_error", "provider_message_id", "sent_at"])
+        if status == SmsMessage.STATUS_SENT:
+            logger.info("SMS %s sent to=%s sid=%s", sms.id, sms.to, provider_id)
+        else:
+            logger.warning("SMS %s to=%s failed after %s attempts: %s", sms.id, sms.to, sms.attempts, error)
+def _max_attempts():
+    return int(getattr(settings, "SMS_MAX_ATTEMPTS", 5))
+def _build_backend(name):
+    if name == "console":
+        return ConsoleSmsBackend()
+    if name == "twilio":
+        return TwilioSmsBackend(
+            getattr(settings, "TWILIO_ACCOUNT_SID", None),
+            getattr(settings, "TWILIO_AUTH_TOKEN", None),
+            getattr(settings, "TWILIO_FROM_NUMBER", None),
+            base_url=getattr(settings, "TWILIO_API_BASE_URL", "https://api.twilio.com"),
+            pool_size=int(getattr(settings, "SMS_HTTP_POOL_SIZE", 4)),
+            timeout=float(getattr(settings, "SMS_HTTP_TIMEOUT_SECONDS", 5)),
+            retries=int(getattr(settings, "SMS_HTTP_RETRIES", 2)),
+            backoff=float(getattr(settings, "SMS_HTTP_RETRY_BACKOFF_SECONDS", 0.2)),
+        )
+    raise RuntimeError(f"Unsupported SMS_BACKEND: {name}")
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+def get_sms_dispatcher() -> SmsDispatcher:
+    """Return this process's dispatcher for SMS_BACKEND, keeping its connections and breaker state."""
+    name = getattr(settings, "SMS_BACKEND", os.getenv("SMS_BACKEND", "console"))
+    key = (os.getpid(), name, getattr(settings, "TWILIO_API_BASE_URL", None))
+    with _dispatchers_lock:
+        if key not in _dispatchers:
+            _dispatchers[key] = SmsDispatcher(
+                _build_backend(name),
+                CircuitBreaker(
+                    failure_threshold=int(getattr(settings, "SMS_CIRCUIT_FAILURE_THRESHOLD", 5)),
+                    reset_seconds=float(getattr(settings, "SMS_CIRCUIT_RESET_SECONDS", 30)),
+                ),
+                max_attempts=_max_attempts(),
+            )
+        return _dispatchers[key]
+def send_sms(*, to: str, message: str, purpose: str = "") -> SmsMessage:
+    """Record an outgoing SMS and queue it for a background worker."""
+    sms = SmsMessage.objects.create(to=to, body=message, purpose=purpose)
+    enqueue("users.send_sms", {"sms_id": sms.id}, max_attempts=_max_attempts())
+    return sms
+def dispatch_sms(sms_id: int) -> None:
+    get_sms_dispatcher().dispatch(sms_id)
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+from jobs.queue import enqueue, task
+from .models import PasswordResetToken
+from .revocation import prune_revoked_tokens
+from .sms import dispatch_sms
+from .verification import deliver_code
+@task("users.deliver_verification_code")
+def deliver_verification_code(code_id, nonce=None):
+    deliver_code(code_id, nonce)
+@task("users.send_sms")
+def send_sms_message(sms_id):
+    dispatch_sms(sms_id)
+@task("users.send_password_reset_email")
+def send_password_reset_email(token_id):
+    token_obj = PasswordResetToken.objects.select_related("user").filter(id=token_id, used=False).first()
+    if token_obj is None:
+        return
+    user = token_obj.user
+    reset_link = f"{settings.FRONTEND_URL}/reset-password/{token_obj.token}/"
+    send_mail(
+        subject='Password Reset Request',
+        message=f'Hello {user.first_name},\n\nUse this link to reset your password: {reset_link}\n\nThe link expires in 1 hour.',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+        fail_silently=False,
+    )
+@task("users.prune_revoked_tokens")
+def prune_expired_revocations(batch_size=1000, pause=0.0):
+    """Delete revocations of tokens that have expired anyway, then queue tomorrow's run."""
+    try:
+        prune_revoked_tokens(batch_size=batch_size, pause=pause)
+    finally:
+        schedule_revoked_token_pruning()
+def schedule_revoked_token_pruning():
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    run_at = today + timedelta(days=1)
+    return enqueue(
+        "users.prune_revoked_tokens",
+        run_at=run_at,
+        idempotency_key=f"users.prune_revoked_tokens:{run_at.isoformat()}",
+    )
@@ -0,0 +1,95 @@
+"""
+A local stand-in for the Twilio Messages API, used by the SMS tests and
+benchmarks/sms_bench.py. It speaks HTTP/1.1 keep-alive, records what it
+receives and can be told to fail, drop connections or slow down.
+"""
+import json
+import socket
+import threading
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # the client's delayed ACK stalls every keep-alive response ~40ms.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.provider.lock:
+            self.server.provider.connections += 1
+    def do_POST(self):
+        provider = self.server.provider
+        length = int(self.headers.get("Content-Length") or 0)
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        with provider.lock:
+            status = provider.failures.pop(0) if provider.failures else 201
+            if status < 400:
+                provider.messages.append({key: values[0] for key, values in form.items()})
+            drop = provider.drops > 0
+            provider.drops -= drop
+            close_after = provider.closes > 0
+            provider.closes -= close_after
+        if drop:
+            # Accepted, but the connection goes away before the answer.
+            self.close_connection = True
+            return
+        if provider.latency:
+            threading.Event().wait(provider.latency)
+        if status < 400:
+            body = {"sid": f"SM{uuid.uuid4().hex}", "status": "queued"}
+        else:
+            body = {"code": status, "message": "fake failure"}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        if close_after:
+            # Close without a "Connection: close" header, as idle timeouts do.
+            self.close_connection = True
+    def log_message(self, format, *args):
+        pass
+class FakeSmsProvider:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.messages = []
+        self.failures = []
+        self.drops = 0
+        self.closes = 0
+        self.connections = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.provider = self
+        self._thread = None
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+    def fail_next(self, count: int, status: int = 500) -> None:
+        with self.lock:
+            self.failures.extend([status] * count)
+    def drop_next(self, count: int) -> None:
+        """Accept the next ``count`` messages but close without answering."""
+        with self.lock:
+            self.drops += count
+    def close_after_next(self, count: int) -> None:
+        """Answer the next ``count`` requests, then silently close the connection."""
+        with self.lock:
+            self.closes += count
+    def reset(self) -> None:
+        with self.lock:
+            self.messages.clear()
+            self.failures.clear()
+            self.drops = 0
+            self.closes = 0
+            self.connections = 0
+    def start(self) -> "FakeSmsProvider":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
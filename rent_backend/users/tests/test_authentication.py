@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import CachedJWTAuthentication
+from users.revocation import revocation_list
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email,
+        first_name="Test",
+        last_name=role.title(),
+        role=role,
+        password="pass12345",
+    )
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_list.rebuild()
+        self.user = _create_user(email="cached@example.com", role="landlord")
+        self.token = str(AccessToken.for_user(self.user))
+    def _authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return CachedJWTAuthentication().authenticate(request)[0]
+    def test_warm_cache_costs_no_queries(self):
+        with self.assertNumQueries(1):
+            self._authenticate()
+        with self.assertNumQueries(0):
+            user = self._authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.role, "landlord")
+    def test_save_invalidates_cached_user(self):
+        self._authenticate()
+        self.user.role = "agent"
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._authenticate().role, "agent")
+    def test_deactivated_user_is_rejected_immediately(self):
+        self._authenticate()
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+    def test_authenticated_endpoint_uses_cached_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.client.get("/api/badges/")
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/badges/")
+        self.assertEqual(res.status_code, 200)
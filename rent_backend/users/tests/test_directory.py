@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from properties.models import Property, PropertyReview
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email,
+        first_name="Test",
+        last_name=role.title(),
+        role=role,
+        password="pass12345",
+    )
+def _create_property(owner, status="available"):
+    return Property.objects.create(
+        owner=owner,
+        title="Nice place",
+        description="A very nice place",
+        property_type="apartment",
+        status=status,
+        city="Juba",
+        bedrooms=2,
+        bathrooms="1.0",
+        rent_amount="2500.00",
+        security_deposit="2500.00",
+        available_from="2026-01-01",
+    )
+class DirectoryTests(APITestCase):
+    def setUp(self):
+        self.tenant = _create_user(email="tenant@example.com", role="tenant")
+        self.client.force_authenticate(self.tenant)
+        self.landlord = _create_user(email="landlord@example.com", role="landlord")
+        self.landlord.profile.company_name = "Nile Homes"
+        self.landlord.profile.save()
+        self.agent = _create_user(email="agent@example.com", role="agent")
+        listed = _create_property(self.landlord)
+        _create_property(self.landlord, status="rented")
+        other = _create_user(email="reviewer@example.com", role="tenant")
+        PropertyReview.objects.create(property=listed, reviewer=self.tenant, rating=5, comment="Great")
+        PropertyReview.objects.create(property=listed, reviewer=other, rating=4, comment="Good")
+    def test_counts_are_annotated(self):
+        response = self.client.get("/api/users/landlords/")
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data["results"]
+        self.assertEqual(row["email"], self.landlord.email)
+        self.assertEqual(row["active_listings_count"], 1)
+        self.assertEqual(row["reviews_count"], 2)
+        self.assertEqual(row["average_rating"], 4.5)
+        self.assertEqual(row["profile"]["properties_count"], 2)
+        self.assertEqual(row["profile"]["company_name"], "Nile Homes")
+    def test_query_count_constant_per_page(self):
+        with self.assertNumQueries(1):
+            self.client.get("/api/users/directory/")
+        for i in range(5):
+            _create_property(_create_user(email=f"landlord{i}@example.com", role="landlord"))
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/users/directory/")
+        self.assertEqual(len(response.data["results"]), 7)
+    def test_cursor_pagination_and_search(self):
+        response = self.client.get("/api/users/directory/", {"limit": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+        second = self.client.get(response.data["next"])
+        self.assertEqual(len(second.data["results"]), 1)
+        self.assertNotEqual(second.data["results"][0]["id"], response.data["results"][0]["id"])
+        found = self.client.get("/api/users/directory/", {"search": "nile"})
+        self.assertEqual([row["id"] for row in found.data["results"]], [self.landlord.id])
+        agents = self.client.get("/api/users/directory/", {"role": "agent"})
+        self.assertEqual([row["id"] for row in agents.data["results"]], [self.agent.id])
+    def test_profile_properties_count_uses_owned_properties(self):
+        self.client.force_authenticate(self.landlord)
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.data["profile"]["properties_count"], 2)
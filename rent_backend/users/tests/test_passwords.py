@@ -0,0 +1,78 @@
+import datetime
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import PasswordResetToken
+from users.passwords import check_user_password, get_password_pool, set_user_password
+from users.tests.throttle_helpers import use_temp_throttle_store
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email,
+        first_name="Test",
+        last_name=role.title(),
+        role=role,
+        password="pass12345",
+        is_verified=True,
+    )
+class PasswordPoolTests(APITestCase):
+    def setUp(self):
+        use_temp_throttle_store(self)
+        self.user = _create_user(email="pool@example.com", role="tenant")
+    def _login(self, path="/api/users/login/", password="pass12345"):
+        return self.client.post(path, {"email": self.user.email, "password": password}, format="json")
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0)
+    def test_process_pool_hashes_and_checks(self):
+        pool = get_password_pool()
+        self.addCleanup(pool.shutdown)
+        set_user_password(self.user, "n3w-passw0rd")
+        self.user.save()
+        self.assertTrue(check_user_password(self.user, "n3w-passw0rd"))
+        self.assertFalse(check_user_password(self.user, "pass12345"))
+        self.assertTrue(self.user.check_password("n3w-passw0rd"))
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0, PASSWORD_HASH_RETRY_AFTER_SECONDS=2)
+    def test_login_fails_fast_when_pool_is_full(self):
+        pool = get_password_pool()
+        self.assertTrue(pool._slots.acquire(blocking=False))
+        self.addCleanup(pool._slots.release)
+        for path in ("/api/users/login/", "/api/users/async/login/"):
+            response = self._login(path)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "2")
+    def test_async_login(self):
+        response = self._login("/api/users/async/login/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertEqual(response.json()["user"]["email"], self.user.email)
+        self.assertEqual(self._login("/api/users/async/login/", password="wrong").status_code, 401)
+    def test_async_register(self):
+        payload = {
+            "email": "new@example.com", "first_name": "New", "last_name": "User",
+            "role": "tenant", "password": "Passw0rd!",
+        }
+        response = self.client.post("/api/users/async/register/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["channel"], "email")
+        self.assertTrue(User.objects.get(email="new@example.com").check_password("Passw0rd!"))
+        self.assertEqual(self.client.post("/api/users/async/register/", payload, format="json").status_code, 400)
+    def test_async_change_password(self):
+        path = "/api/users/async/change-password/"
+        body = {"old_password": "pass12345", "new_password": "n3w-passw0rd", "new_password_confirm": "n3w-passw0rd"}
+        self.assertEqual(self.client.post(path, body, format="json").status_code, 401)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        wrong = self.client.post(path, {**body, "old_password": "nope"}, format="json", **auth)
+        self.assertEqual(wrong.status_code, 400)
+        self.assertEqual(self.client.post(path, body, format="json", **auth).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("n3w-passw0rd"))
+    def test_async_password_reset_confirm(self):
+        token = PasswordResetToken.objects.create(user=self.user, expires_at=timezone.now() + datetime.timedelta(hours=1))
+        path = f"/api/users/async/password-reset-confirm/{token.token}/"
+        response = self.client.post(path, {"new_password": "r3set-passw0rd"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("r3set-passw0rd"))
+        self.assertEqual(self.client.post(path, {"new_password": "again"}, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/users/async/password-reset-confirm/bad/", {}, format="json").status_code, 400)
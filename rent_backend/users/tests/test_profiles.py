@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.test import APITestCase
+from users.models import UserProfile
+User = get_user_model()
+class UserProfileSignalTests(APITestCase):
+    def test_profile_created_with_user(self):
+        user = User.objects.create_user(
+            email="profile@example.com", first_name="Pro", last_name="File", role="tenant", password="pass12345",
+        )
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+    def test_updating_user_does_not_touch_profile(self):
+        user = User.objects.create_user(
+            email="update@example.com", first_name="Up", last_name="Date", role="tenant", password="pass12345",
+        )
+        user.first_name = "Changed"
+        with self.assertNumQueries(1):
+            user.save(update_fields=["first_name"])
+    def test_bulk_create_with_profiles(self):
+        password = make_password("pass12345")
+        users = [
+            User(email=f"bulk{i}@example.com", first_name="Bulk", last_name=str(i), role="tenant", password=password)
+            for i in range(5)
+        ]
+        with self.assertNumQueries(4):
+            created = User.objects.bulk_create_with_profiles(users)
+        self.assertEqual(UserProfile.objects.filter(user__in=created).count(), 5)
+        self.assertTrue(created[0].check_password("pass12345"))
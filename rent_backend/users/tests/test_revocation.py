@@ -0,0 +1,64 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import RevokedToken
+from users.revocation import BloomFilter, is_token_revoked, prune_revoked_tokens, revocation_list
+User = get_user_model()
+def _create_user(*, email: str, role: str):
+    return User.objects.create_user(
+        email=email,
+        first_name="Test",
+        last_name=role.title(),
+        role=role,
+        password="pass12345",
+    )
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_list.rebuild()
+        self.user = _create_user(email="logout@example.com", role="tenant")
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access = str(self.refresh.access_token)
+    def _logout(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        response = self.client.post("/api/users/logout/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials()
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        self._logout()
+        self.assertEqual(RevokedToken.objects.filter(user=self.user).count(), 2)
+        response = self.client.post("/api/users/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(self.client.get("/api/users/me/").status_code, 401)
+    def test_revocation_seen_after_rebuild(self):
+        RevokedToken.objects.create(
+            jti=self.refresh["jti"],
+            token_type="refresh",
+            user=self.user,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        revocation_list.rebuild()
+        self.assertTrue(is_token_revoked(self.refresh))
+    def test_unrevoked_token_check_costs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(is_token_revoked(self.refresh))
+    def test_prune_deletes_only_expired_revocations(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti="old-1", token_type="access", expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti="old-2", token_type="refresh", expires_at=now - timedelta(days=1))
+        RevokedToken.objects.create(jti="live", token_type="refresh", expires_at=now + timedelta(days=1))
+        self.assertEqual(prune_revoked_tokens(batch_size=1, sleep=lambda seconds: None), 2)
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+class BloomFilterTests(APITestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
@@ -0,0 +1,26 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from users.models import UserProfile
+User = get_user_model()
+class SeedUsersBulkTests(APITestCase):
+    def _seed(self, **options):
+        out = StringIO()
+        call_command("seed_users", bulk=True, batch_size=4, landlords=3, agents=2, tenants=5, stdout=out, **options)
+        return out.getvalue()
+    def test_bulk_seed_creates_users_and_profiles(self):
+        output = self._seed()
+        # 6 base users (2 admins) plus 10 generated ones.
+        self.assertIn("Created=16, Updated=0", output)
+        self.assertEqual(User.objects.count(), 16)
+        self.assertEqual(UserProfile.objects.count(), 16)
+        admin = User.objects.get(email="admin1@ejar.local")
+        self.assertTrue(admin.is_staff and admin.is_superuser)
+        self.assertTrue(User.objects.get(email="tenant5@ejar.local").check_password("Password123!"))
+    def test_bulk_seed_is_idempotent(self):
+        self._seed()
+        User.objects.filter(email="landlord1@ejar.local").update(phone_number=None)
+        output = self._seed()
+        self.assertIn("Created=0, Updated=1", output)
+        self.assertIsNotNone(User.objects.get(email="landlord1@ejar.local").phone_number)
@@ -0,0 +1,107 @@
+import time
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from jobs.models import Job
+from jobs.worker import Worker
+from users import sms
+from users.models import SmsMessage
+from users.tests.fake_sms_provider import FakeSmsProvider
+class SmsDeliveryTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.provider = FakeSmsProvider().start()
+        cls.settings_override = override_settings(
+            SMS_BACKEND="twilio",
+            TWILIO_ACCOUNT_SID="ACtest",
+            TWILIO_AUTH_TOKEN="secret",
+            TWILIO_FROM_NUMBER="+15550000000",
+            TWILIO_API_BASE_URL=cls.provider.url,
+            SMS_HTTP_RETRIES=1,
+            SMS_HTTP_RETRY_BACKOFF_SECONDS=0,
+            SMS_MAX_ATTEMPTS=2,
+            SMS_CIRCUIT_FAILURE_THRESHOLD=2,
+        )
+        cls.settings_override.enable()
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.provider.stop()
+        super().tearDownClass()
+    def setUp(self):
+        self.provider.reset()
+        sms._dispatchers.clear()
+    def test_send_is_queued_and_delivered_by_worker(self):
+        message = sms.send_sms(to="+211000000001", message="Your code is 123456", purpose="verification")
+        self.assertEqual(self.provider.messages, [])
+        self.assertTrue(Job.objects.filter(name="users.send_sms").exists())
+        Worker().run_until_empty()
+        message.refresh_from_db()
+        self.assertEqual(message.status, SmsMessage.STATUS_SENT)
+        self.assertTrue(message.provider_message_id.startswith("SM"))
+        self.assertEqual(message.body, "")
+        self.assertEqual(self.provider.messages[0]["Body"], "Your code is 123456")
+        self.assertEqual(self.provider.messages[0]["To"], "+211000000001")
+    def test_connections_are_reused(self):
+        for i in range(5):
+            sms.send_sms(to=f"+21100000000{i}", message="hello")
+        Worker().run_until_empty()
+        self.assertEqual(len(self.provider.messages), 5)
+        self.assertEqual(self.provider.connections, 1)
+    def test_transient_failure_is_retried(self):
+        self.provider.fail_next(1, status=503)
+        message = sms.send_sms(to="+211000000001", message="hello")
+        Worker().run_until_empty()
+        message.refresh_from_db()
+        self.assertEqual(message.status, SmsMessage.STATUS_SENT)
+        self.assertEqual(message.attempts, 1)
+    def test_rejected_message_fails_without_retry(self):
+        self.provider.fail_next(1, status=400)
+        message = sms.send_sms(to="bad", message="hello")
+        Worker().run_until_empty()
+        message.refresh_from_db()
+        self.assertEqual(message.status, SmsMessage.STATUS_FAILED)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("400", message.last_error)
+        self.assertEqual(Job.objects.get(name="users.send_sms").status, Job.STATUS_DONE)
+    def test_circuit_opens_after_repeated_failures(self):
+        self.provider.fail_next(4, status=500)
+        first = sms.send_sms(to="+211000000001", message="one")
+        second = sms.send_sms(to="+211000000002", message="two")
+        dispatcher = sms.get_sms_dispatcher()
+        with self.assertRaises(sms.SmsError):
+            dispatcher.dispatch(first.id)
+        with self.assertRaises(sms.SmsError):
+            dispatcher.dispatch(second.id)
+        self.assertTrue(dispatcher.breaker.is_open)
+        calls = len(self.provider.failures)
+        dispatcher.dispatch(first.id)
+        self.assertEqual(len(self.provider.failures), calls)
+        first.refresh_from_db()
+        self.assertEqual(first.status, SmsMessage.STATUS_RETRYING)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(Job.objects.filter(name="users.send_sms", payload={"sms_id": first.id}).count(), 2)
+    def test_unanswered_request_is_not_sent_again(self):
+        self.provider.drop_next(1)
+        message = sms.send_sms(to="+211000000001", message="Your code is 123456")
+        Worker().run_until_empty()
+        message.refresh_from_db()
+        self.assertEqual(len(self.provider.messages), 1)
+        self.assertEqual(message.status, SmsMessage.STATUS_FAILED)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("not answered", message.last_error)
+    def test_connection_closed_while_idle_is_replaced(self):
+        self.provider.close_after_next(1)
+        sms.send_sms(to="+211000000001", message="one")
+        Worker().run_until_empty()
+        pool = sms.get_sms_dispatcher().backend.pool
+        idle = pool._idle.queue[0]
+        deadline = time.monotonic() + 2
+        while not sms._connection_dropped(idle) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        second = sms.send_sms(to="+211000000002", message="two")
+        Worker().run_until_empty()
+        second.refresh_from_db()
+        self.assertEqual(second.status, SmsMessage.STATUS_SENT)
+        self.assertEqual([m["Body"] for m in self.provider.messages], ["one", "two"])
+        self.assertEqual(self.provider.connections, 2)
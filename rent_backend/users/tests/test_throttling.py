@@ -0,0 +1,75 @@
+import os
+import tempfile
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rent_backend.throttling import CacheWindowStore, SQLiteWindowStore, get_throttle_store
+from users.tests.throttle_helpers import use_temp_throttle_store
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+    def __call__(self):
+        return self.now
+class SlidingWindowStoreTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        handle, self.path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+    def _stores(self):
+        return [SQLiteWindowStore(self.path, clock=self.clock), CacheWindowStore(clock=self.clock)]
+    def test_limit_enforced_within_window(self):
+        for store in self._stores():
+            with self.subTest(store=type(store).__name__):
+                results = [store.hit("login:1.2.3.4", 3, 60)[0] for _ in range(5)]
+                self.assertEqual(results, [True, True, True, False, False])
+                self.assertFalse(store.hit("login:1.2.3.4", 3, 60)[0])
+                self.assertTrue(store.hit("login:5.6.7.8", 3, 60)[0])
+    def test_previous_window_is_weighted(self):
+        for store in self._stores():
+            with self.subTest(store=type(store).__name__):
+                self.clock.now = 60 * 1000.0 + 59
+                for _ in range(4):
+                    self.assertTrue(store.hit("k", 4, 60)[0])
+                # A quarter into the next window, 3 of the 4 previous hits still count.
+                self.clock.now = 60 * 1001.0 + 15
+                allowed, wait = store.hit("k", 4, 60)
+                self.assertTrue(allowed)
+                allowed, wait = store.hit("k", 4, 60)
+                self.assertFalse(allowed)
+                self.assertGreater(wait, 0)
+                self.clock.now += wait + 0.001
+                self.assertTrue(store.hit("k", 4, 60)[0])
+                self.clock.now = 60 * 1003.0
+                self.assertTrue(store.hit("k", 4, 60)[0])
+    def test_state_shared_between_store_instances(self):
+        first = SQLiteWindowStore(self.path, clock=self.clock)
+        second = SQLiteWindowStore(self.path, clock=self.clock)
+        self.assertTrue(first.hit("k", 2, 60)[0])
+        self.assertTrue(second.hit("k", 2, 60)[0])
+        self.assertFalse(first.hit("k", 2, 60)[0])
+    def test_sqlite_store_follows_settings_path(self):
+        with override_settings(THROTTLE_BACKEND="sqlite", THROTTLE_SQLITE_PATH=self.path):
+            self.assertEqual(get_throttle_store().path, self.path)
+        with override_settings(THROTTLE_BACKEND="sqlite", THROTTLE_SQLITE_PATH=None):
+            with self.assertRaises(ImproperlyConfigured):
+                get_throttle_store()
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        use_temp_throttle_store(self)
+    def test_login_throttled_after_rate(self):
+        for _ in range(10):
+            response = self.client.post("/api/users/login/", {"email": "nobody@example.com", "password": "x"}, format="json")
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/users/login/", {"email": "nobody@example.com", "password": "x"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+    def test_sync_and_async_login_share_counters(self):
+        for path in ["/api/users/login/", "/api/users/async/login/"] * 5:
+            response = self.client.post(path, {"email": "nobody@example.com", "password": "x"}, format="json")
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/users/async/login/", {"email": "nobody@example.com", "password": "x"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
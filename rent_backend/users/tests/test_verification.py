@@ -1,11 +1,19 @@
+import re
 from datetime import timedelta
+from unittest import mock
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core import mail
 from django.utils import timezone
 from rest_framework.test import APITestCase
+from jobs.models import Job
+from jobs.worker import Worker
 from users.models import VerificationCode
+from users.tests.throttle_helpers import use_temp_throttle_store
 User = get_user_model()
 class VerificationFlowTests(APITestCase):
     def setUp(self):
+        use_temp_throttle_store(self)
         self.user = User.objects.create_user(
             email="verifyme@example.com",
             first_name="Verify",
@@ -51,3 +59,61 @@ class VerificationFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertIn("detail", res.data)
 
+    def test_verify_start_queues_code_delivery(self):
+        res = self.client.post(
+            "/api/users/verify/start/",
+            data={"channel": "email", "email": self.user.email},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Job.objects.filter(name="users.deliver_verification_code").exists())
+        Worker().run_until_empty()
+        self.assertEqual(len(mail.outbox), 1)
+        code_obj = VerificationCode.objects.get(user=self.user)
+        self.assertIsNotNone(code_obj.sent_at)
+        self.assertTrue(code_obj.code_hash)
+    def test_retried_delivery_resends_the_same_code(self):
+        self.client.post("/api/users/verify/start/", data={"channel": "email", "email": self.user.email}, format="json")
+        job = Job.objects.get(name="users.deliver_verification_code")
+        self.assertEqual(set(job.payload), {"code_id", "nonce"})
+        code_hash = VerificationCode.objects.get(user=self.user).code_hash
+        with mock.patch("users.verification.send_mail", side_effect=[OSError("timed out"), 1]) as send:
+            Worker().run_until_empty()
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            Worker().run_until_empty()
+        codes = [re.search(r"code is: (\d+)", c.kwargs["message"]).group(1) for c in send.call_args_list]
+        self.assertEqual(len(codes), 2)
+        self.assertEqual(codes[0], codes[1])
+        self.assertEqual(VerificationCode.objects.get(user=self.user).code_hash, code_hash)
+        self.assertEqual(self._confirm(codes[0]).status_code, 200)
+    def _confirm(self, code):
+        return self.client.post(
+            "/api/users/verify/confirm/",
+            data={"channel": "email", "email": self.user.email, "code": code},
+            format="json",
+        )
+    def test_codes_are_hmac_hashed(self):
+        code_obj = VerificationCode(user=self.user, channel="email", destination=self.user.email)
+        code_obj.set_code("123456")
+        self.assertTrue(code_obj.code_hash.startswith("hmac_sha256$"))
+        self.assertTrue(code_obj.check_code("123456"))
+        self.assertFalse(code_obj.check_code("654321"))
+        other = VerificationCode(user=self.user, channel="email", destination=self.user.email)
+        other.set_code("123456")
+        self.assertNotEqual(code_obj.code_hash, other.code_hash)
+    def test_legacy_pbkdf2_code_is_rehashed_on_successful_check(self):
+        code_obj = VerificationCode.objects.create(
+            user=self.user,
+            channel=VerificationCode.CHANNEL_EMAIL,
+            destination=self.user.email,
+            code_hash=make_password("123456"),
+            expires_at=timezone.now() + timedelta(minutes=10),
+        )
+        self.assertEqual(self._confirm("000000").status_code, 400)
+        code_obj.refresh_from_db()
+        self.assertTrue(code_obj.code_hash.startswith("pbkdf2_"))
+        self.assertEqual(self._confirm("123456").status_code, 200)
+        code_obj.refresh_from_db()
+        self.assertTrue(code_obj.code_hash.startswith("hmac_sha256$"))
+        self.assertTrue(code_obj.check_code("123456"))
@@ -0,0 +1,11 @@
+import shutil
+import tempfile
+from pathlib import Path
+from django.test import override_settings
+def use_temp_throttle_store(testcase):
+    """Point THROTTLE_SQLITE_PATH at a fresh file for the duration of one test."""
+    directory = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    override = override_settings(THROTTLE_SQLITE_PATH=str(Path(directory) / "throttle.sqlite3"))
+    override.enable()
+    testcase.addCleanup(override.disable)
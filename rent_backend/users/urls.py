@@ -2,24 +2,30 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    RegisterView, LoginView, LogoutView, UserViewSet,
-    ChangePasswordView, PasswordResetRequestView,
-    PasswordResetConfirmView, UserListView,
+    RegisterView, LoginView, AsyncLoginView, AsyncRegisterView, LogoutView, UserViewSet,
+    ChangePasswordView, AsyncChangePasswordView, PasswordResetRequestView,
+    PasswordResetConfirmView, AsyncPasswordResetConfirmView, UserListView,
     VerificationStartView, VerificationConfirmView
 )
+from .serializers import RevocationAwareTokenRefreshSerializer
 router = DefaultRouter()
 router.register(r'', UserViewSet, basename='users')
 app_name = 'users'
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('async/register/', AsyncRegisterView.as_view(), name='async_register'),
+    path('async/login/', AsyncLoginView.as_view(), name='async_login'),
+    path('async/change-password/', AsyncChangePasswordView.as_view(), name='async_change_password'),
+    path('async/password-reset-confirm/<str:token>/', AsyncPasswordResetConfirmView.as_view(), name='async_password_reset_confirm'),
     path('logout/', LogoutView.as_view(), name='logout'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', TokenRefreshView.as_view(serializer_class=RevocationAwareTokenRefreshSerializer), name='token_refresh'),
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('password-reset/', PasswordResetRequestView.as_view(), name='password_reset'),
     path('password-reset-confirm/<str:token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('verify/start/', VerificationStartView.as_view(), name='verify_start'),
     path('verify/confirm/', VerificationConfirmView.as_view(), name='verify_confirm'),
+    path('directory/', UserListView.as_view(), name='directory'),
     path('landlords/', UserListView.as_view(), {'role': 'landlord'}, name='landlords'),
     path('agents/', UserListView.as_view(), {'role': 'agent'}, name='agents'),
     path('', include(router.urls)),
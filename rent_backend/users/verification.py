@@ -1,10 +1,11 @@
 import logging
-import random
 from dataclasses import dataclass
 from datetime import timedelta
 from django.conf import settings
 from django.core.mail import send_mail
 from django.utils import timezone
+from jobs.queue import enqueue
+from .codes import derive_code, new_delivery_nonce
 from .models import VerificationCode
 from .sms import send_sms
 logger = logging.getLogger(__name__)
@@ -19,12 +20,6 @@ def get_verification_config() -> VerificationConfig:
         ttl_minutes=int(getattr(settings, "VERIFICATION_CODE_TTL_MINUTES", 10)),
         max_attempts=int(getattr(settings, "VERIFICATION_MAX_ATTEMPTS", 5)),
     )
-def _generate_numeric_code(length: int) -> str:
-    if length < 4 or length > 10:
-        length = 6
-    start = 10 ** (length - 1)
-    end = (10 ** length) - 1
-    return str(random.randint(start, end))
 def mask_destination(destination: str, channel: str) -> str:
     destination = (destination or "").strip()
     if not destination:
@@ -40,23 +35,44 @@ def mask_destination(destination: str, channel: str) -> str:
         return "*" * len(destination)
     return "*" * (len(destination) - 4) + destination[-4:]
 def create_and_send_code(*, user, channel: str, destination: str) -> VerificationCode:
+    """
+    Create a verification code and queue its delivery.
+    The code is fixed here, but the job only carries the nonce it is
+    derived from (see ``derive_code``), so the plain value never sits in
+    the job table and a retried delivery resends the same code.
+    """
     cfg = get_verification_config()
-    code = _generate_numeric_code(cfg.code_length)
     expires_at = timezone.now() + timedelta(minutes=cfg.ttl_minutes)
+    nonce = new_delivery_nonce()
     code_obj = VerificationCode(user=user, channel=channel, destination=destination, expires_at=expires_at)
-    code_obj.set_code(code)
-    code_obj.sent_at = timezone.now()
+    code_obj.set_code(derive_code(nonce, cfg.code_length))
     code_obj.save()
-    try:
-        if channel == VerificationCode.CHANNEL_EMAIL:
-            _send_email_code(email=destination, first_name=getattr(user, "first_name", ""), code=code)
-        elif channel == VerificationCode.CHANNEL_PHONE:
-            send_sms(to=destination, message=f"Your Rent verification code is {code}. It expires in {cfg.ttl_minutes} minutes.")
-        else:
-            logger.warning("Unknown verification channel: %s", channel)
-    except Exception:
-        logger.exception("Failed to send verification code")
+    enqueue("users.deliver_verification_code", {"code_id": code_obj.id, "nonce": nonce})
     return code_obj
+def deliver_code(code_id: int, nonce: str | None = None) -> None:
+    code_obj = VerificationCode.objects.select_related("user").filter(id=code_id).first()
+    if code_obj is None or code_obj.is_used or code_obj.expires_at <= timezone.now():
+        return
+    cfg = get_verification_config()
+    update_fields = ["sent_at"]
+    if nonce is None:
+        # Queued before codes were fixed at enqueue time.
+        nonce = new_delivery_nonce()
+        code_obj.set_code(derive_code(nonce, cfg.code_length))
+        update_fields.append("code_hash")
+    code = derive_code(nonce, cfg.code_length)
+    code_obj.sent_at = timezone.now()
+    code_obj.save(update_fields=update_fields)
+    if code_obj.channel == VerificationCode.CHANNEL_EMAIL:
+        _send_email_code(email=code_obj.destination, first_name=getattr(code_obj.user, "first_name", ""), code=code)
+    elif code_obj.channel == VerificationCode.CHANNEL_PHONE:
+        send_sms(
+            to=code_obj.destination,
+            message=f"Your Rent verification code is {code}. It expires in {cfg.ttl_minutes} minutes.",
+            purpose="verification",
+        )
+    else:
+        logger.warning("Unknown verification channel: %s", code_obj.channel)
 def _send_email_code(*, email: str, first_name: str, code: str) -> None:
     cfg = get_verification_config()
     subject_prefix = getattr(settings, "EMAIL_SUBJECT_PREFIX", "")
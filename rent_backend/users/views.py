@@ -1,10 +1,10 @@
-from rest_framework import generics, status, viewsets
+from rest_framework import filters, generics, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
-from rest_framework.throttling import ScopedRateThrottle
 from django.contrib.auth import authenticate
 from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import UserProfile, PasswordResetToken
 from .models import VerificationCode
@@ -12,51 +12,83 @@ from django.contrib.auth import get_user_model
 from .serializers import (
     UserSerializer, RegisterSerializer, LoginSerializer, ChangePasswordSerializer,
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
-    VerificationStartSerializer, VerificationConfirmSerializer
+    VerificationStartSerializer, VerificationConfirmSerializer, DirectoryUserSerializer
 )
 from .permissions import IsOwner, IsOwnerOrReadOnly, IsLandlordOrAgent, IsTenant
 import datetime
-from django.core.mail import send_mail
 from django.conf import settings
 import logging
+from django.core.exceptions import ValidationError
 from django.db import transaction
+import json
+import math
 import uuid
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.contrib.auth.models import AnonymousUser
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from jobs.queue import enqueue
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rent_backend.throttling import SlidingWindowRateThrottle
+from .directory import DIRECTORY_ROLES, DirectoryCursorPagination, directory_queryset
+from .authentication import aauthenticate
+from .passwords import (
+    PasswordHashingBusy, acheck_user_password, aset_user_password, check_user_password, set_user_password,
+)
+from .revocation import revoke_token
 from .verification import create_and_send_code, mask_destination, get_verification_config
 User = get_user_model()
 logger = logging.getLogger(__name__)
+def _start_verification(user, requested_channel):
+    """Send the first verification code after registration; return (channel, destination)."""
+    channel = requested_channel
+    if channel not in (VerificationCode.CHANNEL_EMAIL, VerificationCode.CHANNEL_PHONE):
+        channel = VerificationCode.CHANNEL_EMAIL
+    if channel == VerificationCode.CHANNEL_PHONE and not user.phone_number:
+        channel = VerificationCode.CHANNEL_EMAIL
+    destination = user.email if channel == VerificationCode.CHANNEL_EMAIL else (user.phone_number or "")
+    if destination:
+        create_and_send_code(user=user, channel=channel, destination=destination)
+    return channel, destination
+def _registered_payload(channel, destination):
+    return {
+        "detail": "Account created. Verification required.",
+        "verification_required": True,
+        "channel": channel,
+        "destination": mask_destination(destination, channel),
+    }
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
     def perform_create(self, serializer):
         user = serializer.save()
-        channel = self.request.data.get("verify_via")
-        if channel not in (VerificationCode.CHANNEL_EMAIL, VerificationCode.CHANNEL_PHONE):
-            channel = VerificationCode.CHANNEL_EMAIL
-        if channel == VerificationCode.CHANNEL_PHONE and not user.phone_number:
-            channel = VerificationCode.CHANNEL_EMAIL
-        destination = user.email if channel == VerificationCode.CHANNEL_EMAIL else (user.phone_number or "")
-        if destination:
-            create_and_send_code(user=user, channel=channel, destination=destination)
-        self._verification_channel = channel
-        self._verification_destination = destination
+        self._verification = _start_verification(user, self.request.data.get("verify_via"))
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        channel = getattr(self, "_verification_channel", VerificationCode.CHANNEL_EMAIL)
-        destination = getattr(self, "_verification_destination", "")
-        return Response(
-            {
-                "detail": "Account created. Verification required.",
-                "verification_required": True,
-                "channel": channel,
-                "destination": mask_destination(destination, channel),
-            },
-            status=status.HTTP_201_CREATED,
-        )
+        super().create(request, *args, **kwargs)
+        channel, destination = getattr(self, "_verification", (VerificationCode.CHANNEL_EMAIL, ""))
+        return Response(_registered_payload(channel, destination), status=status.HTTP_201_CREATED)
+def _login_payload(user):
+    refresh = RefreshToken.for_user(user)
+    return {
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+        "user": UserSerializer(user).data,
+    }
+def _unverified_payload(user):
+    return {
+        "detail": "Account not verified.",
+        "verification_required": True,
+        "email": user.email,
+        "phone_number": user.phone_number,
+    }
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SlidingWindowRateThrottle]
     throttle_scope = "login"
     def post(self, request):
         request_id = str(uuid.uuid4())
@@ -72,28 +104,14 @@ class LoginView(generics.GenericAPIView):
                 return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
             if not user.is_active:
                 return Response({"detail": "Account is inactive"}, status=status.HTTP_403_FORBIDDEN)
-            if not user.check_password(password):
+            if not check_user_password(user, password):
                 return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
             if not user.is_verified:
-                return Response(
-                    {
-                        "detail": "Account not verified.",
-                        "verification_required": True,
-                        "email": user.email,
-                        "phone_number": user.phone_number,
-                    },
-                    status=status.HTTP_403_FORBIDDEN,
-                )
+                return Response(_unverified_payload(user), status=status.HTTP_403_FORBIDDEN)
 
-            refresh = RefreshToken.for_user(user)
-            return Response(
-                {
-                    "refresh": str(refresh),
-                    "access": str(refresh.access_token),
-                    "user": UserSerializer(user).data,
-                },
-                status=status.HTTP_200_OK,
-            )
+            return Response(_login_payload(user), status=status.HTTP_200_OK)
+        except PasswordHashingBusy:
+            raise
         except Exception:
             logger.exception("Login error (request_id=%s)", request_id)
             payload = {"detail": "An error occurred during login", "request_id": request_id}
@@ -101,20 +119,135 @@ class LoginView(generics.GenericAPIView):
                 # In DEBUG, Django/DRF will already show more detail; this keeps API clients readable.
                 payload["debug"] = "Check server logs for stack trace"
             return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+def _json_error(payload, status_code, retry_after=None):
+    response = JsonResponse(payload, status=status_code)
+    if retry_after is not None:
+        response["Retry-After"] = str(retry_after)
+    return response
+def _busy_response(exc):
+    return _json_error({"detail": exc.detail}, exc.status_code, retry_after=exc.wait)
+def _read_json(request):
+    """Return the parsed JSON body, or None when it is not valid JSON."""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+async def _athrottle(view, request, user=None):
+    """
+    Apply SlidingWindowRateThrottle for ``view`` exactly as DRF does for the
+    sync views, so both paths share keys and counters. Returns a 429
+    response, or None when the request may go ahead.
+    """
+    drf_request = Request(request, authenticators=())
+    drf_request.user = user or AnonymousUser()
+    throttle = SlidingWindowRateThrottle()
+    if await sync_to_async(throttle.allow_request)(drf_request, view):
+        return None
+    return _json_error(
+        {"detail": "Request was throttled."}, status.HTTP_429_TOO_MANY_REQUESTS,
+        retry_after=math.ceil(throttle.wait() or 0),
+    )
+async def _arequire_user(request):
+    """Authenticated user of an async view, or an error response."""
+    try:
+        user = await aauthenticate(request)
+    except APIException as e:
+        return None, _json_error({"detail": e.detail}, e.status_code)
+    if user is None:
+        e = NotAuthenticated()
+        return None, _json_error({"detail": e.detail}, e.status_code)
+    return user, None
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoginView(View):
+    """
+    LoginView for ASGI deployments. The event loop stays free while the
+    password check runs in the hashing pool, so one worker keeps serving
+    other requests during a login burst.
+    """
+    throttle_scope = "login"
+    async def post(self, request):
+        throttled = await _athrottle(self, request)
+        if throttled is not None:
+            return throttled
+        data = _read_json(request)
+        if data is None:
+            return _json_error({"detail": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+        serializer = LoginSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = (serializer.validated_data["email"] or "").strip().lower()
+        user = await User.objects.filter(email__iexact=email).order_by("id").afirst()
+        if not user:
+            return JsonResponse({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.is_active:
+            return JsonResponse({"detail": "Account is inactive"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            valid = await acheck_user_password(user, serializer.validated_data["password"])
+        except PasswordHashingBusy as e:
+            return _busy_response(e)
+        if not valid:
+            return JsonResponse({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.is_verified:
+            return JsonResponse(_unverified_payload(user), status=status.HTTP_403_FORBIDDEN)
+        payload = await sync_to_async(_login_payload)(user)
+        return JsonResponse(payload, status=status.HTTP_200_OK)
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegisterView(View):
+    """RegisterView for ASGI deployments; the new password is hashed in the pool."""
+    async def post(self, request):
+        data = _read_json(request)
+        if data is None:
+            return _json_error({"detail": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+        serializer = RegisterSerializer(data=data)
+        # Validation checks the email is unused, which queries the database.
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields = dict(serializer.validated_data)
+        password = fields.pop("password")
+        fields.pop("verify_via", None)
+        user = User(**fields)
+        try:
+            await aset_user_password(user, password)
+        except PasswordHashingBusy as e:
+            return _busy_response(e)
+        await user.asave()
+        channel, destination = await sync_to_async(_start_verification)(user, data.get("verify_via"))
+        return JsonResponse(_registered_payload(channel, destination), status=status.HTTP_201_CREATED)
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncChangePasswordView(View):
+    """ChangePasswordView for ASGI deployments."""
+    async def post(self, request):
+        user, error = await _arequire_user(request)
+        if error is not None:
+            return error
+        data = _read_json(request)
+        if data is None:
+            return _json_error({"detail": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+        serializer = ChangePasswordSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            if not await acheck_user_password(user, serializer.validated_data["old_password"]):
+                return JsonResponse({"old_password": "Wrong password."}, status=status.HTTP_400_BAD_REQUEST)
+            await aset_user_password(user, serializer.validated_data["new_password"])
+        except PasswordHashingBusy as e:
+            return _busy_response(e)
+        await user.asave(update_fields=["password"])
+        return JsonResponse({"detail": "Password updated successfully"}, status=status.HTTP_200_OK)
 class LogoutView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     def post(self, request):
-        try:
-            refresh_token = request.data.get('refresh')
-            if refresh_token:
-                token = RefreshToken(refresh_token)
-                try:
-                    token.blacklist()
-                except Exception:
-                    pass
-            return Response({'detail': 'Logged out successfully'}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'detail': 'Logged out successfully'}, status=status.HTTP_200_OK)
+        """Revoke the refresh token from the body and the access token in use."""
+        refresh_token = request.data.get('refresh')
+        if refresh_token:
+            try:
+                revoke_token(RefreshToken(refresh_token), user_id=request.user.pk)
+            except TokenError:
+                pass
+        if request.auth is not None and hasattr(request.auth, 'get'):
+            revoke_token(request.auth, user_id=request.user.pk)
+        return Response({'detail': 'Logged out successfully'}, status=status.HTTP_200_OK)
 class ChangePasswordView(generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     model = User
@@ -125,9 +258,9 @@ class ChangePasswordView(generics.UpdateAPIView):
         self.object = self.get_object()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        if not self.object.check_password(serializer.validated_data['old_password']):
+        if not check_user_password(self.object, serializer.validated_data['old_password']):
             return Response({'old_password': 'Wrong password.'}, status=status.HTTP_400_BAD_REQUEST)
-        self.object.set_password(serializer.validated_data['new_password'])
+        set_user_password(self.object, serializer.validated_data['new_password'])
         self.object.save()
         return Response({'detail': 'Password updated successfully'}, status=status.HTTP_200_OK)
     def post(self, request, *args, **kwargs):
@@ -144,7 +277,7 @@ class PasswordResetConfirmView(generics.GenericAPIView):
                 if not new_password:
                     return Response({'detail': 'new_password is required'}, status=status.HTTP_400_BAD_REQUEST)
                 user = token_obj.user
-                user.set_password(new_password)
+                set_user_password(user, new_password)
                 user.save()
                 token_obj.used = True
                 token_obj.save()
@@ -153,6 +286,31 @@ class PasswordResetConfirmView(generics.GenericAPIView):
                 return Response({'detail': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
         else:
             return Response({'detail': 'Token is required'}, status=status.HTTP_400_BAD_REQUEST)
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncPasswordResetConfirmView(View):
+    """PasswordResetConfirmView for ASGI deployments."""
+    async def post(self, request, token):
+        data = _read_json(request)
+        if data is None:
+            return _json_error({"detail": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+        try:
+            token_obj = await PasswordResetToken.objects.select_related("user").aget(token=token, used=False)
+        except (PasswordResetToken.DoesNotExist, ValidationError):
+            return JsonResponse({"detail": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
+        if token_obj.expires_at < timezone.now():
+            return JsonResponse({"detail": "Token expired"}, status=status.HTTP_400_BAD_REQUEST)
+        new_password = data.get("new_password")
+        if not new_password:
+            return JsonResponse({"detail": "new_password is required"}, status=status.HTTP_400_BAD_REQUEST)
+        user = token_obj.user
+        try:
+            await aset_user_password(user, new_password)
+        except PasswordHashingBusy as e:
+            return _busy_response(e)
+        await user.asave(update_fields=["password"])
+        token_obj.used = True
+        await token_obj.asave(update_fields=["used"])
+        return JsonResponse({"detail": "Password reset successfully"}, status=status.HTTP_200_OK)
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -168,15 +326,24 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data)
 class UserListView(generics.ListAPIView):
-    serializer_class = UserSerializer
+    """
+    Landlord/agent directory, cursor paginated and newest first.
+    
+    ?role=landlord|agent narrows the roles (the landlords/ and agents/
+    routes fix it) and ?search= matches first/last name and company name.
+    """
+    serializer_class = DirectoryUserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DirectoryCursorPagination
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['first_name', 'last_name', 'profile__company_name']
     def get_queryset(self):
-        role = self.kwargs.get('role')
-        return User.objects.filter(role=role)
+        role = self.kwargs.get('role') or self.request.query_params.get('role')
+        return directory_queryset([role] if role in DIRECTORY_ROLES else DIRECTORY_ROLES)
 class PasswordResetRequestView(generics.GenericAPIView):
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SlidingWindowRateThrottle]
     throttle_scope = "password_reset"
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -188,22 +355,12 @@ class PasswordResetRequestView(generics.GenericAPIView):
             return Response({'detail': 'If an account exists for this email, a reset link has been sent.'}, status=status.HTTP_200_OK)
         expires_at = timezone.now() + datetime.timedelta(hours=1)
         token_obj = PasswordResetToken.objects.create(user=user, expires_at=expires_at)
-        reset_link = f"{settings.FRONTEND_URL}/reset-password/{token_obj.token}/"
-        try:
-            send_mail(
-                subject='Password Reset Request',
-                message=f'Hello {user.first_name},\n\nUse this link to reset your password: {reset_link}\n\nThe link expires in 1 hour.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-        except Exception:
-            logger.exception("Failed to send password reset email")
+        enqueue("users.send_password_reset_email", {"token_id": token_obj.id})
         return Response({'detail': 'If an account exists for this email, a reset link has been sent.'}, status=status.HTTP_200_OK)
 class VerificationStartView(generics.GenericAPIView):
     serializer_class = VerificationStartSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SlidingWindowRateThrottle]
     throttle_scope = "verification_start"
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -239,7 +396,7 @@ class VerificationStartView(generics.GenericAPIView):
 class VerificationConfirmView(generics.GenericAPIView):
     serializer_class = VerificationConfirmSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SlidingWindowRateThrottle]
     throttle_scope = "verification_confirm"
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -283,7 +440,7 @@ class VerificationConfirmView(generics.GenericAPIView):
                 code_obj.save(update_fields=["attempt_count", "last_attempt_at"])
                 return Response({"detail": "Invalid code."}, status=status.HTTP_400_BAD_REQUEST)
             code_obj.used_at = now
-            code_obj.save(update_fields=["attempt_count", "last_attempt_at", "used_at"])
+            code_obj.save(update_fields=["attempt_count", "last_attempt_at", "used_at", "code_hash"])
             user.is_verified = True
             if channel == VerificationCode.CHANNEL_EMAIL:
                 user.email_verified_at = now